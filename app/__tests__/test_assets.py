@@ -0,0 +1,108 @@
+import gzip
+import os
+
+import pytest
+
+import app.assets
+import app.server
+from app.assets import AssetIndex, IMMUTABLE_MAX_AGE
+
+
+@pytest.fixture
+def web_dir(tmp_path, monkeypatch):
+    (tmp_path / 'index.html').write_text('<html>app</html>')
+    (tmp_path / 'static').mkdir()
+    (tmp_path / 'static' / 'main.3f2a1b9c.js').write_text('console.log("app")')
+    (tmp_path / 'static' / 'main.3f2a1b9c.js.gz').write_bytes(gzip.compress(b'console.log("app")'))
+    (tmp_path / 'robots.txt').write_text('User-agent: *')
+
+    monkeypatch.setattr(app.assets, '_asset_index', None)
+    monkeypatch.setitem(app.server.app.config, 'WEB_DIR', str(tmp_path))
+    yield tmp_path
+
+
+def test_index_groups_variants(web_dir):
+    index = AssetIndex(str(web_dir))
+    assert sorted(index.assets) == ['index.html', 'robots.txt', 'static/main.3f2a1b9c.js']
+    asset = index.assets['static/main.3f2a1b9c.js']
+    assert asset.immutable and asset.mimetype in ('application/javascript', 'text/javascript')
+    assert list(asset.variants) == ['gzip']
+    assert not index.assets['index.html'].immutable
+
+
+def test_index_reloads_when_index_html_changes(web_dir):
+    now = [0]
+    index = AssetIndex(str(web_dir), reload_interval=10, clock=lambda: now[0])
+    (web_dir / 'new.txt').write_text('new')
+    (web_dir / 'index.html').write_text('<html>new app</html>')
+    os.utime(str(web_dir / 'index.html'), ns=(0, 10 ** 9))
+    assert index.get('new.txt').path == 'index.html'
+    now[0] = 10
+    assert index.get('new.txt').path == 'new.txt'
+
+
+def test_serves_hashed_files_as_immutable(test_client, web_dir):
+    resp = test_client.get('/static/main.3f2a1b9c.js')
+    assert resp.status_code == 200
+    assert resp.get_data() == b'console.log("app")'
+    assert resp.headers['Cache-Control'] == 'public, max-age=%s, immutable' % IMMUTABLE_MAX_AGE
+    assert resp.headers['Vary'] == 'Accept-Encoding'
+    assert 'Content-Encoding' not in resp.headers
+
+    resp = test_client.get('/static/main.3f2a1b9c.js', headers={'Accept-Encoding': 'gzip, br'})
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(resp.get_data()) == b'console.log("app")'
+
+
+def test_spa_routes_fall_back_to_index_html(test_client, web_dir):
+    for path in ('/', '/tweets/today'):
+        resp = test_client.get(path)
+        assert resp.status_code == 200
+        assert resp.get_data() == b'<html>app</html>'
+        assert resp.headers['Cache-Control'] == 'no-cache'
+
+
+def test_answers_304_for_a_matching_etag(test_client, web_dir):
+    etag = test_client.get('/robots.txt').headers['ETag']
+    resp = test_client.get('/robots.txt', headers={'If-None-Match': etag})
+    assert resp.status_code == 304
+    assert resp.get_data() == b''
+
+
+def test_missing_web_dir(test_client, tmp_path, monkeypatch):
+    monkeypatch.setattr(app.assets, '_asset_index', None)
+    monkeypatch.setitem(app.server.app.config, 'WEB_DIR', str(tmp_path / 'missing'))
+    assert test_client.get('/anything').status_code == 404
+
+
+def test_files_removed_by_a_deploy_rebuild_the_index(test_client, web_dir):
+    assert test_client.get('/robots.txt').status_code == 200
+    os.remove(str(web_dir / 'robots.txt'))
+    (web_dir / 'static' / 'main.3f2a1b9c.js').write_text('console.log("new app")')
+
+    resp = test_client.get('/robots.txt')
+    assert resp.status_code == 200
+    assert resp.get_data() == b'<html>app</html>'
+
+    resp = test_client.get('/static/main.3f2a1b9c.js')
+    assert resp.get_data() == b'console.log("new app")'
+
+
+def test_missing_files_without_index_html_are_not_found(test_client, web_dir):
+    app.assets.get_asset_index(str(web_dir))
+    os.remove(str(web_dir / 'index.html'))
+    os.remove(str(web_dir / 'robots.txt'))
+    assert test_client.get('/robots.txt').status_code == 404
+
+
+def test_files_rebuilt_with_the_same_size_get_a_new_etag(test_client, web_dir):
+    etag = test_client.get('/robots.txt').headers['ETag']
+    robots = web_dir / 'robots.txt'
+    stat = os.stat(str(robots))
+    robots.write_text('User-agent: x')
+    os.utime(str(robots), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    resp = test_client.get('/robots.txt', headers={'If-None-Match': etag})
+    assert resp.status_code == 200
+    assert resp.get_data() == b'User-agent: x'
+    assert resp.headers['ETag'] != etag
@@ -1,9 +1,14 @@
+import base64
+import json
 import logging
+import threading
+import time
 
 import requests
 import pytest
 
-from app.auth import Authentication, _read_auth_info_from_file, _AuthInfo
+import app.auth
+from app.auth import Authentication, _read_auth_info_from_file, _AuthInfo, _decode_jwt_expiry
 
 
 class MockedResponse:
@@ -40,11 +45,10 @@ def patch_file_open_for_auth_info(monkeypatch):
 
 @pytest.fixture
 def mock_get_requests(monkeypatch):
-    old_get = requests.get
-    def mock_get(uri, *args, **kwargs):
+    def mock_get(*args, **kwargs):
         return MockedResponse()
 
-    monkeypatch.setattr(requests, 'get', mock_get)
+    monkeypatch.setattr(requests.Session, 'request', mock_get)
 
 
 @pytest.fixture
@@ -59,7 +63,7 @@ def mock_post_authentication_valid(monkeypatch):
     def mocked_post(*args, **kwargs):
         return MockedAuthResponse()
 
-    monkeypatch.setattr(requests, 'post', mocked_post)
+    monkeypatch.setattr(requests.Session, 'request', mocked_post)
 
 
 @pytest.fixture
@@ -70,7 +74,7 @@ def mock_post_authentication_invalid(monkeypatch):
     def mocked_post(*args, **kwargs):
         return MockedUnAuthResponse()
 
-    monkeypatch.setattr(requests, 'post', mocked_post)
+    monkeypatch.setattr(requests.Session, 'request', mocked_post)
 
 
 def test_read_auth_info_from_file(patch_file_open_for_auth_info):
@@ -135,3 +139,97 @@ def test_merge_kwargs_with_headers(auth_service):
 
     for test in table:
         assert auth_service._merge_kwargs_with_headers(**test['vars']) == test['expect']
+
+
+def _make_jwt(payload):
+    encoded = base64.urlsafe_b64encode(json.dumps(payload).encode('utf8')).decode('ascii').rstrip('=')
+    return 'header.%s.signature' % encoded
+
+
+def test_decode_jwt_expiry():
+    assert _decode_jwt_expiry(_make_jwt({'exp': 1573000000})) == 1573000000
+    assert _decode_jwt_expiry(_make_jwt({'sub': 'bot'})) is None
+    assert _decode_jwt_expiry('not a jwt') is None
+    assert _decode_jwt_expiry(None) is None
+
+
+def test_auth_file_is_read_once(mock_post_authentication_valid, monkeypatch, auth_service):
+    reads = []
+    auth_info = _AuthInfo()
+    auth_info.__dict__ = {'url': 'test', 'username': 'hello', 'password': 'test', 'token_name': 'token'}
+    monkeypatch.setattr(app.auth, '_read_auth_info_from_file', lambda file_path: reads.append(file_path) or auth_info)
+
+    auth_service.get_auth_token()
+    auth_service.get_auth_token()
+    assert len(reads) == 1
+
+
+def test_ensure_auth_token_skips_valid_token(monkeypatch, auth_service):
+    monkeypatch.setattr(requests.Session, 'request', lambda *args, **kwargs: pytest.fail('should not authenticate'))
+    auth_service.auth_token = 'token'
+    auth_service.token_expires_at = time.time() + 3600
+    assert auth_service.ensure_auth_token() == 200
+
+
+def test_rebounce_on_401_retries_once(mock_post_authentication_valid,
+                                      patch_file_open_for_auth_info, auth_service):
+    calls = []
+    status = auth_service.rebounce_on_401(lambda *args, **kwargs: calls.append(kwargs) or 401)
+    assert status == 401
+    assert len(calls) == 2
+    assert calls[-1]['headers'] == {'Authorization': 'Bearer token'}
+
+
+def test_concurrent_401s_share_one_refresh(monkeypatch, patch_file_open_for_auth_info, auth_service):
+    logins = []
+
+    class MockedAuthResponse(MockedResponse):
+        status_code = 200
+        def json(self):
+            return {'token': 'token-%s' % len(logins)}
+
+    def mocked_post(*args, **kwargs):
+        logins.append(1)
+        time.sleep(0.05)
+        return MockedAuthResponse()
+
+    monkeypatch.setattr(requests.Session, 'request', mocked_post)
+    auth_service.auth_token = 'expired'
+
+    def send(headers=None):
+        return 401 if headers == {'Authorization': 'Bearer expired'} else 200
+
+    threads = [threading.Thread(target=auth_service.rebounce_on_401, args=(send,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(logins) == 1
+    assert auth_service.auth_token == 'token-1'
+
+
+@pytest.mark.parametrize('lifetime,expected_delay', [(3600, 3540), (90, 45), (10, 30), (-10, 30)])
+def test_refresh_is_not_scheduled_immediately(monkeypatch, patch_file_open_for_auth_info, auth_service,
+                                              lifetime, expected_delay):
+    now = 1573000000
+    delays = []
+
+    class MockedAuthResponse(MockedResponse):
+        status_code = 200
+        def json(self):
+            return {'token': _make_jwt({'exp': now + lifetime})}
+
+    class Timer:
+        def __init__(self, delay, function, args=None):
+            delays.append(delay)
+        def start(self):
+            pass
+
+    monkeypatch.setattr(requests.Session, 'request', lambda *args, **kwargs: MockedAuthResponse())
+    monkeypatch.setattr(app.auth.time, 'time', lambda: now)
+    monkeypatch.setattr(app.auth.threading, 'Timer', Timer)
+    monkeypatch.setattr(app.auth, 'AUTH_MIN_REFRESH_DELAY', 30)
+
+    assert auth_service.get_auth_token() == 200
+    assert delays == [expected_delay]
@@ -0,0 +1,177 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import app.backfill
+from app.backfill import backfill_sentiment, Throttle
+
+
+class TweetObj:
+    def __init__(self, tweet_id, content):
+        self.tweet_id = tweet_id
+        self.content = content
+        self.date_created = None
+        self.polarity = None
+        self.subjectivity = None
+        self.tone = None
+        self.sentiment_version = None
+
+
+class QuerySet:
+    def __init__(self, tweets):
+        self.tweets = sorted(tweets, key=lambda tweet: tweet.tweet_id)
+
+    def filter(self, tweet_id__gt):
+        return QuerySet([tweet for tweet in self.tweets if tweet.tweet_id > tweet_id__gt])
+
+    def iter_chunks(self, chunk_size, fields=None):
+        for i in range(0, len(self.tweets), chunk_size):
+            yield self.tweets[i:i + chunk_size]
+
+
+class TweetObjects(QuerySet):
+    def __init__(self, tweets):
+        super().__init__(tweets)
+        self.updates = []
+        self.fail_on_update = None
+
+    def get_unscored(self, version):
+        return QuerySet([tweet for tweet in self.tweets if tweet.sentiment_version != version])
+
+    def bulk_update_sentiment(self, tweets):
+        if len(self.updates) == self.fail_on_update:
+            raise Exception('connection lost')
+
+        self.updates.append([tweet.tweet_id for tweet in tweets])
+
+
+class SentimentBucketObjects:
+    def __init__(self):
+        self.polarity = 0.0
+
+    def add_tweets(self, tweets, sign=1):
+        self.polarity += sign * sum(tweet.polarity for tweet in tweets)
+
+
+class BackfillCheckpointObjects:
+    def __init__(self):
+        self.checkpoints = {}
+
+    def get_last_tweet_id(self, name, version):
+        checkpoint = self.checkpoints.get(name)
+        return checkpoint[1] if checkpoint is not None and checkpoint[0] == version else None
+
+    def save_progress(self, name, version, last_tweet_id, processed):
+        self.checkpoints[name] = (version, last_tweet_id)
+
+    def clear(self, name):
+        self.checkpoints.pop(name, None)
+
+
+class DataVersionObjects:
+    def __init__(self):
+        self.bumps = 0
+
+    def bump(self, name='tweets', last_tweet_id=None):
+        self.bumps += 1
+
+
+@pytest.fixture
+def mock_tweets(monkeypatch):
+    class Tweet:
+        objects = TweetObjects([TweetObj(i, 'happy' if i % 2 else 'sad') for i in range(5, 0, -1)])
+
+    class SentimentBucket:
+        objects = SentimentBucketObjects()
+
+    class BackfillCheckpoint:
+        objects = BackfillCheckpointObjects()
+
+    class DataVersion:
+        objects = DataVersionObjects()
+
+    monkeypatch.setattr(app.backfill, 'Tweet', Tweet)
+    monkeypatch.setattr(app.backfill, 'SentimentBucket', SentimentBucket)
+    monkeypatch.setattr(app.backfill, 'BackfillCheckpoint', BackfillCheckpoint)
+    monkeypatch.setattr(app.backfill, 'DataVersion', DataVersion)
+    Tweet.objects.buckets = SentimentBucket.objects
+    Tweet.objects.checkpoints = BackfillCheckpoint.objects
+    Tweet.objects.versions = DataVersion.objects
+    yield Tweet.objects
+
+
+def test_backfill_scores_in_tweet_id_order(mock_tweets):
+    assert backfill_sentiment(batch_size=2, workers=1) == 5
+    assert mock_tweets.updates == [[1, 2], [3, 4], [5]]
+    assert mock_tweets.versions.bumps == 3
+    assert all(tweet.tone is not None for tweet in mock_tweets.tweets)
+    assert mock_tweets.checkpoints.checkpoints == {}
+
+
+def test_backfill_scores_in_worker_processes(mock_tweets):
+    assert backfill_sentiment(batch_size=2, workers=2) == 5
+    assert mock_tweets.updates == [[1, 2], [3, 4], [5]]
+    assert [tweet.tone for tweet in mock_tweets.tweets] == ['positive', 'negative'] * 2 + ['positive']
+
+
+def test_backfill_pool_works_without_an_initializer(mock_tweets, monkeypatch):
+    # the signature of ProcessPoolExecutor on Python 3.6
+    def process_pool(max_workers=None):
+        return ProcessPoolExecutor(max_workers=max_workers)
+
+    monkeypatch.setattr(app.backfill, 'ProcessPoolExecutor', process_pool)
+    assert backfill_sentiment(batch_size=2, workers=2) == 5
+    assert mock_tweets.updates == [[1, 2], [3, 4], [5]]
+
+
+def test_worker_priority_is_lowered_once(monkeypatch):
+    nice = []
+    monkeypatch.setattr(app.backfill, '_priority_lowered', False)
+    monkeypatch.setattr(app.backfill.os, 'nice', lambda niceness: nice.append(niceness))
+    app.backfill._lower_priority(10)
+    app.backfill._lower_priority(10)
+    assert nice == [10]
+
+
+def test_backfill_resumes_after_scored_tweets(mock_tweets):
+    backfill_sentiment(batch_size=10, workers=1)
+    mock_tweets.updates = []
+    assert backfill_sentiment(batch_size=10, workers=1) == 0
+    assert mock_tweets.updates == []
+
+
+def test_backfill_resumes_from_checkpoint(mock_tweets):
+    mock_tweets.fail_on_update = 1
+    with pytest.raises(Exception):
+        backfill_sentiment(batch_size=2, workers=1, rescore=True)
+
+    assert mock_tweets.checkpoints.checkpoints == {app.backfill.RESCORE_JOB: (1, 2)}
+
+    mock_tweets.fail_on_update = None
+    assert backfill_sentiment(batch_size=2, workers=1, rescore=True) == 3
+    assert mock_tweets.updates == [[1, 2], [3, 4], [5]]
+
+
+def test_backfill_moves_bucket_scores(mock_tweets):
+    backfill_sentiment(batch_size=10, workers=1)
+    polarity = mock_tweets.buckets.polarity
+    assert polarity == pytest.approx(sum(tweet.polarity for tweet in mock_tweets.tweets))
+
+    # rescoring with a new version replaces the old scores in the buckets
+    assert backfill_sentiment(batch_size=10, version=2, workers=1) == 5
+    assert mock_tweets.buckets.polarity == pytest.approx(polarity)
+
+
+def test_throttle_limits_the_rate():
+    now = [0.0]
+    sleeps = []
+    throttle = Throttle(max_rate=100, clock=lambda: now[0], sleep=sleeps.append)
+
+    throttle.wait(50)
+    now[0] = 0.2
+    throttle.wait(50)
+    assert sleeps == [pytest.approx(0.5), pytest.approx(0.8)]
+
+    throttle = Throttle(max_rate=0, clock=lambda: now[0], sleep=sleeps.append)
+    throttle.wait(1000)
+    assert len(sleeps) == 2
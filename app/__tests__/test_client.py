@@ -0,0 +1,73 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from app.client import HttpClient, HttpClientMixin
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args, **kwargs):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    server = HTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield 'http://127.0.0.1:%s' % server.server_port
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_requests_reuse_connections(local_server):
+    client = HttpClient()
+    for _ in range(5):
+        assert client.get(local_server).status_code == 200
+
+    stats = client.stats()[local_server]
+    assert stats['connections'] == 1
+    assert stats['requests'] == 5
+    assert stats['reuse_rate'] == 0.8
+    client.close()
+
+
+def test_request_sets_default_timeout(monkeypatch):
+    client = HttpClient(timeout=(1, 2))
+    captured = {}
+
+    def mocked_request(method, url, **kwargs):
+        captured.update(kwargs)
+
+    monkeypatch.setattr(client._session, 'request', mocked_request)
+    client.post('http://test')
+    assert captured['timeout'] == (1, 2)
+
+    client.get('http://test', timeout=5)
+    assert captured['timeout'] == 5
+
+
+def test_mixins_share_one_client():
+    class A(HttpClientMixin):
+        pass
+
+    class B(HttpClientMixin):
+        pass
+
+    class C(A, B):
+        pass
+
+    client = HttpClient()
+    assert C(http_client=client).http is client
+    assert isinstance(C().http, HttpClient)
@@ -0,0 +1,94 @@
+import threading
+import time
+
+from app.bot import TrumpBotMessenger
+from app.delivery import DeliveryEngine
+
+
+class TweetObj:
+    def __init__(self, tweet_id, destination='webhook'):
+        self.tweet_id = tweet_id
+        self.destination = destination
+        self.response_code = 404
+
+
+class RecordingSender:
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.sent = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, tweet):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+            self.sent.append(tweet)
+
+        return 200 + tweet.tweet_id
+
+
+def test_deliver_sets_response_codes():
+    tweets = [TweetObj(i) for i in range(10)]
+    DeliveryEngine(max_in_flight=4).deliver(tweets, RecordingSender())
+    assert [tweet.response_code for tweet in tweets] == [200 + i for i in range(10)]
+
+
+def test_deliver_bounds_in_flight_sends():
+    sender = RecordingSender()
+    DeliveryEngine(max_in_flight=3).deliver([TweetObj(i) for i in range(12)], sender)
+    assert len(sender.sent) == 12
+    assert 1 < sender.max_in_flight <= 3
+
+
+def test_deliver_keeps_order_per_destination():
+    tweets = [TweetObj(i, destination='a' if i % 2 else 'b') for i in range(10)]
+    sender = RecordingSender()
+    DeliveryEngine(max_in_flight=4, ordered=True).deliver(
+        tweets, sender, destination=lambda tweet: tweet.destination)
+
+    for destination in ('a', 'b'):
+        sent = [tweet.tweet_id for tweet in sender.sent if tweet.destination == destination]
+        assert sent == sorted(sent)
+
+    assert sender.max_in_flight == 2
+
+
+def test_deliver_leaves_response_code_when_send_raises():
+    def send(tweet):
+        if tweet.tweet_id == 1:
+            raise Exception('connection refused')
+        return 200
+
+    tweets = [TweetObj(i) for i in range(3)]
+    DeliveryEngine(max_in_flight=2).deliver(tweets, send)
+    assert [tweet.response_code for tweet in tweets] == [200, 404, 200]
+
+
+def test_ordered_deliver_without_destination_is_concurrent():
+    sender = RecordingSender()
+    DeliveryEngine(max_in_flight=3, ordered=True).deliver([TweetObj(i) for i in range(12)], sender)
+    assert len(sender.sent) == 12
+    assert 1 < sender.max_in_flight <= 3
+
+
+def test_ordered_bot_sends_oldest_tweet_first(tmpdir, monkeypatch):
+    request_file = tmpdir.join('request.json')
+    request_file.write('{"content": "{{ content }}", "url": "https://my.cool.website"}')
+    bot = TrumpBotMessenger(file_path=str(request_file), delivery_engine=DeliveryEngine(max_in_flight=4, ordered=True))
+    sender = RecordingSender()
+
+    def send(tweet):
+        # older tweets take longer so concurrent sends would finish newest first
+        sender.delay = 0.05 - tweet.tweet_id * 0.01
+        return sender(tweet)
+
+    monkeypatch.setattr(bot, '_send_tweet', send)
+    bot._deliver_tweets([TweetObj(i) for i in (3, 1, 4, 0, 2)])
+    assert [tweet.tweet_id for tweet in sender.sent] == [0, 1, 2, 3, 4]
+    assert sender.max_in_flight == 1
@@ -0,0 +1,107 @@
+import datetime
+import gzip
+
+import pytest
+
+import app.export
+from app.export import get_export_fields, iter_tweet_batches, stream_export, DEFAULT_EXPORT_FIELDS
+
+
+class QuerySet:
+    def __init__(self, tweets, calls):
+        self.tweets = tweets
+        self.calls = calls
+
+    def _call(self, name, *args, tweets=None, **kwargs):
+        self.calls.append((name, args, kwargs))
+        return QuerySet(self.tweets if tweets is None else tweets, self.calls)
+
+    def all(self):
+        return self._call('all')
+
+    def filter(self, tweet_id__gt):
+        return self._call('filter', tweets=[tweet for tweet in self.tweets if tweet['tweet_id'] > tweet_id__gt],
+                          tweet_id__gt=tweet_id__gt)
+
+    def order_by(self, key):
+        return self._call('order_by', key)
+
+    def get_filtered_tweets(self, fields):
+        return self._call('get_filtered_tweets', fields)
+
+    def batch_size(self, size):
+        return self._call('batch_size', size)
+
+    def timeout(self, enabled):
+        return self._call('timeout', enabled)
+
+    def limit(self, size):
+        return self._call('limit', size, tweets=self.tweets[:size])
+
+    def __iter__(self):
+        return iter(self.tweets)
+
+
+@pytest.fixture
+def mock_tweets(monkeypatch):
+    calls = []
+    tweets = [{'_id': i, 'tweet_id': i, 'content': 'tweet %s' % i, 'response_code': 200,
+               'date_created': datetime.datetime(2020, 1, i)} for i in range(1, 6)]
+
+    class Tweet:
+        objects = QuerySet(tweets, calls)
+
+    monkeypatch.setattr(app.export, 'Tweet', Tweet)
+    yield calls
+
+
+def test_get_export_fields():
+    assert get_export_fields(None) == DEFAULT_EXPORT_FIELDS
+    assert get_export_fields('tweet_id, tone') == ('tweet_id', 'tone')
+    with pytest.raises(Exception):
+        get_export_fields('tweet_id,password')
+
+
+def test_iter_tweet_batches(mock_tweets):
+    batches = list(iter_tweet_batches(since_id=1, limit=3, fields=('tweet_id',), batch_size=2))
+    assert batches == [[{'tweet_id': 2}, {'tweet_id': 3}], [{'tweet_id': 4}]]
+    assert [call[0] for call in mock_tweets] == [
+        'filter', 'order_by', 'get_filtered_tweets', 'batch_size', 'timeout', 'limit']
+    assert ('timeout', (False,), {}) in mock_tweets
+
+
+def test_stream_export_formats(mock_tweets):
+    ndjson = b''.join(stream_export(fields=('tweet_id',), batch_size=2))
+    assert ndjson == b''.join(b'{"tweet_id": %d}\n' % i for i in range(1, 6))
+
+    array = b''.join(stream_export('json', fields=('tweet_id',), batch_size=2))
+    assert array == b'[{"tweet_id": 1},{"tweet_id": 2},{"tweet_id": 3},{"tweet_id": 4},{"tweet_id": 5}]'
+
+    assert b''.join(stream_export('json', since_id=5)) == b'[]'
+    with pytest.raises(Exception):
+        stream_export('csv')
+
+
+def test_export_route(test_client, mock_tweets):
+    resp = test_client.get('/json/export?since_id=3&fields=tweet_id,date_created')
+    assert resp.status_code == 200
+    assert resp.mimetype == 'application/x-ndjson'
+    lines = resp.get_data().splitlines()
+    assert len(lines) == 2
+    assert b'"tweet_id": 4' in lines[0]
+    assert b'Sat, 04 Jan 2020' in lines[0]
+
+
+def test_export_route_gzip(test_client, mock_tweets):
+    resp = test_client.get('/json/export?format=json&limit=2', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert resp.mimetype == 'application/json'
+    tweets = app.export.json.loads(gzip.decompress(resp.get_data()))
+    assert [tweet['tweet_id'] for tweet in tweets] == [1, 2]
+
+
+def test_export_route_rejects_bad_arguments(test_client, mock_tweets):
+    assert test_client.get('/json/export?fields=password').status_code == 400
+    assert test_client.get('/json/export?since_id=abc').status_code == 400
+    assert test_client.get('/json/export?format=csv').status_code == 400
+    assert mock_tweets == []
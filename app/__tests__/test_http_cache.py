@@ -0,0 +1,111 @@
+import datetime
+
+import pytest
+
+import app.http_cache
+import app.server
+from app.http_cache import DataVersionCache, get_validators
+
+
+class Version:
+    def __init__(self, last_tweet_id=10, counter=3, updated_at=datetime.datetime(2020, 1, 2, 3, 4, 5, 600)):
+        self.last_tweet_id = last_tweet_id
+        self.counter = counter
+        self.updated_at = updated_at
+
+
+class DataVersionObjects:
+    def __init__(self):
+        self.version = Version()
+        self.reads = 0
+
+    def get_version(self, name='tweets'):
+        self.reads += 1
+        return self.version
+
+
+class TweetObjects:
+    def __init__(self):
+        self.reads = 0
+
+    def all(self):
+        self.reads += 1
+        return []
+
+
+@pytest.fixture
+def mock_versions(monkeypatch):
+    class DataVersion:
+        objects = DataVersionObjects()
+
+    class Tweet:
+        objects = TweetObjects()
+
+    monkeypatch.setattr(app.http_cache, 'DataVersion', DataVersion)
+    monkeypatch.setattr(app.http_cache, 'data_versions', DataVersionCache(ttl=0))
+    monkeypatch.setattr(app.server, 'Tweet', Tweet)
+    yield DataVersion.objects, Tweet.objects
+
+
+def test_get_validators():
+    etag, last_modified = get_validators(Version())
+    assert etag == '10-3'
+    assert last_modified == datetime.datetime(2020, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+
+    now = datetime.datetime(2020, 1, 2, 5, 30, tzinfo=datetime.timezone.utc).timestamp()
+    etag, last_modified = get_validators(Version(), window=3600, now=now)
+    assert etag == '10-3-%d' % (now - 1800)
+    assert last_modified == datetime.datetime(2020, 1, 2, 5, tzinfo=datetime.timezone.utc)
+
+
+def test_data_version_cache_expires(mock_versions):
+    versions, _ = mock_versions
+    now = [0]
+    cache = DataVersionCache(ttl=1, clock=lambda: now[0])
+    cache.get()
+    cache.get()
+    assert versions.reads == 1
+    now[0] = 2
+    assert cache.get().counter == 3
+    assert versions.reads == 2
+
+
+def test_json_answers_304_without_a_query(test_client, mock_versions):
+    versions, tweets = mock_versions
+    resp = test_client.get('/json')
+    assert resp.status_code == 200
+    assert resp.headers['ETag'] == '"10-3"'
+    assert resp.headers['Last-Modified'] == 'Thu, 02 Jan 2020 03:04:05 GMT'
+    assert 'must-revalidate' in resp.headers['Cache-Control']
+
+    resp = test_client.get('/json', headers={'If-None-Match': '"10-3"'})
+    assert resp.status_code == 304
+    resp = test_client.get('/json', headers={'If-Modified-Since': 'Thu, 02 Jan 2020 03:04:05 GMT'})
+    assert resp.status_code == 304
+    assert tweets.reads == 1
+
+    versions.version = Version(counter=4)
+    resp = test_client.get('/json', headers={'If-None-Match': '"10-3"'})
+    assert resp.status_code == 200
+    assert resp.headers['ETag'] == '"10-4"'
+    assert tweets.reads == 2
+
+
+def test_nothing_is_cached_without_a_version(test_client, mock_versions):
+    versions, tweets = mock_versions
+    versions.version = None
+    resp = test_client.get('/json', headers={'If-None-Match': '*'})
+    assert resp.status_code == 200
+    assert 'ETag' not in resp.headers
+
+
+def test_graphql_posts_get_no_validators(test_client, mock_versions):
+    versions, tweets = mock_versions
+    resp = test_client.post('/graphql', json={'query': '{ __typename }'})
+    assert resp.status_code == 200
+    assert 'ETag' not in resp.headers
+
+    resp = test_client.get('/graphql?query={__typename}')
+    etag = resp.headers['ETag']
+    assert etag.startswith('"10-3-')
+    assert test_client.get('/graphql?query={__typename}', headers={'If-None-Match': etag}).status_code == 304
@@ -0,0 +1,209 @@
+import datetime
+
+import pytest
+from pymongo import WriteConcern, UpdateOne
+from pymongo.read_concern import ReadConcern
+from pymongo.errors import BulkWriteError
+
+from app.models import Tweet, SentimentBucket, DataVersion, EPOCH
+
+
+class BulkWriteResult:
+    def __init__(self, details):
+        self.bulk_api_result = details
+
+
+class MockedCollection:
+    def __init__(self, details=None, error=None):
+        self.details = details or {}
+        self.error = error
+        self.operations = []
+
+    def bulk_write(self, operations, ordered=True):
+        assert ordered is False
+        self.operations.append(operations)
+        if self.error is not None:
+            raise self.error
+
+        return BulkWriteResult(self.details)
+
+
+@pytest.fixture
+def mock_collection(monkeypatch):
+    collection = MockedCollection()
+    monkeypatch.setattr(Tweet, '_get_collection', classmethod(lambda cls: collection))
+    yield collection
+
+
+def test_bulk_upsert_sends_one_batch(mock_collection):
+    mock_collection.details = {'nUpserted': 1, 'nMatched': 2, 'nModified': 1}
+    date = datetime.datetime(2020, 1, 2, 3, 45)
+    tweets = [Tweet(content='tweet %s' % i, tweet_id=i, response_code=200, date_created=date) for i in range(3)]
+
+    report = Tweet.objects.bulk_upsert(tweets)
+    assert (report.inserted, report.updated, report.duplicates) == (1, 1, 1)
+
+    operations = mock_collection.operations[0]
+    assert len(mock_collection.operations) == 1
+    assert len(operations) == 3
+    assert operations[0] == UpdateOne({'tweet_id': 0}, {
+        '$setOnInsert': {'date_created': date, 'content': 'tweet 0'},
+        '$set': {'response_code': 200, 'attempts': 0, 'next_attempt_at': None,
+                 'last_error': None, 'delivery_state': None}
+    }, upsert=True)
+
+
+def test_bulk_upsert_counts_duplicate_key_errors(mock_collection):
+    mock_collection.error = BulkWriteError({
+        'nUpserted': 1, 'nMatched': 0, 'nModified': 0,
+        'writeErrors': [{'index': 1, 'code': 11000, 'errmsg': 'duplicate key'}]
+    })
+    tweets = [Tweet(content='tweet', tweet_id=i) for i in range(2)]
+
+    report = Tweet.objects.bulk_upsert(tweets)
+    assert (report.inserted, report.updated, report.duplicates) == (1, 0, 1)
+
+
+def test_bulk_upsert_reports_inserted_indexes(mock_collection):
+    mock_collection.details = {'nUpserted': 1, 'upserted': [{'index': 1, '_id': 'id'}]}
+    report = Tweet.objects.bulk_upsert([Tweet(content='tweet', tweet_id=i) for i in range(2)])
+    assert report.inserted_indexes == [1]
+
+
+def test_bulk_upsert_raises_other_errors(mock_collection):
+    mock_collection.error = BulkWriteError({
+        'writeErrors': [{'index': 0, 'code': 121, 'errmsg': 'validation failed'}]
+    })
+    with pytest.raises(BulkWriteError):
+        Tweet.objects.bulk_upsert([Tweet(content='tweet', tweet_id=1)])
+
+
+def test_bulk_write_skips_empty_batches(mock_collection):
+    report = Tweet.objects.bulk_update_delivery([])
+    assert report.inserted == report.updated == report.duplicates == 0
+    assert mock_collection.operations == []
+
+
+def test_bulk_update_delivery(mock_collection):
+    mock_collection.details = {'nMatched': 1, 'nModified': 1}
+    tweet = Tweet(content='tweet', tweet_id=1, response_code=500, attempts=2,
+                  delivery_state='retrying', last_error='HTTP 500')
+    report = Tweet.objects.bulk_update_delivery([tweet])
+    assert report.updated == 1
+
+    assert mock_collection.operations[0] == [UpdateOne({'tweet_id': 1}, {'$set': {
+        'response_code': 500, 'attempts': 2, 'next_attempt_at': None,
+        'last_error': 'HTTP 500', 'delivery_state': 'retrying'
+    }})]
+
+
+def test_sentiment_buckets_add_tweets(monkeypatch):
+    collection = MockedCollection()
+    monkeypatch.setattr(SentimentBucket, '_get_collection', classmethod(lambda cls: collection))
+    date = datetime.datetime(2020, 1, 2, 3, 45)
+    tweets = [
+        Tweet(content='happy', tweet_id=1, date_created=date, polarity=0.8, subjectivity=1.0, tone='positive'),
+        Tweet(content='sad', tweet_id=2, date_created=date, polarity=-0.5, subjectivity=1.0, tone='negative'),
+        Tweet(content='unscored', tweet_id=3, date_created=date)
+    ]
+
+    SentimentBucket.objects.add_tweets(tweets, sign=-1)
+    update = {'$inc': {
+        'count': -2, 'polarity_sum': pytest.approx(-0.3), 'subjectivity_sum': -2.0,
+        'positive': -1, 'negative': -1, 'neutral': 0
+    }}
+    assert collection.operations == [[
+        UpdateOne({'granularity': 'hour', 'start': datetime.datetime(2020, 1, 2, 3)}, update, upsert=True),
+        UpdateOne({'granularity': 'day', 'start': datetime.datetime(2020, 1, 2)}, update, upsert=True),
+        UpdateOne({'granularity': 'all', 'start': EPOCH}, update, upsert=True),
+    ]]
+
+
+class MockedCursor:
+    def __init__(self, documents):
+        self.documents = iter(documents)
+        self.closed = False
+
+    def __iter__(self):
+        return self.documents
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.closed = True
+
+
+def test_iter_chunks_streams_one_cursor(mock_collection):
+    cursor = MockedCursor([{'tweet_id': i, 'content': 'tweet %s' % i} for i in range(5)])
+    calls = []
+
+    def find(query, projection, **kwargs):
+        calls.append((query, projection, kwargs))
+        return cursor
+
+    mock_collection.find = find
+    chunks = list(Tweet.objects.filter(tweet_id__gt=0).iter_chunks(2, fields=('tweet_id', 'content')))
+
+    assert [[tweet.tweet_id for tweet in chunk] for chunk in chunks] == [[0, 1], [2, 3], [4]]
+    assert cursor.closed
+    query, projection, kwargs = calls[0]
+    assert len(calls) == 1
+    assert query == {'tweet_id': {'$gt': 0}}
+    assert projection == {'tweet_id': 1, 'content': 1}
+    assert kwargs['no_cursor_timeout'] is True
+    assert kwargs['sort'] == [('tweet_id', 1)]
+
+
+def test_get_sentiment_history_groups_in_mongo(mock_collection):
+    pipelines = []
+    start = datetime.datetime(2020, 1, 1)
+    end = datetime.datetime(2020, 2, 1)
+
+    def aggregate(pipeline):
+        pipelines.append(pipeline)
+        return [{'_id': start, 'count': 2, 'average_polarity': 0.5, 'average_subjectivity': 0.4,
+                 'positive': 2, 'negative': 0, 'neutral': 0}]
+
+    mock_collection.aggregate = aggregate
+    history = Tweet.objects.get_sentiment_history(start, end, granularity='hour')
+
+    assert history == [{'start': start, 'count': 2, 'average_polarity': 0.5, 'average_subjectivity': 0.4,
+                        'positive': 2, 'negative': 0, 'neutral': 0}]
+    match, group, sort = pipelines[0]
+    assert match == {'$match': {'date_created': {'$gte': start, '$lt': end}, 'polarity': {'$ne': None}}}
+    assert set(group['$group']['_id']['$dateFromParts']) == {'year', 'month', 'day', 'hour'}
+    assert sort == {'$sort': {'_id': 1}}
+
+    with pytest.raises(Exception):
+        Tweet.objects.get_sentiment_history(start, end, granularity='week')
+
+
+def test_data_version_bump(monkeypatch):
+    updates = []
+
+    class UpdateResult:
+        raw_result = {'n': 1, 'updatedExisting': True}
+
+    class Collection:
+        write_concern = WriteConcern()
+        read_concern = ReadConcern()
+
+        def with_options(self, **kwargs):
+            return self
+
+        def update_one(self, query, update, upsert=False, **kwargs):
+            updates.append((query, update, upsert))
+            return UpdateResult()
+
+    collection = Collection()
+    monkeypatch.setattr(DataVersion, '_get_collection', classmethod(lambda cls: collection))
+    DataVersion.objects.bump(last_tweet_id=42)
+    DataVersion.objects.bump()
+
+    query, update, upsert = updates[0]
+    assert query == {'name': 'tweets'}
+    assert upsert is True
+    assert update['$inc'] == {'counter': 1}
+    assert update['$max'] == {'last_tweet_id': 42}
+    assert '$max' not in updates[1][1]
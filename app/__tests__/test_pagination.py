@@ -0,0 +1,109 @@
+import pytest
+
+from app.pagination import KeysetPage, encode_cursor, decode_cursor
+
+
+class Tweet:
+    def __init__(self, tweet_id):
+        self.tweet_id = tweet_id
+
+
+def get_tweet_id(tweet):
+    return tweet['tweet_id'] if isinstance(tweet, dict) else tweet.tweet_id
+
+
+class QuerySet:
+    def __init__(self, tweets, counts=None, projections=None):
+        self.tweets = tweets
+        self.counts = counts if counts is not None else []
+        self.projections = projections if projections is not None else []
+
+    def _copy(self, tweets):
+        return QuerySet(tweets, self.counts, self.projections)
+
+    def get_filtered_tweets(self, fields):
+        self.projections.append(list(fields))
+        return self._copy([{field: getattr(tweet, field) for field in fields} for tweet in self.tweets])
+
+    def filter(self, tweet_id__lt=None, tweet_id__gt=None):
+        return self._copy([
+            tweet for tweet in self.tweets
+            if (tweet_id__lt is None or get_tweet_id(tweet) < tweet_id__lt)
+            and (tweet_id__gt is None or get_tweet_id(tweet) > tweet_id__gt)
+        ])
+
+    def order_by(self, key):
+        return self._copy(sorted(self.tweets, key=get_tweet_id, reverse=key.startswith('-')))
+
+    def __iter__(self):
+        return iter(self.tweets)
+
+    def limit(self, size):
+        return self.tweets[:size]
+
+    def count(self):
+        self.counts.append(len(self.tweets))
+        return len(self.tweets)
+
+
+@pytest.fixture
+def tweets():
+    return QuerySet([Tweet(i) for i in range(1, 8)])
+
+
+def ids(page):
+    return [get_tweet_id(tweet) for tweet in page.tweets]
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(1234)) == 1234
+    with pytest.raises(Exception):
+        decode_cursor('not a cursor')
+    with pytest.raises(Exception):
+        decode_cursor(encode_cursor('abc'))
+
+
+def test_pages_forward(tweets):
+    page = KeysetPage(tweets, first=3)
+    assert ids(page) == [7, 6, 5]
+    assert page.has_next_page and not page.has_previous_page
+
+    page = KeysetPage(tweets, first=3, after=page.end_cursor)
+    assert ids(page) == [4, 3, 2]
+    assert page.has_next_page
+
+    page = KeysetPage(tweets, first=3, after=page.end_cursor)
+    assert ids(page) == [1]
+    assert not page.has_next_page
+
+
+def test_pages_backward(tweets):
+    page = KeysetPage(tweets, last=2, before=encode_cursor(3))
+    assert ids(page) == [5, 4]
+    assert page.has_previous_page and not page.has_next_page
+    assert page.get_cursors() == [encode_cursor(5), encode_cursor(4)]
+
+    page = KeysetPage(tweets, last=2, before=page.start_cursor)
+    assert ids(page) == [7, 6]
+    assert not page.has_previous_page
+
+
+def test_page_size_is_capped(tweets, monkeypatch):
+    monkeypatch.setattr('app.pagination.MAX_PAGE_SIZE', 2)
+    assert ids(KeysetPage(tweets, first=50)) == [7, 6]
+    with pytest.raises(Exception):
+        KeysetPage(tweets, first=1, last=1)
+
+
+def test_count_is_only_queried_when_called(tweets):
+    page = KeysetPage(tweets, first=2, after=encode_cursor(4))
+    assert tweets.counts == []
+    assert page.count() == 7
+    assert page.end_cursor == encode_cursor(2)
+    assert KeysetPage(QuerySet([]), first=2).end_cursor is None
+
+
+def test_pages_raw_documents(tweets):
+    page = KeysetPage(tweets.get_filtered_tweets(['tweet_id']), first=2, after=encode_cursor(6))
+    assert page.tweets == [{'tweet_id': 5}, {'tweet_id': 4}]
+    assert page.get_cursors() == [encode_cursor(5), encode_cursor(4)]
@@ -0,0 +1,76 @@
+import pytest
+
+from app.parsers import (
+    BeautifulSoupTweetParser,
+    TokenizerTweetParser,
+    get_parser,
+    PARSERS
+)
+
+TIMELINE_BODY = """
+<ol class="timeline-TweetList">
+  <li class="timeline-TweetList-tweet">
+    <div class="timeline-Tweet js-tweetIdInfo u-textBreak" data-click-to-open-target="https://twitter.com/x" data-tweet-id="300">
+      <div class="timeline-Tweet-author">Donald J. Trump</div>
+      <p class="timeline-Tweet-text" lang="en" dir="ltr">MAKE &amp; <a href="https://t.co/a">#MAGA</a>
+"great"</p>
+    </div>
+  </li>
+  <li class="timeline-TweetList-tweet">
+    <div class="timeline-Tweet timeline-Tweet--isRetweet" data-tweet-id="200">
+      <div class="timeline-Tweet-retweetCredit">Retweeted</div>
+    </div>
+  </li>
+  <li class="timeline-TweetList-tweet">
+    <div class="timeline-Tweet" data-tweet-id="100">
+      <p class="timeline-Tweet-text">An older tweet</p>
+    </div>
+  </li>
+</ol>
+"""
+
+
+@pytest.fixture(params=[TokenizerTweetParser, BeautifulSoupTweetParser])
+def parser(request):
+    yield request.param()
+
+
+def test_parse_pairs_each_tweet_with_its_container(parser):
+    tweets = parser.parse(TIMELINE_BODY)
+    assert tweets == [
+        (300, 'MAKE & #MAGA\n"great"'),
+        (100, 'An older tweet'),
+    ]
+
+
+def test_parse_skips_tweets_that_are_not_newer(parser):
+    assert parser.parse(TIMELINE_BODY, stop_at_id=100) == [(300, 'MAKE & #MAGA\n"great"')]
+    assert parser.parse(TIMELINE_BODY, stop_at_id=300) == []
+
+
+def test_parse_keeps_newer_tweets_below_older_ones(parser):
+    body = TIMELINE_BODY.replace('</ol>', """
+  <li class="timeline-TweetList-tweet">
+    <div class="timeline-Tweet" data-tweet-id="400">
+      <p class="timeline-Tweet-text">Below a pinned tweet</p>
+    </div>
+  </li>
+</ol>""")
+    assert parser.parse(body, stop_at_id=200) == [
+        (300, 'MAKE & #MAGA\n"great"'),
+        (400, 'Below a pinned tweet'),
+    ]
+
+
+def test_parse_empty_body(parser):
+    assert parser.parse('') == []
+
+
+def test_get_parser_returns_registered_parser():
+    for name, parser_class in PARSERS.items():
+        assert isinstance(get_parser(name), parser_class)
+
+
+def test_get_parser_falls_back_to_default(monkeypatch):
+    monkeypatch.setenv('TWEET_PARSER', 'I am not a valid parser')
+    assert isinstance(get_parser(), PARSERS.get('default'))
@@ -0,0 +1,113 @@
+import json
+
+import pytest
+
+import app.bot
+from app.bot import TweetExtractor, TrumpBotScheduler
+from app.polling import AdaptivePollInterval
+
+TIMELINE_RESPONSE = '__twttr.callbacks.tl_i0_profile({})'.format(json.dumps({
+    'headers': {'maxPosition': 2},
+    'body': '<div class="timeline-Tweet" data-tweet-id="2"><p class="timeline-Tweet-text">new</p></div>'
+}))
+
+
+@pytest.fixture
+def poll_interval():
+    yield AdaptivePollInterval(interval=30, min_interval=10, idle_interval=60, max_interval=300, factor=2)
+
+
+class MockedResponse:
+    def __init__(self, status_code=200, text=TIMELINE_RESPONSE, headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode('utf8')
+        self.headers = headers or {}
+
+
+class MockedHttpClient:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None):
+        self.requests.append(headers)
+        return self.responses.pop(0)
+
+
+def test_on_activity_polls_fast(poll_interval):
+    assert poll_interval.on_poll(200, tweets=3) == 10
+
+
+def test_on_idle_backs_off_up_to_idle_interval(poll_interval):
+    assert [poll_interval.on_poll(304, tweets=0) for _ in range(3)] == [60, 60, 60]
+    poll_interval.on_activity()
+    assert [poll_interval.on_idle() for _ in range(4)] == [20, 40, 60, 60]
+
+
+def test_on_error_backs_off_up_to_max_interval(poll_interval):
+    assert [poll_interval.on_poll(500, tweets=0) for _ in range(5)] == [60, 120, 240, 300, 300]
+    assert poll_interval.on_idle() == 60
+
+
+def test_on_rate_limited_honours_retry_after(poll_interval):
+    assert poll_interval.on_poll(429, tweets=0, retry_after=900) == 900
+    assert poll_interval.on_poll(429, tweets=0) == 300
+
+
+def test_get_tweets_sends_validators_of_previous_response():
+    http = MockedHttpClient(
+        MockedResponse(headers={'ETag': '"v1"', 'Last-Modified': 'Tue, 05 Nov 2019 12:00:00 GMT'}),
+        MockedResponse(status_code=304))
+    extractor = TweetExtractor(url='https://timeline', min_position='1', http_client=http)
+
+    assert [tweet.tweet_id for tweet in extractor.get_tweets()] == [2]
+    assert extractor.get_tweets() == []
+    assert http.requests == [{}, {'If-None-Match': '"v1"', 'If-Modified-Since': 'Tue, 05 Nov 2019 12:00:00 GMT'}]
+    assert extractor.last_status_code == 304
+
+
+def test_get_tweets_skips_unchanged_payloads():
+    http = MockedHttpClient(MockedResponse(), MockedResponse(), MockedResponse(status_code=429, headers={'Retry-After': '120'}))
+    extractor = TweetExtractor(url='https://timeline', min_position='1', http_client=http)
+
+    assert len(extractor.get_tweets()) == 1
+    assert extractor.get_tweets() == []
+    assert extractor.get_tweets() == []
+    assert extractor.last_status_code == 429
+    assert extractor.retry_after == 120
+
+
+def test_poll_refetches_tweets_that_could_not_be_stored(tmpdir, monkeypatch):
+    request_file = tmpdir.join('request.json')
+    request_file.write('{"content": "{{ content }}", "url": "https://my.cool.website"}')
+    http = MockedHttpClient(MockedResponse(headers={'ETag': '"v1"'}), MockedResponse(headers={'ETag': '"v1"'}))
+    bot = TrumpBotScheduler(file_path=str(request_file), http_client=http)
+    stored = []
+
+    def store_tweets(tweets):
+        if len(http.requests) == 1:
+            raise Exception('database unavailable')
+        stored.extend(tweets)
+        return tweets
+
+    class TweetObjects:
+        def get_last_tweet_id(self, source_account=None):
+            return 1
+
+    class Tweet:
+        objects = TweetObjects()
+
+        def __init__(self, **kwargs):
+            self.__dict__ = kwargs
+
+    monkeypatch.setattr(app.bot, 'Tweet', Tweet)
+    monkeypatch.setattr(bot, '_deliver_tweets', lambda tweets: tweets)
+    monkeypatch.setattr(bot, '_store_tweets', store_tweets)
+    monkeypatch.setattr(bot, 'reschedule_job', lambda *args, **kwargs: None)
+
+    bot._poll_latest_tweets()
+    assert stored == []
+    bot._poll_latest_tweets()
+    assert [tweet.tweet_id for tweet in stored] == [2]
+    assert http.requests == [{}, {}]
@@ -0,0 +1,111 @@
+import pytest
+from graphql.language.parser import parse
+
+import app.schema
+import app.server
+from app.pagination import MAX_PAGE_SIZE
+from app.query_cost import ClientBudgets, estimate_cost, _Deadline
+from app.schema import schema
+
+
+def estimate(query, variables=None):
+    return estimate_cost(schema, parse(query), variables=variables)
+
+
+def test_scalars_are_cheap_and_sentiment_is_expensive():
+    assert estimate('{ tweetById(tweetId: "1") { tweetId content } }').cost == 1
+    assert estimate('{ tweetById(tweetId: "1") { tweetId sentiment { tone } } }').cost == 6
+    assert estimate('{ overallSentiment { tone } }').cost == 10
+
+
+def test_lists_multiply_their_selections():
+    assert estimate('{ tweets(onlyToday: false) { sentiment { tone } } }').cost == 6000
+    connection = estimate('''query ($size: Int) { tweetsConnection(first: $size) {
+        totalCount edges { node { ...fields } } } }
+        fragment fields on TweetObj { tweetId sentiment { tone } }''', variables={'size': 50})
+    # connection + totalCount + 50 edges of an edge, a node and a sentiment
+    assert connection.cost == 1 + 10 + 50 * (1 + 1 + 5)
+    assert connection.depth == 5
+
+
+@pytest.mark.parametrize('size', [-100000, '10', 2.5, True])
+def test_invalid_page_sizes_count_as_the_largest_page(size):
+    query = 'query ($n: Int) { tweetsConnection(first: $n) { edges { node { tweetId } } } }'
+    # the connection + an edge and a node per tweet of the largest page
+    assert estimate(query, variables={'n': size}).cost == 1 + 2 * MAX_PAGE_SIZE
+    assert estimate(query, variables={'n': 10}).cost == 1 + 2 * 10
+
+
+def test_aliases_are_counted():
+    query = '{ %s }' % ' '.join('t%s: tweetById(tweetId: "%s") { tweetId }' % (i, i) for i in range(3))
+    result = estimate(query)
+    assert (result.aliases, result.cost) == (3, 3)
+
+
+def test_client_budgets_refill():
+    now = [0]
+    budgets = ClientBudgets(budget=60, clock=lambda: now[0])
+    assert budgets.spend('a', 50)
+    assert not budgets.spend('a', 20)
+    assert budgets.spend('b', 20)
+    now[0] = 10
+    assert budgets.spend('a', 20)
+    assert ClientBudgets(budget=0).spend('a', 10 ** 6)
+
+
+def test_client_budgets_are_not_refilled_by_negative_costs():
+    budgets = ClientBudgets(budget=60, clock=lambda: 0)
+    assert budgets.spend('a', -1000)
+    assert budgets.spend('a', 60)
+    assert not budgets.spend('a', 1)
+
+
+def test_deadline_stops_resolving():
+    deadline = _Deadline(10)
+    assert deadline.resolve(lambda root, info: 'resolved', None, None) == 'resolved'
+    deadline.deadline = 0
+    with pytest.raises(Exception):
+        deadline.resolve(lambda root, info: 'resolved', None, None)
+
+
+@pytest.mark.parametrize('query, error', [
+    ('{ tweets(onlyToday: false) { sentiment { tone } } }', 'costs 6000'),
+    ('{ %s }' % ' '.join('t%s: overallSentiment { tone }' % i for i in range(21)), '21 aliases'),
+])
+def test_expensive_queries_are_rejected(test_client, query, error):
+    resp = test_client.post('/graphql', json={'query': query})
+    assert resp.status_code == 400
+    assert error in resp.get_json()['errors'][0]['message']
+
+
+def test_negative_page_sizes_do_not_lower_the_cost(test_client):
+    query = '''query ($n: Int) { a: tweets { tweetId sentiment { tone } }
+        b: tweetsConnection(first: $n) { edges { node { tweetId } } } }'''
+    resp = test_client.post('/graphql', json={'query': query, 'variables': {'n': -100000}})
+    assert resp.status_code == 400
+    assert 'costs %s' % (6000 + 1 + 2 * MAX_PAGE_SIZE) in resp.get_json()['errors'][0]['message']
+
+
+def test_deep_queries_are_rejected(test_client, monkeypatch):
+    monkeypatch.setattr(app.server.graphql_backend, 'max_depth', 1)
+    resp = test_client.post('/graphql', json={'query': '{ tweetById(tweetId: "1") { sentiment { tone } } }'})
+    assert 'nested 3 levels deep' in resp.get_json()['errors'][0]['message']
+
+
+def test_client_budget_is_enforced(test_client, monkeypatch):
+    monkeypatch.setattr(app.server.graphql_backend, 'budgets', ClientBudgets(budget=15))
+    query = '{ overallSentiment { tone } }'
+    monkeypatch.setattr(app.schema, 'OverallSentiment', type('OverallSentiment', (), {
+        'polarity': 0.1, 'get_todays_tone_value': lambda self: 'positive'}))
+    assert test_client.post('/graphql', json={'query': query}).status_code == 200
+    resp = test_client.post('/graphql', json={'query': query})
+    assert resp.status_code == 400
+    assert 'budget' in resp.get_json()['errors'][0]['message']
+
+
+def test_graphiql_follows_the_setting(test_client, monkeypatch):
+    headers = {'Accept': 'text/html'}
+    monkeypatch.setitem(app.server.app.config, 'GRAPHIQL', False)
+    assert test_client.get('/graphql?query={__typename}', headers=headers).mimetype == 'application/json'
+    monkeypatch.setitem(app.server.app.config, 'GRAPHIQL', True)
+    assert test_client.get('/graphql?query={__typename}', headers=headers).mimetype == 'text/html'
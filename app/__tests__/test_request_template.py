@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from app.request_template import RequestTemplate
+
+REQUEST_FILE = """ {
+    "user_id": 1234,
+    "displayname": "Donald J. Trump (Twitter Bot)",
+    "content": "{{ content }}",
+    "meta": {"tweet": "{{tweet_id}} at {{ date }}", "tags": ["bot", "{{ sentiment }}"]},
+    "other": "{{ not_a_placeholder }}",
+    "url": "https://my.cool.website"
+} """
+
+
+@pytest.fixture
+def template():
+    yield RequestTemplate.compile(REQUEST_FILE)
+
+
+def test_compile_extracts_url_and_placeholders(template):
+    assert template.url == 'https://my.cool.website'
+    assert template.placeholders == {'content', 'tweet_id', 'date', 'sentiment'}
+
+
+def test_compile_requires_url():
+    with pytest.raises(Exception):
+        RequestTemplate.compile('{"content": "{{ content }}"}')
+
+
+def test_render_substitutes_every_placeholder(template):
+    msg = template.render(content='hello', tweet_id=1, date='2019-11-05', sentiment='positive')
+    assert msg == {
+        'user_id': 1234,
+        'displayname': 'Donald J. Trump (Twitter Bot)',
+        'content': 'hello',
+        'meta': {'tweet': '1 at 2019-11-05', 'tags': ['bot', 'positive']},
+        'other': '{{ not_a_placeholder }}',
+        'url': 'https://my.cool.website'
+    }
+
+
+def test_render_keeps_content_that_needs_escaping(template):
+    content = 'line one\n"quoted" {{ content }} \\ end'
+    msg = template.render(content=content)
+    assert json.loads(json.dumps(msg))['content'] == content
+
+
+def test_render_does_not_mutate_the_template(template):
+    template.render(content='first')['displayname'] = 'changed'
+    msg = template.render(content='second')
+    assert msg['content'] == 'second'
+    assert msg['displayname'] == 'Donald J. Trump (Twitter Bot)'
+    assert template.body['meta']['tags'] == ['bot', '{{ sentiment }}']
+    assert msg['meta']['tweet'] == ' at '
@@ -0,0 +1,122 @@
+import pytest
+
+import app.http_cache
+import app.schema
+import app.server
+from app.result_cache import ResultCache
+
+
+def test_lru_eviction():
+    cache = ResultCache(maxsize=2, ttl=None)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_entries_expire():
+    now = [0]
+    cache = ResultCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.set('a', 1)
+    now[0] = 9
+    assert cache.get('a') == 1
+    now[0] = 10
+    assert cache.get('a') is None
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['expirations'], stats['size']) == (1, 1, 1, 0)
+
+
+def test_new_version_drops_the_entries():
+    cache = ResultCache(maxsize=2, ttl=None)
+    cache.set_version('1-1')
+    cache.set('a', 1)
+    cache.set_version('1-1')
+    assert cache.get('a') == 1
+    cache.set_version('2-2')
+    assert cache.get('a') is None
+    assert cache.get_stats()['invalidations'] == 1
+
+
+def test_disabled_cache_stores_nothing():
+    cache = ResultCache(maxsize=0, ttl=None)
+    cache.set('a', 1)
+    assert cache.get('a') is None
+
+
+class Version:
+    def __init__(self, counter):
+        self.last_tweet_id = 10
+        self.counter = counter
+        self.updated_at = None
+
+
+@pytest.fixture
+def mock_sentiment(monkeypatch):
+    computed = []
+    versions = [Version(1)]
+
+    class OverallSentiment:
+        polarity = 0.5
+
+        def __init__(self):
+            computed.append(1)
+
+        def get_todays_tone_value(self):
+            return 'positive'
+
+    monkeypatch.setattr(app.schema, 'OverallSentiment', OverallSentiment)
+    monkeypatch.setattr(app.http_cache.data_versions, 'get', lambda: versions[-1])
+    monkeypatch.setattr(app.server.graphql_results, 'maxsize', 8)
+    for counter in ('hits', 'misses', 'evictions', 'expirations', 'invalidations'):
+        monkeypatch.setattr(app.server.graphql_results, counter, 0)
+    app.server.graphql_results.clear()
+    yield computed, versions
+    app.server.graphql_results.clear()
+
+
+def test_identical_queries_are_served_from_the_cache(test_client, mock_sentiment):
+    computed, versions = mock_sentiment
+    for query in ('{ overallSentiment { tone percentage } }', 'query {\n  overallSentiment { tone, percentage }\n}'):
+        resp = test_client.post('/graphql', json={'query': query})
+        assert resp.get_json()['data']['overallSentiment'] == {'tone': 'positive', 'percentage': 0.5}
+
+    assert len(computed) == 1
+
+    versions.append(Version(2))
+    test_client.post('/graphql', json={'query': '{ overallSentiment { tone } }'})
+    test_client.post('/graphql', json={'query': '{ overallSentiment { tone } }'})
+    assert len(computed) == 2
+
+    stats = test_client.get('/json/graphql-cache').get_json()
+    assert (stats['hits'], stats['misses'], stats['invalidations']) == (2, 2, 1)
+
+
+def test_variables_are_part_of_the_key_and_errors_are_not_cached(test_client, mock_sentiment, monkeypatch):
+    from app.__tests__.test_pagination import QuerySet, Tweet as TweetObj
+
+    class TweetObjects:
+        def all(self):
+            return QuerySet([TweetObj(1), TweetObj(2)])
+
+        def get_tweets_from_today(self):
+            return QuerySet([TweetObj(2)])
+
+    class Tweet:
+        objects = TweetObjects()
+
+    monkeypatch.setattr(app.schema, 'Tweet', Tweet)
+    query = 'query ($today: Boolean) { tweets(onlyToday: $today) { tweetId } }'
+    for today, expected in ((False, 2), (True, 1), (False, 2)):
+        resp = test_client.post('/graphql', json={'query': query, 'variables': {'today': today}})
+        assert len(resp.get_json()['data']['tweets']) == expected
+
+    assert app.server.graphql_results.hits == 1
+
+    for _ in range(2):
+        resp = test_client.post('/graphql', json={'query': '{ tweets { unknownField } }'})
+        assert resp.get_json()['errors']
+
+    assert app.server.graphql_results.hits == 1
@@ -0,0 +1,62 @@
+import datetime
+import random
+
+import pytest
+
+from app.models import Tweet, DELIVERED, RETRYING, DEAD
+from app.retry import RetryPolicy, is_delivered
+
+NOW = datetime.datetime(2019, 11, 5, 12, 0, 0)
+
+
+@pytest.fixture
+def retry_policy():
+    yield RetryPolicy(base_delay=10, max_delay=100, max_attempts=3, rng=random.Random(0))
+
+
+def test_is_delivered():
+    assert is_delivered(200)
+    assert is_delivered(204)
+    assert not is_delivered(None)
+    assert not is_delivered(401)
+    assert not is_delivered(503)
+
+
+def test_get_delay_grows_exponentially_with_jitter(retry_policy):
+    for attempts, delay in [(1, 10), (2, 20), (3, 40), (4, 80), (5, 100), (10, 100)]:
+        assert delay / 2 <= retry_policy.get_delay(attempts) <= delay
+
+
+def test_record_attempt_delivered(retry_policy):
+    tweet = Tweet(content='tweet', tweet_id=1, response_code=200)
+    retry_policy.record_attempt(tweet, now=NOW)
+    assert tweet.delivery_state == DELIVERED
+    assert tweet.attempts == 0
+    assert tweet.next_attempt_at is None
+
+
+def test_record_attempt_schedules_retry(retry_policy):
+    tweet = Tweet(content='tweet', tweet_id=1, response_code=503)
+    retry_policy.record_attempt(tweet, now=NOW)
+    assert tweet.delivery_state == RETRYING
+    assert tweet.attempts == 1
+    assert tweet.last_error == 'HTTP 503'
+    assert NOW + datetime.timedelta(seconds=5) <= tweet.next_attempt_at <= NOW + datetime.timedelta(seconds=10)
+
+
+def test_record_attempt_keeps_send_errors(retry_policy):
+    tweet = Tweet(content='tweet', tweet_id=1, last_error='connection refused')
+    retry_policy.record_attempt(tweet, now=NOW)
+    assert tweet.delivery_state == RETRYING
+    assert tweet.last_error == 'connection refused'
+
+
+def test_record_attempt_dead_letters_after_max_attempts(retry_policy):
+    tweet = Tweet(content='tweet', tweet_id=1, response_code=500)
+    for _ in range(3):
+        tweet.last_error = None
+        retry_policy.record_attempt(tweet, now=NOW)
+
+    assert tweet.delivery_state == DEAD
+    assert tweet.attempts == 3
+    assert tweet.next_attempt_at is None
@@ -0,0 +1,67 @@
+import random
+
+import pytest
+from textblob import TextBlob
+
+from app.scoring import score_batch, get_lexicon
+
+
+CASES = [
+    '',
+    'happy',
+    'congratulations',
+    'the end of the year',
+    'sad',
+    'not good',
+    'not bad',
+    'very good',
+    'very very good',
+    'not very good',
+    'really not good',
+    'really is a good idea',
+    'never a good sign',
+    "this isn't good at all",
+    "don't worry, it's not terrible",
+    'good!',
+    'great!!!',
+    'not great!',
+    'very :) good',
+    'terribly sad :( but xD',
+    'what a great idea (!)',
+    'what a great idea ( ! )',
+    'The U.S. economy is the best ever. Fake news is sad!',
+    'Mr. President, very sadly the witch hunt continues...',
+    '"Fake news" is the enemy\n\nof the people',
+    'no no no not never good',
+    'extremely happy',
+]
+
+
+def _get_random_texts(count, seed=0):
+    rng = random.Random(seed)
+    words = rng.sample(sorted(get_lexicon().index), 300) + [
+        'not', 'no', 'never', "don't", "isn't", 'very', 'really', 'extremely', 'terribly',
+        '!', 'the', 'a', 'is', 'of', ':)', ':(', 'xD', '<3', '(!)', '.', ',', '?', '"', "'",
+        'I', 'U.S.', '#MAGA', '@user', 'https://t.co/abc']
+    return [' '.join(rng.choice(words) for _ in range(rng.randint(0, 40))) for _ in range(count)]
+
+
+@pytest.mark.parametrize('texts', [CASES, _get_random_texts(500)])
+def test_score_batch_matches_textblob(texts):
+    polarities, subjectivities = score_batch(texts, batch_size=64)
+    assert len(polarities) == len(subjectivities) == len(texts)
+
+    for text, polarity, subjectivity in zip(texts, polarities, subjectivities):
+        sentiment = TextBlob(text).sentiment
+        assert polarity == pytest.approx(sentiment.polarity, abs=1e-9), text
+        assert subjectivity == pytest.approx(sentiment.subjectivity, abs=1e-9), text
+
+
+def test_score_batch_without_texts():
+    polarities, subjectivities = score_batch([])
+    assert len(polarities) == len(subjectivities) == 0
+
+
+def test_score_batch_without_known_words():
+    polarities, subjectivities = score_batch(['congratulations', 'the end'])
+    assert polarities.tolist() == subjectivities.tolist() == [0.0, 0.0]
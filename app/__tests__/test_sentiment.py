@@ -3,16 +3,19 @@ import logging
 import pytest
 
 import app.sentiment
+from app.models import SentimentTotals
 from app.sentiment import (
     Sentiment, 
     OverallSentiment, 
     SentimentWithHistory,
-    SentimentTone
+    SentimentTone,
+    apply_sentiment
 )
 
 class TweetObj:
     def __init__(self, content, *args, **kwargs):
         self.content = content
+        self.polarity = None
 
 class TweetObjects:
     def __init__(self, tone=SentimentTone.POSITIVE, *args, **kwargs):
@@ -39,6 +42,25 @@ class TweetObjects:
             return self._neutral
 
 
+class SentimentBucketObjects:
+    """ Totals the scores of the tweets like the buckets would """
+    def __init__(self, tweet_objects):
+        self.tweet_objects = tweet_objects
+
+    def _get_totals(self, tweets):
+        totals = SentimentTotals()
+        for tweet in tweets:
+            totals.add_tweet(apply_sentiment(tweet))
+
+        return totals
+
+    def get_recent_totals(self, hours=24):
+        return self._get_totals(self.tweet_objects.get_tweets_from_today())
+
+    def get_overall_totals(self):
+        return self._get_totals(self.tweet_objects.all())
+
+
 @pytest.fixture
 def sentiment_service():
     yield Sentiment()
@@ -56,34 +78,34 @@ def sentiment_with_history_service():
 
 @pytest.fixture
 def mock_tweets_get_all(monkeypatch):
-    class Tweet:
-        objects = TweetObjects()
+    class SentimentBucket:
+        objects = SentimentBucketObjects(TweetObjects())
 
-    monkeypatch.setattr(app.sentiment, 'Tweet', Tweet)
+    monkeypatch.setattr(app.sentiment, 'SentimentBucket', SentimentBucket)
 
 
 @pytest.fixture
 def mock_tweets_get_tweets_from_today_happy(monkeypatch):
-    class Tweet:
-        objects = TweetObjects(SentimentTone.POSITIVE)
+    class SentimentBucket:
+        objects = SentimentBucketObjects(TweetObjects(SentimentTone.POSITIVE))
 
-    monkeypatch.setattr(app.sentiment, 'Tweet', Tweet)
+    monkeypatch.setattr(app.sentiment, 'SentimentBucket', SentimentBucket)
 
 
 @pytest.fixture
 def mock_tweets_get_tweets_from_today_negative(monkeypatch):
-    class Tweet:
-        objects = TweetObjects(SentimentTone.NEGATIVE)
+    class SentimentBucket:
+        objects = SentimentBucketObjects(TweetObjects(SentimentTone.NEGATIVE))
 
-    monkeypatch.setattr(app.sentiment, 'Tweet', Tweet)
+    monkeypatch.setattr(app.sentiment, 'SentimentBucket', SentimentBucket)
 
 
 @pytest.fixture
 def mock_tweets_get_tweets_from_today_neutral(monkeypatch):
-    class Tweet:
-        objects = TweetObjects(SentimentTone.NEUTRAL)
+    class SentimentBucket:
+        objects = SentimentBucketObjects(TweetObjects(SentimentTone.NEUTRAL))
 
-    monkeypatch.setattr(app.sentiment, 'Tweet', Tweet)
+    monkeypatch.setattr(app.sentiment, 'SentimentBucket', SentimentBucket)
 
 
 def test_sentiment_get_tone():
@@ -138,6 +160,16 @@ def test_get_average_polarity_neutral(mock_tweets_get_tweets_from_today_neutral,
     assert tone == 0
 
 
+def test_get_average_polarity_without_tweets(monkeypatch, sentiment_with_history_service):
+    class SentimentBucket:
+        objects = SentimentBucketObjects(TweetObjects())
+
+    SentimentBucket.objects.get_recent_totals = lambda hours=24: SentimentTotals()
+    monkeypatch.setattr(app.sentiment, 'SentimentBucket', SentimentBucket)
+    assert sentiment_with_history_service._get_average_polarity() == 0.0
+    assert sentiment_with_history_service.get_todays_tone() == SentimentTone.NEUTRAL
+
+
 def test_sentiment_with_history_negative(mock_tweets_get_tweets_from_today_negative,
                                          sentiment_with_history_service):
     tone = sentiment_with_history_service.get_todays_tone()
@@ -166,3 +198,22 @@ def test_overall_sentiment(mock_tweets_get_all, overall_sentiment_service):
     tone_value = overall_sentiment_service.get_todays_tone_value()
     assert tone_value is not None
     assert tone_value != ""
+
+
+def test_apply_sentiment_stores_scores():
+    tweet = app.sentiment.apply_sentiment(TweetObj('happy'))
+    assert tweet.polarity > 0
+    assert tweet.subjectivity is not None
+    assert tweet.tone == SentimentTone.POSITIVE.value
+    assert tweet.sentiment_version == app.sentiment.SENTIMENT_SCORER_VERSION
+    assert app.sentiment.has_stored_sentiment(tweet)
+
+
+def test_get_polarity_uses_stored_score(monkeypatch):
+    tweet = TweetObj('happy')
+    tweet.polarity = -0.5
+    tweet.sentiment_version = app.sentiment.SENTIMENT_SCORER_VERSION
+    assert app.sentiment.get_polarity(tweet) == -0.5
+
+    tweet.sentiment_version = app.sentiment.SENTIMENT_SCORER_VERSION - 1
+    assert app.sentiment.get_polarity(tweet) > 0
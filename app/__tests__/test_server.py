@@ -0,0 +1,165 @@
+import datetime
+
+import pytest
+
+import app.loaders
+import app.sentiment
+
+
+class TweetObjects:
+    def __init__(self):
+        self.calls = []
+
+    def get_sentiment_history(self, start, end, granularity='day'):
+        self.calls.append((start, end, granularity))
+        return [{'start': datetime.datetime(2020, 1, 1), 'count': 3, 'average_polarity': -0.2,
+                 'average_subjectivity': 0.5, 'positive': 1, 'negative': 2, 'neutral': 0}]
+
+
+@pytest.fixture
+def mock_tweets(monkeypatch):
+    class Tweet:
+        objects = TweetObjects()
+
+    monkeypatch.setattr(app.sentiment, 'Tweet', Tweet)
+    yield Tweet.objects
+
+
+def test_sentiment_history_route(test_client, mock_tweets):
+    resp = test_client.get('/json/sentiment-history?from=2020-01-01&to=2020-01-02T12:00:00&granularity=hour')
+    assert resp.status_code == 200
+    assert resp.get_json()[0]['tone'] == 'negative'
+    assert resp.get_json()[0]['count'] == 3
+    assert mock_tweets.calls == [
+        (datetime.datetime(2020, 1, 1), datetime.datetime(2020, 1, 2, 12), 'hour')]
+
+
+def test_sentiment_history_route_rejects_bad_arguments(test_client, mock_tweets):
+    assert test_client.get('/json/sentiment-history?granularity=week').status_code == 400
+    assert test_client.get('/json/sentiment-history?from=yesterday').status_code == 400
+    assert mock_tweets.calls == []
+
+
+def test_sentiment_history_query(test_client, mock_tweets):
+    query = '{ sentimentHistory(from: "2020-01-01T00:00:00", granularity: "month") { start count percentage tone negative } }'
+    resp = test_client.post('/graphql', json={'query': query})
+    assert resp.status_code == 200
+    history = resp.get_json()['data']['sentimentHistory']
+    assert history == [{'start': '2020-01-01T00:00:00', 'count': 3, 'percentage': -0.2,
+                        'tone': 'negative', 'negative': 2}]
+    start, end, granularity = mock_tweets.calls[0]
+    assert (start, granularity) == (datetime.datetime(2020, 1, 1), 'month')
+
+
+@pytest.fixture
+def mock_tweet_lookups(monkeypatch):
+    from app.models import Tweet as TweetModel
+    stored = {i: TweetModel(content='happy tweet %s' % i, tweet_id=i, response_code=200) for i in range(1, 4)}
+    lookups = []
+    scored = []
+
+    class QuerySet:
+        def filter(self, tweet_id__in):
+            lookups.append(list(tweet_id__in))
+            return [stored[i] for i in tweet_id__in if i in stored]
+
+    class Tweet:
+        objects = QuerySet()
+
+    def score_batch(texts):
+        scored.append(list(texts))
+        return app.sentiment.score_batch(texts)
+
+    monkeypatch.setattr(app.loaders, 'Tweet', Tweet)
+    monkeypatch.setattr(app.loaders, 'score_batch', score_batch)
+    yield lookups, scored
+
+
+def test_tweet_by_id_lookups_are_batched(test_client, mock_tweet_lookups):
+    lookups, scored = mock_tweet_lookups
+    query = '''{
+        a: tweetById(tweetId: "1") { tweetId sentiment { tone } }
+        b: tweetById(tweetId: "2") { tweetId sentiment { tone } }
+        c: tweetById(tweetId: "1") { tweetId }
+        d: tweetById(tweetId: "9") { tweetId }
+    }'''
+    resp = test_client.post('/graphql', json={'query': query})
+    data = resp.get_json()['data']
+
+    assert data['a'] == {'tweetId': '1', 'sentiment': {'tone': 'positive'}}
+    assert data['b']['tweetId'] == '2'
+    assert data['c'] == {'tweetId': '1'}
+    assert data['d'] == {'tweetId': None}
+    assert lookups == [[1, 2, 9]]
+    assert scored == [['happy tweet 1', 'happy tweet 2']]
+
+
+def test_loaders_are_not_shared_between_requests(test_client, mock_tweet_lookups):
+    lookups, _ = mock_tweet_lookups
+    for _ in range(2):
+        test_client.post('/graphql', json={'query': '{ tweetById(tweetId: "1") { tweetId } }'})
+
+    assert lookups == [[1], [1]]
+
+
+@pytest.fixture
+def mock_tweet_pages(monkeypatch):
+    import app.schema
+    from app.models import Tweet as TweetModel
+    from app.__tests__.test_pagination import QuerySet
+
+    tweets = QuerySet([TweetModel(content='tweet %s' % i, tweet_id=i, polarity=0.0) for i in range(1, 6)])
+
+    class TweetObjects:
+        def all(self):
+            return tweets
+
+    class Tweet:
+        objects = TweetObjects()
+
+    monkeypatch.setattr(app.schema, 'Tweet', Tweet)
+    yield tweets
+
+
+def test_tweets_connection_pages_with_cursors(test_client, mock_tweet_pages):
+    query = '''query ($after: String) { tweetsConnection(first: 2, after: $after) {
+        edges { cursor node { tweetId } } pageInfo { hasNextPage endCursor } } }'''
+    resp = test_client.post('/graphql', json={'query': query})
+    connection = resp.get_json()['data']['tweetsConnection']
+    assert [edge['node']['tweetId'] for edge in connection['edges']] == ['5', '4']
+    assert connection['pageInfo']['hasNextPage']
+
+    resp = test_client.post('/graphql', json={
+        'query': query, 'variables': {'after': connection['pageInfo']['endCursor']}})
+    connection = resp.get_json()['data']['tweetsConnection']
+    assert [edge['node']['tweetId'] for edge in connection['edges']] == ['3', '2']
+    assert mock_tweet_pages.counts == []
+    assert mock_tweet_pages.projections == [['tweet_id'], ['tweet_id']]
+
+
+def test_tweets_connection_total_count(test_client, mock_tweet_pages):
+    query = '{ tweetsConnection(first: 1) { totalCount edges { node { tweetId } } } }'
+    resp = test_client.post('/graphql', json={'query': query})
+    assert resp.get_json()['data']['tweetsConnection']['totalCount'] == 5
+    assert mock_tweet_pages.counts == [5]
+
+
+def test_tweets_only_load_the_selected_fields(test_client, mock_tweet_pages, monkeypatch):
+    import app.server
+    # the sentiment of every tweet of the unbounded list is over the default budget
+    monkeypatch.setattr(app.server.graphql_backend, 'max_cost', 10000)
+    query = '''{ tweets(onlyToday: false) { ...dates sentiment { tone } } }
+        fragment dates on TweetObj { tweetId dateCreated }'''
+    resp = test_client.post('/graphql', json={'query': query})
+    tweets = resp.get_json()['data']['tweets']
+    assert [tweet['tweetId'] for tweet in tweets] == ['5', '4', '3', '2', '1']
+    assert tweets[0]['sentiment'] == {'tone': 'neutral'}
+    assert mock_tweet_pages.projections == [[
+        'content', 'date_created', 'polarity', 'sentiment_version', 'subjectivity', 'tone', 'tweet_id']]
+
+
+def test_tweets_list_is_capped(test_client, mock_tweet_pages, monkeypatch):
+    import app.schema
+    monkeypatch.setattr(app.schema, 'MAX_PAGE_SIZE', 2)
+    resp = test_client.post('/graphql', json={'query': '{ tweets(onlyToday: false) { tweetId } }'})
+    assert [tweet['tweetId'] for tweet in resp.get_json()['data']['tweets']] == ['5', '4']
@@ -0,0 +1,65 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+HEAVY_MODULES = ('flask', 'graphene', 'textblob', 'nltk', 'bs4', 'numpy', 'apscheduler', 'mongoengine')
+
+
+def _get_imported(statement, cwd=ROOT):
+    """ Runs `statement` in a fresh interpreter and returns the heavy modules it imported """
+    script = '%s; import sys; print(" ".join(m for m in %r if m in sys.modules))' % (statement, HEAVY_MODULES)
+    env = dict(os.environ, PYTHONPATH=ROOT, MONGO_DB_URL='mongodb://127.0.0.1:1')
+    output = subprocess.check_output([sys.executable, '-c', script], cwd=cwd, env=env, universal_newlines=True)
+    return set(output.split())
+
+
+def test_main_imports_nothing_heavy(tmp_path):
+    assert _get_imported('import main', cwd=str(tmp_path)) == set()
+    # the pid file is only written when main() runs
+    assert not os.path.exists(os.path.join(str(tmp_path), 'var'))
+
+
+@pytest.mark.parametrize('module, expected', [
+    ('app', set()),
+    ('app.models', {'mongoengine'}),
+    ('app.bot', {'mongoengine', 'apscheduler'}),
+    ('app.timelines', {'mongoengine', 'apscheduler'}),
+    ('app.backfill', {'mongoengine', 'numpy'}),
+    # what every web worker loads, the scheduler and the NLP libraries stay out
+    ('app.wsgi', {'flask', 'graphene', 'mongoengine'}),
+])
+def test_actions_only_import_what_they_need(module, expected):
+    assert _get_imported('import %s' % module) == expected
+
+
+def test_sentiment_loads_the_lexicon_on_first_scoring():
+    imported = _get_imported('from app.sentiment import Sentiment; Sentiment("")')
+    assert 'textblob' not in imported and 'numpy' not in imported
+
+    imported = _get_imported('from app.sentiment import Sentiment; Sentiment("good")')
+    assert {'textblob', 'numpy'} <= imported
+
+
+def test_wsgi_server_command(monkeypatch):
+    import main
+    monkeypatch.setenv('WEB_WORKERS', '3')
+    monkeypatch.setenv('SERVER_PORT', '8080')
+    command = main._get_wsgi_server_command()
+    assert command[1:3] == ['-m', 'gunicorn']
+    assert command[command.index('--workers') + 1] == '3'
+    assert command[command.index('--bind') + 1] == '0.0.0.0:8080'
+    assert command[-1] == 'app.wsgi:app'
+
+
+def test_prod_starts_the_web_server_before_the_bot(monkeypatch):
+    import main
+    started = []
+    monkeypatch.setattr(main.subprocess, 'Popen', lambda cmd, env=None: started.append(cmd[-1]))
+    monkeypatch.setattr(main, '_start_trump_bot', lambda *args, **kwargs: started.append('trumpbot'))
+    main._start_prod_server(send_posts=True)
+    assert started == ['app.wsgi:app', 'trumpbot']
+    assert main.CMDS == []
@@ -0,0 +1,116 @@
+import pytest
+
+import app.timelines
+from app.timelines import MultiTimelinePoller
+
+
+class AccountObj:
+    def __init__(self, screen_name, cursor=None):
+        self.screen_name = screen_name
+        self.cursor = cursor
+
+
+class AccountObjects:
+    def __init__(self, *accounts):
+        self.accounts = list(accounts)
+        self.cursors = {}
+
+    def get_enabled(self):
+        return self.accounts
+
+    def set_cursor(self, screen_name, cursor):
+        self.cursors[screen_name] = cursor
+
+
+class TweetObjects:
+    def get_last_tweet_id(self, source_account=None):
+        return 1111111
+
+
+@pytest.fixture
+def mock_models(monkeypatch):
+    class Account:
+        objects = AccountObjects(AccountObj('first', cursor='10'), AccountObj('second'))
+
+    class Tweet:
+        objects = TweetObjects()
+
+    monkeypatch.setattr(app.timelines, 'Account', Account)
+    monkeypatch.setattr(app.timelines, 'Tweet', Tweet)
+    yield Account
+
+
+@pytest.fixture
+def poller(tmpdir, mock_models):
+    request_file = tmpdir.join('request.json')
+    request_file.write('{"content": "{{ content }}", "url": "https://my.cool.website"}')
+    poller = MultiTimelinePoller(file_path=str(request_file), workers=2, poll_interval=60)
+    yield poller
+    poller._workers.shutdown()
+
+
+def test_load_accounts_creates_one_timeline_per_account(poller, mock_models):
+    assert sorted(poller.load_accounts()) == ['first', 'second']
+    assert poller.timelines['first'].extractor.min_position == '10'
+    assert poller.timelines['second'].extractor.min_position == '1111111'
+    assert poller.timelines['first'].extractor.http is poller.http
+
+    mock_models.objects.accounts.pop()
+    assert poller.load_accounts() == ['first']
+
+
+def test_initial_polls_are_spread_over_one_interval(poller):
+    delays = [poller._get_initial_delay('account%s' % i) for i in range(50)]
+    assert all(0 <= delay < 60 for delay in delays)
+    assert len(set(delays)) > 40
+    assert poller._get_initial_delay('first') == poller._get_initial_delay('first')
+
+
+def test_poll_timeline_persists_cursor_and_reschedules(poller, mock_models, monkeypatch):
+    poller.load_accounts()
+    timeline = poller.timelines['first']
+    stored = []
+
+    def get_tweets():
+        timeline.extractor.last_status_code = 200
+        timeline.extractor.min_position = '20'
+        return []
+
+    monkeypatch.setattr(timeline.extractor, 'get_tweets', get_tweets)
+    monkeypatch.setattr(poller, '_store_tweets', lambda tweets: stored.append(tweets) or tweets)
+    timeline.next_poll_at = 0
+
+    assert poller.poll_due_timelines() == 1
+    poller._workers.shutdown(wait=True)
+
+    assert stored == [[]]
+    assert mock_models.objects.cursors == {'first': '20'}
+    assert timeline.next_poll_at > 0
+    assert timeline.polling is False
+
+
+def test_poll_timeline_rewinds_cursor_when_store_fails(poller, mock_models, monkeypatch):
+    poller.load_accounts()
+    timeline = poller.timelines['first']
+    forgotten = []
+
+    def get_tweets():
+        timeline.extractor.last_status_code = 200
+        timeline.extractor.min_position = '20'
+        return []
+
+    def store_tweets(tweets):
+        raise Exception('database unavailable')
+
+    monkeypatch.setattr(timeline.extractor, 'get_tweets', get_tweets)
+    monkeypatch.setattr(timeline.extractor, 'forget_validators', lambda: forgotten.append(True))
+    monkeypatch.setattr(poller, '_store_tweets', store_tweets)
+    timeline.next_poll_at = 0
+
+    assert poller.poll_due_timelines() == 1
+    poller._workers.shutdown(wait=True)
+
+    assert timeline.extractor.min_position == timeline.cursor == '10'
+    assert forgotten == [True]
+    assert mock_models.objects.cursors == {}
+    assert timeline.polling is False
@@ -0,0 +1,216 @@
+import os
+import re
+import time
+import logging
+import hashlib
+import mimetypes
+import threading
+
+from flask import Response, request
+from werkzeug.wsgi import wrap_file
+
+
+# seconds between the checks whether index.html was replaced by a deploy, 0 turns them off
+ASSET_RELOAD_INTERVAL = float(os.environ.get('ASSET_RELOAD_INTERVAL', 10))
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+INDEX_HTML = 'index.html'
+# build tools put a content hash in the name of files that never change, e.g. main.3f2a1b9c.chunk.js
+HASHED_NAME = re.compile(r'\.[0-9a-f]{8,}\.')
+# precompressed variants in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _hash_file(file_path: str) -> str:
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(65536), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+class AssetFile(object):
+    """ One file on disk that an asset can be served from """
+
+    def __init__(self, file_path: str, etag: str, size: int, mtime_ns: int):
+        self.file_path = file_path
+        self.etag = etag
+        self.size = size
+        self.mtime_ns = mtime_ns
+
+    def is_stale(self, stat: os.stat_result) -> bool:
+        """ True when the file on disk is not the one that was indexed """
+        return (stat.st_size, stat.st_mtime_ns) != (self.size, self.mtime_ns)
+
+
+class Asset(object):
+    """ A file of the web directory and its precompressed variants keyed on their encoding """
+
+    def __init__(self, path: str, file: AssetFile, mimetype: str, immutable: bool):
+        self.path = path
+        self.file = file
+        self.mimetype = mimetype
+        self.immutable = immutable
+        self.variants = {}
+
+
+class AssetIndex(object):
+    """
+    Every file below `root`, looked up by its path relative to `root`. The
+    files are hashed once when the index is built so requests do not touch
+    the disk until a file is sent.
+
+    The index is rebuilt when index.html changed, which is checked at most
+    every `reload_interval` seconds. """
+
+    def __init__(self, root: str, reload_interval: float=ASSET_RELOAD_INTERVAL, clock=time.monotonic):
+        self.root = root
+        self.reload_interval = reload_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._checked_at = clock()
+        self._stamp = None
+        self.assets = {}
+        self.reload()
+
+    def _get_stamp(self):
+        try:
+            stat = os.stat(os.path.join(self.root, INDEX_HTML))
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _build(self) -> dict:
+        files = {}
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                file_path = os.path.join(directory, name)
+                path = os.path.relpath(file_path, self.root).replace(os.sep, '/')
+                stat = os.stat(file_path)
+                files[path] = AssetFile(file_path, _hash_file(file_path), stat.st_size, stat.st_mtime_ns)
+
+        assets = {}
+        for path, file in files.items():
+            suffixes = [suffix for _, suffix in ENCODINGS if path.endswith(suffix)]
+            if suffixes and path[:-len(suffixes[0])] in files:
+                continue  # a variant of another file
+
+            mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            name = path.rsplit('/', 1)[-1]
+            asset = Asset(path, file, mimetype, immutable=HASHED_NAME.search(name) is not None)
+            for encoding, suffix in ENCODINGS:
+                variant = files.get(path + suffix)
+                if variant is not None:
+                    asset.variants[encoding] = variant
+
+            assets[path] = asset
+
+        return assets
+
+    def reload(self):
+        """ Rebuilds the index, requests keep using the old one until the new one is complete """
+        stamp = self._get_stamp()
+        assets = self._build() if self.root and os.path.isdir(self.root) else {}
+        with self._lock:
+            self.assets = assets
+            self._stamp = stamp
+
+    def _reload_if_changed(self):
+        if self.reload_interval <= 0:
+            return
+
+        now = self._clock()
+        with self._lock:
+            if now - self._checked_at < self.reload_interval:
+                return
+            self._checked_at = now
+
+        if self._get_stamp() != self._stamp:
+            self.reload()
+
+    def get(self, path: str) -> Asset:
+        """ Returns the asset at `path` or index.html for the routes of the single page app """
+        self._reload_if_changed()
+        assets = self.assets
+        return assets.get(path) or assets.get(INDEX_HTML)
+
+
+_asset_index = None
+_asset_index_lock = threading.Lock()
+
+
+def get_asset_index(root: str) -> AssetIndex:
+    """ The index of `root` is built the first time it is needed """
+    global _asset_index
+    with _asset_index_lock:
+        if _asset_index is None or _asset_index.root != root:
+            _asset_index = AssetIndex(root)
+
+        return _asset_index
+
+
+def _choose_file(asset: Asset) -> tuple:
+    """ Returns the encoding and the file of the best variant the client accepts """
+    for encoding, _ in ENCODINGS:
+        if encoding in asset.variants and request.accept_encodings[encoding]:
+            return encoding, asset.variants[encoding]
+
+    return None, asset.file
+
+
+def _open_file(file: AssetFile):
+    """ Opens the file, raises OSError when it was removed or modified since it was indexed """
+    handle = open(file.file_path, 'rb')
+    if file.is_stale(os.fstat(handle.fileno())):
+        handle.close()
+        raise OSError('%s changed since it was indexed' % file.file_path)
+
+    return handle
+
+
+def send_asset(asset: Asset) -> Response:
+    """ Sends the asset with a strong ETag, files with a hashed name are cached for a year.
+    Raises OSError when the file changed on disk since the index was built, before
+    a 304 is sent as well so the ETag of a modified file is never confirmed. """
+    encoding, file = _choose_file(asset)
+    etag = file.etag
+    handle = _open_file(file)
+    if request.if_none_match.contains(etag):
+        handle.close()
+        response = Response(status=304)
+    else:
+        response = Response(wrap_file(request.environ, handle),
+                            mimetype=asset.mimetype, direct_passthrough=True)
+        response.content_length = file.size
+        if encoding is not None:
+            response.content_encoding = encoding
+
+    response.set_etag(etag)
+    if asset.variants:
+        response.vary.add('Accept-Encoding')
+    if asset.immutable:
+        response.headers['Cache-Control'] = 'public, max-age=%s, immutable' % IMMUTABLE_MAX_AGE
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+
+    return response
+
+
+def send_path(index: AssetIndex, path: str) -> Response:
+    """
+    Sends the asset at `path` or index.html, None when there is neither. A
+    deploy can remove or replace files before index.html changes, the index
+    is then rebuilt and the path is looked up once more. """
+    for _ in range(2):
+        asset = index.get(path)
+        if asset is None:
+            return None
+
+        try:
+            return send_asset(asset)
+        except OSError as e:
+            logging.warning('Unable to send %s, rebuilding the asset index: %s' % (asset.path, e))
+            index.reload()
+
+    return None
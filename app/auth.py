@@ -1,6 +1,17 @@
-import requests
+import os
 import json
+import time
+import base64
 import logging
+import threading
+
+from .client import HttpClientMixin
+
+
+AUTH_REFRESH_MARGIN = float(os.environ.get('AUTH_REFRESH_MARGIN', 60))
+AUTH_MAX_ATTEMPTS = int(os.environ.get('AUTH_MAX_ATTEMPTS', 1))
+# seconds to wait at least before a background refresh, even for tokens that already expired
+AUTH_MIN_REFRESH_DELAY = float(os.environ.get('AUTH_MIN_REFRESH_DELAY', 30))
 
 
 class _AuthInfo:
@@ -13,7 +24,7 @@ class _AuthInfo:
 
 
 def _read_auth_info_from_file(file_path) -> _AuthInfo:
-    """ _read_auth_info_from_file is a private function that reads a file  
+    """ _read_auth_info_from_file is a private function that reads a file
     that holds credentials and stores them in a _AuthInfo object which is returned """
     auth_info = _AuthInfo()
     with open(file_path, 'r') as file:
@@ -22,12 +33,38 @@ def _read_auth_info_from_file(file_path) -> _AuthInfo:
     return auth_info
 
 
-class Authentication(object):
+def _decode_jwt_expiry(token: str) -> float:
+    """ Returns the `exp` claim of a JWT as a unix timestamp or None
+    when the token is not a JWT or has no expiry """
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload.encode('ascii')))['exp']
+        return float(exp)
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class Authentication(HttpClientMixin):
     def __init__(self, auth_file_path='auth.json', *args, **kwargs):
         super().__init__(*args, **kwargs)
 
         self._file_path = auth_file_path
+        self._auth_info = None
         self.auth_token = None
+        self.token_expires_at = None
+
+        self._token_lock = threading.Lock()
+        self._token_generation = 0
+        self._last_auth_status = None
+        self._refresh_timer = None
+
+    def _get_auth_info(self) -> _AuthInfo:
+        """ The auth file is only read the first time the credentials are needed """
+        if self._auth_info is None:
+            self._auth_info = _read_auth_info_from_file(self._file_path)
+
+        return self._auth_info
 
     def _merge_kwargs_with_headers(self, **kwargs) -> dict:
         """
@@ -42,39 +79,101 @@ class Authentication(object):
          """
         return {**kwargs, 'headers': self.get_bearer_header()}
 
-    def get_auth_token(self) -> int:
-        """ 
-        Uses credentials stores in file given as `file_path`
-        it will try to authenticate to the url given with the given credentials
-        ans then set the `auth_token` value. It returns the response code """
-        auth_info = _read_auth_info_from_file(self._file_path)
+    def _login(self) -> int:
+        auth_info = self._get_auth_info()
         body = {'email': auth_info.username, 'password': auth_info.password}
-        resp = requests.post(auth_info.url, json=body)
+        resp = self.http.post(auth_info.url, json=body)
         if resp.status_code != 200:
             return resp.status_code
 
         self.auth_token = resp.json()[auth_info.token_name]
+        self.token_expires_at = _decode_jwt_expiry(self.auth_token)
         return resp.status_code
 
+    def _refresh_token(self, generation: int) -> int:
+        """
+        Re-authenticates unless the token was already refreshed since `generation`.
+
+        Callers that got a 401 at the same time all wait on the same lock, the
+        first one logs in and the others return its result without logging in again. """
+        with self._token_lock:
+            if self._token_generation != generation:
+                return self._last_auth_status
+
+            self._last_auth_status = self._login()
+            self._token_generation += 1
+            if self._last_auth_status == 200:
+                self._schedule_refresh()
+
+            return self._last_auth_status
+
+    def _schedule_refresh(self):
+        """
+        Refreshes the token in the background `AUTH_REFRESH_MARGIN` seconds before
+        it expires. Tokens that live shorter than twice the margin are refreshed
+        halfway through their lifetime, and never sooner than `AUTH_MIN_REFRESH_DELAY`
+        so a short lived or expired token does not log in again and again. """
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+
+        if self.token_expires_at is None:
+            return
+
+        remaining = self.token_expires_at - time.time()
+        delay = max(remaining - AUTH_REFRESH_MARGIN, remaining / 2, AUTH_MIN_REFRESH_DELAY)
+        self._refresh_timer = threading.Timer(delay, self._refresh_in_background, args=(self._token_generation,))
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+    def _refresh_in_background(self, generation: int):
+        logging.info('Refreshing the auth token before it expires')
+        status = self._refresh_token(generation)
+        if status != 200:
+            logging.error('Unable to refresh the auth token, status code %s' % status)
+
+    def _is_token_expired(self) -> bool:
+        return self.token_expires_at is not None and self.token_expires_at <= time.time()
+
+    def get_auth_token(self) -> int:
+        """
+        Uses credentials stores in file given as `file_path`
+        it will try to authenticate to the url given with the given credentials
+        ans then set the `auth_token` value. It returns the response code """
+        return self._refresh_token(self._token_generation)
+
+    def ensure_auth_token(self) -> int:
+        """ Authenticates when there is no token yet or the token expired.
+        Returns the status code of the authentication or 200 when the token is valid """
+        if self.auth_token is not None and not self._is_token_expired():
+            return 200
+
+        return self.get_auth_token()
+
     def get_bearer_header(self) -> dict:
         """ Returns { 'Authorization': 'Bearer {self.auth_token}' } """
         return {'Authorization': 'Bearer %s' % self.auth_token}
 
     def rebounce_on_401(self, fn, *args, **kwargs) -> int:
-        """ 
+        """
         Accepts a function and its arguments that returns a status code.
+        The function is called with the current Bearer headers.
 
         If the returned status code is 401 this will try to re-authenticate
-        and then try the requests again. 
-        
-        It will return the response code after 10 attempts """
+        and then try the requests again.
+
+        It will return the response code after `AUTH_MAX_ATTEMPTS` attempts """
+        if self.ensure_auth_token() == 401:
+            raise Exception('Unable to authenticate using given credentials in %s' % self._file_path)
+
         attempts = 0
-        resp_code = fn(*args, **kwargs)
-        while resp_code == 401 and attempts <= 10:
+        generation = self._token_generation
+        resp_code = fn(*args, **self._merge_kwargs_with_headers(**kwargs))
+        while resp_code == 401 and attempts < AUTH_MAX_ATTEMPTS:
             logging.info('Trying to authenticate %s\t Attempts: %s' % (resp_code, attempts))
-            if self.get_auth_token() == 401:
+            if self._refresh_token(generation) == 401:
                 raise Exception('Unable to authenticate using given credentials in %s' % self._file_path)
 
+            generation = self._token_generation
             resp_code = fn(*args, **self._merge_kwargs_with_headers(**kwargs))
             attempts += 1
 
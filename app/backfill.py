@@ -0,0 +1,192 @@
+import os
+import time
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+from typing import List, Tuple
+
+from .models import Tweet, SentimentBucket, BackfillCheckpoint, DataVersion, SENTIMENT_FIELDS
+from .scoring import score_batch
+from .sentiment import SENTIMENT_SCORER_VERSION, get_tone_for_polarity
+
+
+BACKFILL_BATCH_SIZE = int(os.environ.get('BACKFILL_BATCH_SIZE', 500))
+# leave half of the cores to the live bot by default
+BACKFILL_WORKERS = int(os.environ.get('BACKFILL_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+# tweets per second written back, 0 does not throttle
+BACKFILL_MAX_RATE = float(os.environ.get('BACKFILL_MAX_RATE', 0))
+BACKFILL_NICENESS = int(os.environ.get('BACKFILL_NICENESS', 10))
+
+BACKFILL_JOB = 'backfill-sentiment'
+RESCORE_JOB = 'rescore-sentiment'
+
+
+def _get_scores(tweet: Tweet) -> SimpleNamespace:
+    """ A copy of the stored scores of the tweet, taken before it is rescored """
+    return SimpleNamespace(
+        date_created=tweet.date_created,
+        polarity=tweet.polarity,
+        subjectivity=tweet.subjectivity,
+        tone=tweet.tone
+    )
+
+
+_priority_lowered = False
+
+
+def _lower_priority(niceness: int):
+    """ Lowers the priority of a worker process once so the scoring does not starve the bot """
+    global _priority_lowered
+    if _priority_lowered:
+        return
+
+    _priority_lowered = True
+    try:
+        os.nice(niceness)
+    except (AttributeError, OSError):
+        pass
+
+
+def _score_contents(contents: List[str]) -> Tuple[List[float], List[float]]:
+    polarities, subjectivities = score_batch(contents)
+    return polarities.tolist(), subjectivities.tolist()
+
+
+def _score_contents_in_worker(contents: List[str], niceness: int) -> Tuple[List[float], List[float]]:
+    # ProcessPoolExecutor has no initializer before Python 3.7
+    _lower_priority(niceness)
+    return _score_contents(contents)
+
+
+class _InlineFuture(object):
+    """ _InlineFuture is a private class that stands in for a future when no
+    worker processes are used """
+
+    def __init__(self, fn, *args):
+        self._result = fn(*args)
+
+    def result(self):
+        return self._result
+
+
+class Throttle(object):
+    """ Sleeps between chunks so no more than `max_rate` tweets are processed per second """
+
+    def __init__(self, max_rate: float=BACKFILL_MAX_RATE, clock=time.monotonic, sleep=time.sleep):
+        self.max_rate = max_rate
+        self._clock = clock
+        self._sleep = sleep
+        self._started_at = clock()
+        self._processed = 0
+
+    def wait(self, processed: int):
+        self._processed += processed
+        if self.max_rate <= 0:
+            return
+
+        delay = self._started_at + self._processed / self.max_rate - self._clock()
+        if delay > 0:
+            self._sleep(delay)
+
+
+def _save_chunk(tweets: List[Tweet], polarities: List[float], subjectivities: List[float],
+                version: int):
+    """ Writes the new scores of a chunk and moves the sentiment buckets from
+    the old scores to the new ones """
+    previous = [_get_scores(tweet) for tweet in tweets if tweet.polarity is not None]
+    for tweet, polarity, subjectivity in zip(tweets, polarities, subjectivities):
+        tweet.polarity = polarity
+        tweet.subjectivity = subjectivity
+        tweet.tone = get_tone_for_polarity(polarity).value
+        tweet.sentiment_version = version
+
+    report = Tweet.objects.bulk_update_sentiment(tweets)
+    SentimentBucket.objects.add_tweets(previous, sign=-1)
+    SentimentBucket.objects.add_tweets(tweets)
+    DataVersion.objects.bump()
+    return report
+
+
+def backfill_sentiment(batch_size: int=BACKFILL_BATCH_SIZE, version: int=SENTIMENT_SCORER_VERSION,
+                       workers: int=BACKFILL_WORKERS, max_rate: float=BACKFILL_MAX_RATE,
+                       rescore: bool=False) -> int:
+    """
+    Scores every stored tweet that was not scored by the scorer `version`,
+    or every stored tweet when `rescore` is set, and returns the number of
+    scored tweets.
+
+    The tweets are streamed in `tweet_id` order in chunks of `batch_size`
+    and the chunks are scored by `workers` processes, up to two chunks per
+    worker ahead of the writes. The chunks are written back in order with
+    one bulk write each, after which the last written `tweet_id` is saved in
+    a `BackfillCheckpoint`, so an interrupted job resumes where it stopped
+    when it is started again. `max_rate` throttles the job to that many
+    tweets per second. """
+    job = RESCORE_JOB if rescore else BACKFILL_JOB
+    last_tweet_id = BackfillCheckpoint.objects.get_last_tweet_id(job, version)
+    if last_tweet_id is not None:
+        logging.info('Resuming %s after tweet %s' % (job, last_tweet_id))
+
+    tweets = Tweet.objects if rescore else Tweet.objects.get_unscored(version)
+    if last_tweet_id is not None:
+        tweets = tweets.filter(tweet_id__gt=last_tweet_id)
+
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers)
+
+    def submit(chunk):
+        contents = [tweet.content for tweet in chunk]
+        if pool is None:
+            return _InlineFuture(_score_contents, contents)
+
+        return pool.submit(_score_contents_in_worker, contents, BACKFILL_NICENESS)
+
+    scored = 0
+    pending = deque()
+    throttle = Throttle(max_rate)
+
+    def save_oldest():
+        chunk, future = pending.popleft()
+        report = _save_chunk(chunk, *future.result(), version=version)
+        BackfillCheckpoint.objects.save_progress(job, version, chunk[-1].tweet_id, scored + len(chunk))
+        logging.info('Scored %s tweets up to %s\t%s' % (scored + len(chunk), chunk[-1].tweet_id, report))
+        throttle.wait(len(chunk))
+        return len(chunk)
+
+    try:
+        fields = ('tweet_id', 'content', 'date_created') + SENTIMENT_FIELDS
+        for chunk in tweets.iter_chunks(batch_size, fields=fields):
+            pending.append((chunk, submit(chunk)))
+            if len(pending) > max(workers, 1) * 2:
+                scored += save_oldest()
+
+        while len(pending) > 0:
+            scored += save_oldest()
+
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    BackfillCheckpoint.objects.clear(job)
+    return scored
+
+
+def rebuild_sentiment_buckets(batch_size: int=BACKFILL_BATCH_SIZE) -> int:
+    """
+    Drops the sentiment buckets and adds every scored tweet to them again.
+    Returns the number of tweets that were added.
+
+    Only needed once for tweets that were scored before the buckets existed,
+    or when the buckets drifted from the stored tweets. """
+    SentimentBucket.objects.delete()
+    added = 0
+    fields = ('tweet_id', 'date_created', 'polarity', 'subjectivity', 'tone')
+    for tweets in Tweet.objects.get_scored().iter_chunks(batch_size, fields=fields):
+        SentimentBucket.objects.add_tweets(tweets)
+        added += len(tweets)
+        logging.info('Added %s tweets up to %s to the sentiment buckets' % (added, tweets[-1].tweet_id))
+
+    DataVersion.objects.bump()
+    return added
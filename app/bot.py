@@ -1,3 +1,5 @@
+import datetime
+import hashlib
 import json
 import logging
 import re
@@ -5,34 +7,106 @@ from typing import List
 
 import requests
 from apscheduler.schedulers.background import BackgroundScheduler
-from bs4 import BeautifulSoup
 
-from .models import Tweet
+from .models import Tweet, SentimentBucket, DataVersion, DEFAULT_SCREEN_NAME
 from .auth import Authentication
+from .client import HttpClientMixin
+from .delivery import DeliveryEngine
+from .parsers import TweetParser, get_parser
+from .polling import AdaptivePollInterval
+from .request_template import RequestTemplate
+from .retry import RetryPolicy, RETRY_BATCH_SIZE
+from .sentiment import apply_sentiment, apply_sentiment_batch, has_stored_sentiment
 
 
 JSON_MATCHER = r'{.*}'
-SYN_TWTR_URL = 'https://cdn.syndication.twimg.com/timeline/profile?callback=__twttr.callbacks.tl_i0_profile_realDonaldTrump_new&dnt=false&lang=en&min_position={}&screen_name=realDonaldTrump&suppress_response_codes=true&t=1745387&tz=GMT-0500&with_replies=false'
+SYN_TWTR_URL = 'https://cdn.syndication.twimg.com/timeline/profile?callback=__twttr.callbacks.tl_i0_profile_{screen_name}_new&dnt=false&lang=en&min_position={min_position}&screen_name={screen_name}&suppress_response_codes=true&t=1745387&tz=GMT-0500&with_replies=false'
 
 
-def _read_requests_file(file_path) -> str:
-    with open(file_path, 'r') as file:
-        return file.read()
+def _as_tweet_id(min_position) -> int:
+    try:
+        return int(min_position)
+    except (TypeError, ValueError):
+        return None
 
 
-class TweetExtractor(object):
-    def __init__(self, url: str, min_position='', *args, **kwargs):
+def _parse_retry_after(retry_after: str) -> float:
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return None
+
+
+class _FetchValidators(object):
+    """ Validators of the last timeline response used for conditional requests """
+
+    def __init__(self, url: str, resp: requests.Response):
+        self.url = url
+        self.etag = resp.headers.get('ETag')
+        self.last_modified = resp.headers.get('Last-Modified')
+        self.digest = hashlib.sha1(resp.content).hexdigest()
+
+    def get_headers(self) -> dict:
+        headers = {}
+        if self.etag is not None:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified is not None:
+            headers['If-Modified-Since'] = self.last_modified
+
+        return headers
+
+
+class TweetExtractor(HttpClientMixin):
+    def __init__(self, url: str, min_position='', parser: TweetParser=None,
+                 screen_name: str=DEFAULT_SCREEN_NAME, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
         self.url = url
+        self.screen_name = screen_name
         self.min_position = min_position
+        self.parser = parser if parser is not None else get_parser()
+
+        self.last_status_code = None
+        self.retry_after = None
+        self._validators = None
+
+    def _get_conditional_headers(self, url: str) -> dict:
+        if self._validators is None or self._validators.url != url:
+            return {}
+
+        return self._validators.get_headers()
+
+    def forget_validators(self):
+        """ Drops the validators of the last response so the next request
+        fetches the timeline again, used when its tweets could not be stored """
+        self._validators = None
 
     def _retrieve_latest_tweets_resp(self, min_position: str) -> dict:
-        logging.debug('getting tweets URL: %s' % self.url.format(self.min_position))
-        resp = requests.get(self.url.format(self.min_position))
+        """
+        Returns the parsed timeline response or None when the request failed or
+        the timeline did not change since the last request. The server is asked
+        with the ETag and Last-Modified of the previous response, and a 200 with
+        the same payload as last time is treated like a 304. """
+        url = self.url.format(min_position=self.min_position, screen_name=self.screen_name)
+        logging.debug('getting tweets URL: %s' % url)
+        resp = self.http.get(url, headers=self._get_conditional_headers(url))
+        self.last_status_code = resp.status_code
+        self.retry_after = _parse_retry_after(resp.headers.get('Retry-After'))
+        if resp.status_code == 304:
+            logging.debug('timeline was not modified')
+            return None
+
         if resp.status_code != 200:
-            return self.__handle_execption__(resp)
-        
+            return self.__handle_execption__(resp, Exception('Unable to get tweets, status code %s' % resp.status_code))
+
+        validators = _FetchValidators(url, resp)
+        unchanged = self._validators is not None and \
+            self._validators.url == url and self._validators.digest == validators.digest
+        self._validators = validators
+        if unchanged:
+            logging.debug('timeline payload did not change')
+            return None
+
         j_body = re.search(JSON_MATCHER, resp.text, re.MULTILINE)
         return json.loads(j_body.group())
 
@@ -53,90 +127,131 @@ class TweetExtractor(object):
 
         self._set_min_position(new_min_position)
 
+    def _parse_tweets(self, body: str, stop_at_id: int=None) -> List[Tweet]:
+        return [
+            Tweet(content=content, tweet_id=tweet_id, source_account=self.screen_name)
+            for tweet_id, content in self.parser.parse(body, stop_at_id=stop_at_id)
+        ]
+
     def get_tweets(self) -> List[Tweet]:
         logging.debug('getting tweets')
+        stop_at_id = _as_tweet_id(self.min_position)
         unparsed_tweets = self._retrieve_latest_tweets_resp(self.min_position)
+        if unparsed_tweets is None:
+            return []
+
         self._set_min_position_from_unparsed_tweets(unparsed_tweets)
 
-        parsed_html = BeautifulSoup(unparsed_tweets['body'])
-        tweets = parsed_html.find_all('p', attrs={'class':'timeline-Tweet-text'})
-        ids = parsed_html.find_all('div', attrs={'class': 'timeline-Tweet'})
-
-        return [
-            Tweet(content=tweet.text, tweet_id=i['data-tweet-id']) 
-            for i, tweet in dict(zip(ids, tweets)).items()
-        ]
+        return self._parse_tweets(unparsed_tweets['body'], stop_at_id=stop_at_id)
 
 
 class TrumpBotMessenger(TweetExtractor):
-    def __init__(self, file_path='requests.json', *args, **kwargs):
+    def __init__(self, file_path='requests.json', delivery_engine: DeliveryEngine=None, *args, **kwargs):
         super().__init__(url=SYN_TWTR_URL, *args, **kwargs)
 
         self._file_path = file_path
-        self._request_body = _read_requests_file(file_path)
+        self._request_template = RequestTemplate.from_file(file_path)
+        self.delivery = delivery_engine if delivery_engine is not None else DeliveryEngine()
 
-    def __clean_content__(self, content: str) -> str:
-        return content.replace('\n', ' ').replace('"', '`')
-        
-    def __send_tweet_msg__(self, content: str, headers=None) -> int:
+    def __send_tweet_msg__(self, content: str, headers=None, **values) -> int:
         """ Responsible for sending the post requests that contains the content of the 
-        tweet and the data from the request.json file.
+        tweet and the data from the request.json file. `values` fills the other
+        placeholders of the request file.
 
         This function can be overwritten to change the way that sends happen. """
         logging.debug('sending message\nContent: %s\nHeaders: %s' % (content, headers))
-        msg = self._request_body.replace('{{ content }}', self.__clean_content__(content))
-        msg_body = json.loads(msg)
-        request_url = msg_body['url']
-        if request_url is None:
-            raise Exception("Request URL cannot be none type")
-
-        req = requests.post(request_url, json=msg_body, headers=headers)
+        msg_body = self._request_template.render(content=content, **values)
+        req = self.http.post(self._request_template.url, json=msg_body, headers=headers)
         return req.status_code
 
+    def _get_template_values(self, tweet: Tweet) -> dict:
+        values = {'tweet_id': tweet.tweet_id, 'date': tweet.date_created.isoformat()}
+        if 'sentiment' in self._request_template.placeholders:
+            if not has_stored_sentiment(tweet):
+                apply_sentiment(tweet)
+
+            values['sentiment'] = tweet.tone
+
+        return values
+
+    def _send_tweet(self, tweet: Tweet) -> int:
+        return self.__send_tweet_msg__(tweet.content, **self._get_template_values(tweet))
+
+    def _get_destination(self, tweet: Tweet) -> str:
+        """ Every tweet is posted to the url of the request file """
+        return self._request_template.url
+
+    def _deliver_tweets(self, tweets: List[Tweet]) -> List[Tweet]:
+        """ Sends the tweets concurrently, oldest first, and sets their `response_code`.
+        An ordered delivery engine sends them one after another per destination. """
+        return self.delivery.deliver(sorted(tweets, key=lambda tweet: tweet.tweet_id), self._send_tweet,
+                                     destination=self._get_destination)
+
     def send_latest_tweets(self) -> List[Tweet]:
         tweets_text = self.get_tweets()
+        self._deliver_tweets(tweets_text)
         logging.debug('sent %s tweets' % len(tweets_text))
-        for tweet in tweets_text:
-            status_code = self.__send_tweet_msg__(tweet.content)
-            tweet.response_code = status_code
 
         return tweets_text
 
 
 class TrumpBotWithMongo(TrumpBotMessenger):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, retry_policy: RetryPolicy=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-    def resend_bad_tweets(self):
-        tweets = Tweet.objects.get_all_bad_responses()
-        attempts = 0
-        while attempts < 10 and len(tweets) > 0:
-            for tweet in tweets:
-                resp_code = self.__send_tweet_msg__(tweet.content)
-                tweet.update(response_code=resp_code)
-                logging.info('Updated %s\tStatus Code: %s\nContent: %s' % (tweet.tweet_id, resp_code, tweet.content))
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
 
-            tweets = Tweet.objects.get_all_bad_responses()
-            attempts += 1
+    def _record_attempts(self, tweets: List[Tweet]) -> List[Tweet]:
+        now = datetime.datetime.utcnow()
+        return [self.retry_policy.record_attempt(tweet, now=now) for tweet in tweets]
+
+    def resend_bad_tweets(self, limit=RETRY_BATCH_SIZE) -> List[Tweet]:
+        """ Resends the tweets whose next attempt is due and stores their new
+        delivery state. Tweets that are not due yet are left to a later run. """
+        tweets = list(Tweet.objects.get_due_retries(limit=limit))
+        if len(tweets) == 0:
+            return tweets
+
+        self._record_attempts(self._deliver_tweets(tweets))
+        report = Tweet.objects.bulk_update_delivery(tweets)
+        if report.updated:
+            DataVersion.objects.bump()
 
-    def send_latest_tweets(self):
-        min_position = Tweet.objects.get_last_tweet_id()
-        self._set_min_position(min_position)
-        tweets = super().send_latest_tweets()
         for tweet in tweets:
-            logging.info('saved tweet %s' % tweet.tweet_id)
-            tweet.save()
+            logging.info('Updated %s\tStatus Code: %s\tState: %s\tAttempts: %s' % (
+                tweet.tweet_id, tweet.response_code, tweet.delivery_state, tweet.attempts))
 
+        logging.info('Resent %s tweets\t%s' % (len(tweets), report))
         return tweets
 
+    def _store_tweets(self, tweets: List[Tweet]) -> List[Tweet]:
+        """ Records the delivery attempt of freshly sent tweets, scores their sentiment
+        and saves them in one bulk write. New tweets are added to the sentiment buckets """
+        tweets = self._record_attempts(tweets)
+        apply_sentiment_batch([tweet for tweet in tweets if not has_stored_sentiment(tweet)])
+
+        report = Tweet.objects.bulk_upsert(tweets)
+        logging.info('saved %s tweets\t%s' % (len(tweets), report))
+        # only tweets stored for the first time count towards the sentiment buckets
+        SentimentBucket.objects.add_tweets([tweets[index] for index in report.inserted_indexes])
+        if report.inserted or report.updated:
+            DataVersion.objects.bump(last_tweet_id=max(tweet.tweet_id for tweet in tweets))
+
+        return tweets
+
+    def send_latest_tweets(self):
+        min_position = Tweet.objects.get_last_tweet_id(source_account=self.screen_name)
+        self._set_min_position(min_position)
+        return self._store_tweets(super().send_latest_tweets())
+
 
 class TrumpBotWithAuth(Authentication, TrumpBotWithMongo): # lgtm [py/missing-call-to-init]
     def __init__(self, auth_file_path='auth.json', *args, **kwargs):
         super().__init__(auth_file_path=auth_file_path, *args, **kwargs)
 
     # overrides the __send_tweet_msg__ to include auth
-    def __send_tweet_msg__(self, content) -> int:
-        return self.rebounce_on_401(super().__send_tweet_msg__, content=content, headers=self.get_bearer_header())
+    def __send_tweet_msg__(self, content, **values) -> int:
+        return self.rebounce_on_401(super().__send_tweet_msg__, content=content, headers=self.get_bearer_header(), **values)
 
 
 class TrumpBot(TrumpBotWithAuth):
@@ -145,17 +260,39 @@ class TrumpBot(TrumpBotWithAuth):
 
 
 class TrumpBotScheduler(TrumpBot, BackgroundScheduler):
-    def __init__(self, *args, **kwargs):
+    POLL_JOB_ID = 'send_latest_tweets'
+
+    def __init__(self, poll_interval: AdaptivePollInterval=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
+        self.poll_interval = poll_interval if poll_interval is not None else AdaptivePollInterval()
+
+    def _poll_latest_tweets(self):
+        """ Runs `send_latest_tweets` and reschedules itself with an interval
+        adapted to the activity of the timeline and the errors of the source. """
+        tweets = []
+        try:
+            tweets = self.send_latest_tweets()
+        except Exception as e:
+            logging.exception('Unable to poll the latest tweets: %s' % e)
+            self.last_status_code = None
+            self.forget_validators()
+
+        seconds = self.poll_interval.on_poll(self.last_status_code, len(tweets), retry_after=self.retry_after)
+        logging.debug('next poll in %s seconds' % seconds)
+        self.reschedule_job(self.POLL_JOB_ID, trigger='interval', seconds=seconds)
+
     def __add_trump_bot_jobs__(self, seconds, **kwargs):
         """ 
-        Adds the jobs for the trump bot.
+        Adds the jobs for the trump bot. The latest tweets are first polled after
+        `seconds`, then with the interval given by `poll_interval`.
 
         Can be overwriten to include other jobs. """ 
-        self.add_job(self.send_latest_tweets, 'interval', seconds=seconds, max_instances=1, **kwargs)
+        self.add_job(self._poll_latest_tweets, 'interval', seconds=seconds, max_instances=1,
+                     id=self.POLL_JOB_ID, **kwargs)
         self.add_job(self.resend_bad_tweets, 'interval', seconds=seconds*2, max_instances=1, **kwargs)
-        logging.info('Added send_latest_tweets and resend_bad_tweets jobs')
+        self.add_job(self.http.log_stats, 'interval', minutes=30, max_instances=1, **kwargs)
+        logging.info('Added send_latest_tweets, resend_bad_tweets and log_stats jobs')
 
     def start(self, paused=False, seconds=30, **kwargs):
         """ Adds the jobs for the trump bot scheduler and starts APScheduler """
@@ -168,5 +305,5 @@ class TrumpBotTest(TrumpBotScheduler):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-    def __send_tweet_msg__(self, content) -> int:
+    def __send_tweet_msg__(self, content, **values) -> int:
         return 200
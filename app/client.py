@@ -0,0 +1,102 @@
+import os
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+HTTP_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', 10))
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 10))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 3.05))
+HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 10))
+HTTP_RETRIES = int(os.environ.get('HTTP_RETRIES', 3))
+HTTP_BACKOFF_FACTOR = float(os.environ.get('HTTP_BACKOFF_FACTOR', 0.3))
+
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+
+class HttpClient(object):
+    """
+    Keeps a single `requests.Session` whose adapters hold one keep-alive
+    connection pool per host, so sequential requests to the same host reuse
+    the TCP+TLS connection.
+
+    `pool_connections` is the number of host pools that are kept and
+    `pool_maxsize` the number of connections kept per host. Every request
+    gets the `(connect, read)` timeout unless one is given.
+
+    Connection errors are retried for every method. Read errors and
+    `RETRY_STATUS_CODES` are only retried for idempotent methods so a webhook
+    never receives the same POST twice. """
+
+    def __init__(self, pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE,
+                 timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+                 retries=HTTP_RETRIES, backoff_factor=HTTP_BACKOFF_FACTOR):
+        self.timeout = timeout
+        self._adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=Retry(
+                total=retries,
+                connect=retries,
+                read=retries,
+                status=retries,
+                backoff_factor=backoff_factor,
+                status_forcelist=RETRY_STATUS_CODES,
+                raise_on_status=False
+            )
+        )
+        self._session = requests.Session()
+        self._session.mount('http://', self._adapter)
+        self._session.mount('https://', self._adapter)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self.timeout)
+        return self._session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def stats(self) -> dict:
+        """
+        Returns the statistics of every live host pool as
+        `{ host: { connections, requests, reuse_rate } }` where `connections`
+        is the number of connections that were opened and `requests` the
+        number of requests sent through them. """
+        pools = self._adapter.poolmanager.pools
+        stats = {}
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+
+            reused = max(pool.num_requests - pool.num_connections, 0)
+            stats['%s://%s:%s' % (pool.scheme, pool.host, pool.port)] = {
+                'connections': pool.num_connections,
+                'requests': pool.num_requests,
+                'reuse_rate': reused / pool.num_requests if pool.num_requests else 0.0,
+            }
+
+        return stats
+
+    def log_stats(self):
+        for host, stats in self.stats().items():
+            logging.info('HTTP pool %s\tConnections: %s\tRequests: %s\tReuse rate: %.2f' % (
+                host, stats['connections'], stats['requests'], stats['reuse_rate']))
+
+    def close(self):
+        self._session.close()
+
+
+class HttpClientMixin(object):
+    """ Gives the class a shared `http` client. When several mixins of a bot
+    inherit from this class they all end up using the same client. """
+
+    def __init__(self, http_client: HttpClient=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.http = http_client if http_client is not None else HttpClient()
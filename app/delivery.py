@@ -0,0 +1,69 @@
+import os
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+from .models import Tweet
+
+
+DELIVERY_MAX_IN_FLIGHT = int(os.environ.get('DELIVERY_MAX_IN_FLIGHT', 8))
+DELIVERY_ORDERED = os.environ.get('DELIVERY_ORDERED', 'false').lower() in ('1', 'true', 'yes')
+
+
+class DeliveryEngine(object):
+    """
+    Sends tweets concurrently on a thread pool. At most `max_in_flight`
+    sends run at the same time across every call to `deliver`.
+
+    Sends are unordered by default. When `ordered` is set, tweets that go
+    to the same destination are sent one after another in the order they
+    were given, while different destinations are still sent concurrently. """
+
+    def __init__(self, max_in_flight: int=DELIVERY_MAX_IN_FLIGHT, ordered: bool=DELIVERY_ORDERED):
+        self.max_in_flight = max_in_flight
+        self.ordered = ordered
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight)
+
+    def _send(self, tweet: Tweet, send: Callable[[Tweet], int]):
+        try:
+            tweet.response_code = send(tweet)
+            tweet.last_error = None
+        except Exception as e:
+            logging.error('Unable to send tweet %s: %s' % (tweet.tweet_id, e))
+            tweet.last_error = str(e)
+
+    def _send_in_order(self, tweets: List[Tweet], send: Callable[[Tweet], int]):
+        for tweet in tweets:
+            self._send(tweet, send)
+
+    def _group_by_destination(self, tweets: List[Tweet], destination: Callable[[Tweet], str]) -> list:
+        groups = OrderedDict()
+        for tweet in tweets:
+            groups.setdefault(destination(tweet), []).append(tweet)
+
+        return list(groups.values())
+
+    def deliver(self, tweets: List[Tweet], send: Callable[[Tweet], int],
+                destination: Callable[[Tweet], str]=None) -> List[Tweet]:
+        """
+        Calls `send` for every tweet and stores the returned status code in
+        `tweet.response_code`. A send that raises is logged, leaves the
+        response code untouched and stores the error in `tweet.last_error`.
+
+        `destination` returns the key used for the ordering guarantee. Without it
+        no two tweets share a destination, so even an ordered engine sends them
+        concurrently. Blocks until every tweet is sent. """
+        if self.ordered and destination is not None:
+            groups = self._group_by_destination(tweets, destination)
+            futures = [self._executor.submit(self._send_in_order, group, send) for group in groups]
+        else:
+            futures = [self._executor.submit(self._send, tweet, send) for tweet in tweets]
+
+        for future in futures:
+            future.result()
+
+        return tweets
+
+    def shutdown(self, wait: bool=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,98 @@
+import os
+import zlib
+from typing import Iterator, List
+
+from flask import json
+
+from .models import Tweet
+
+
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+EXPORT_GZIP_LEVEL = int(os.environ.get('EXPORT_GZIP_LEVEL', 6))
+
+NDJSON = 'ndjson'
+JSON = 'json'
+EXPORT_FORMATS = (NDJSON, JSON)
+EXPORT_MIMETYPES = {NDJSON: 'application/x-ndjson', JSON: 'application/json'}
+
+EXPORT_FIELDS = (
+    'tweet_id', 'date_created', 'response_code', 'content', 'source_account',
+    'delivery_state', 'polarity', 'subjectivity', 'tone'
+)
+DEFAULT_EXPORT_FIELDS = ('date_created', 'response_code', 'content', 'tweet_id')
+
+
+def get_export_fields(value: str=None) -> tuple:
+    """ Parses a comma separated list of fields, defaults to the fields of `Tweet.serialize` """
+    if not value:
+        return DEFAULT_EXPORT_FIELDS
+
+    fields = tuple(field.strip() for field in value.split(',') if field.strip())
+    unknown = [field for field in fields if field not in EXPORT_FIELDS]
+    if unknown or len(fields) == 0:
+        raise Exception('Unknown fields %s, expected some of %s' % (', '.join(unknown), ', '.join(EXPORT_FIELDS)))
+
+    return fields
+
+
+def iter_tweet_batches(since_id: int=None, limit: int=None, fields: tuple=DEFAULT_EXPORT_FIELDS,
+                       batch_size: int=EXPORT_BATCH_SIZE) -> Iterator[List[dict]]:
+    """
+    Yields the tweets newer than `since_id` in `tweet_id` order, `batch_size`
+    at a time, as dicts of `fields`. The raw documents are read from one
+    cursor without building a `Tweet` for each of them, so the memory used
+    does not grow with the number of exported tweets. """
+    tweets = Tweet.objects.filter(tweet_id__gt=since_id) if since_id is not None else Tweet.objects.all()
+    tweets = tweets.order_by('tweet_id').get_filtered_tweets(fields).batch_size(batch_size).timeout(False)
+    if limit is not None:
+        tweets = tweets.limit(limit)
+
+    batch = []
+    for son in tweets:
+        batch.append({field: son.get(field) for field in fields})
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if len(batch) > 0:
+        yield batch
+
+
+def _encode_ndjson(batches: Iterator[List[dict]]) -> Iterator[str]:
+    for batch in batches:
+        yield ''.join(json.dumps(tweet) + '\n' for tweet in batch)
+
+
+def _encode_json_array(batches: Iterator[List[dict]]) -> Iterator[str]:
+    separator = '['
+    for batch in batches:
+        yield separator + ','.join(json.dumps(tweet) for tweet in batch)
+        separator = ','
+
+    yield ']' if separator == ',' else '[]'
+
+
+def gzip_stream(chunks: Iterator[str], level: int=EXPORT_GZIP_LEVEL) -> Iterator[bytes]:
+    """ Compresses the chunks into one gzip stream. Every chunk is flushed
+    so the client can decompress what it got so far. """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf8')) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+
+    yield compressor.flush()
+
+
+def stream_export(export_format: str=NDJSON, gzip: bool=False, **kwargs) -> Iterator[bytes]:
+    """ Streams the tweets as newline delimited JSON or as one JSON array,
+    `kwargs` are passed to `iter_tweet_batches` """
+    if export_format not in EXPORT_FORMATS:
+        raise Exception('Unknown format %s, expected one of %s' % (export_format, ', '.join(EXPORT_FORMATS)))
+
+    encode = _encode_ndjson if export_format == NDJSON else _encode_json_array
+    chunks = encode(iter_tweet_batches(**kwargs))
+    if gzip:
+        return gzip_stream(chunks)
+
+    return (chunk.encode('utf8') for chunk in chunks)
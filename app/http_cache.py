@@ -0,0 +1,113 @@
+import os
+import time
+import datetime
+import functools
+import threading
+
+from flask import request, make_response
+
+from .models import DataVersion
+
+
+DATA_VERSION_TTL = float(os.environ.get('DATA_VERSION_TTL', 1))
+HTTP_CACHE_MAX_AGE = int(os.environ.get('HTTP_CACHE_MAX_AGE', 0))
+
+
+class DataVersionCache(object):
+    """ Keeps the data version for `ttl` seconds so clients that poll get
+    their 304 without a query for every request """
+
+    def __init__(self, ttl: float=DATA_VERSION_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._version = None
+        self._expires_at = None
+
+    def get(self) -> DataVersion:
+        with self._lock:
+            if self._expires_at is not None and self._clock() < self._expires_at:
+                return self._version
+
+        version = DataVersion.objects.get_version()
+        with self._lock:
+            self._version = version
+            self._expires_at = self._clock() + self.ttl
+
+        return version
+
+
+data_versions = DataVersionCache()
+
+
+def _as_utc(date: datetime.datetime) -> datetime.datetime:
+    if date.tzinfo is None:
+        return date.replace(tzinfo=datetime.timezone.utc)
+
+    return date
+
+
+def get_validators(version: DataVersion, window: int=None, now: float=None) -> tuple:
+    """
+    Returns the ETag and the Last-Modified date of responses built from
+    `version`. Responses that also depend on the clock pass a `window` in
+    seconds, their validators change at the start of every window. """
+    etag = '%s-%s' % (version.last_tweet_id, version.counter)
+    last_modified = _as_utc(version.updated_at or datetime.datetime(1970, 1, 1))
+    if window is not None:
+        start = int((now if now is not None else time.time()) // window * window)
+        etag = '%s-%s' % (etag, start)
+        last_modified = max(last_modified, datetime.datetime.fromtimestamp(start, datetime.timezone.utc))
+
+    return etag, last_modified.replace(microsecond=0)
+
+
+def get_current_etag(window: int=None) -> str:
+    """ The ETag of the current data version, None before the data changed for the first time """
+    version = data_versions.get()
+    return get_validators(version, window=window)[0] if version is not None else None
+
+
+def _is_not_modified(etag: str, last_modified: datetime.datetime) -> bool:
+    """ If-None-Match takes precedence over If-Modified-Since """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+
+    if request.if_modified_since is not None:
+        return last_modified <= _as_utc(request.if_modified_since)
+
+    return False
+
+
+def cached_by_data_version(view, window: int=None):
+    """
+    Wraps a view so GET requests are answered with 304 when the data did not
+    change since the client got its copy, without calling the view. Other
+    successful GET responses get the ETag, Last-Modified and Cache-Control
+    headers. Nothing is cached before the data changed for the first time. """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(*args, **kwargs)
+
+        version = data_versions.get()
+        if version is None:
+            return view(*args, **kwargs)
+
+        etag, last_modified = get_validators(version, window=window)
+        if _is_not_modified(etag, last_modified):
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.cache_control.public = True
+        response.cache_control.max_age = HTTP_CACHE_MAX_AGE
+        response.cache_control.must_revalidate = True
+        return response
+
+    return wrapper
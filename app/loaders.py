@@ -0,0 +1,52 @@
+from typing import List
+
+from promise import Promise
+from promise.dataloader import DataLoader
+
+from .models import Tweet
+from .sentiment import score_batch, get_tone_for_polarity
+
+
+class TweetLoader(DataLoader):
+    """ Loads tweets by `tweet_id`. Every id requested while resolving the same
+    level of a query is fetched with one `$in` query, repeated ids are served
+    from the cache of the loader. Missing tweets resolve to None. """
+
+    def batch_load_fn(self, tweet_ids: List[int]) -> Promise:
+        tweets = {tweet.tweet_id: tweet for tweet in Tweet.objects.filter(tweet_id__in=tweet_ids)}
+        return Promise.resolve([tweets.get(tweet_id) for tweet_id in tweet_ids])
+
+
+class SentimentLoader(DataLoader):
+    """ Scores texts that have no stored sentiment, all the texts requested
+    together are scored with one `score_batch` call. Resolves to
+    `(polarity, tone)` pairs. """
+
+    def batch_load_fn(self, texts: List[str]) -> Promise:
+        polarities, _ = score_batch(texts)
+        return Promise.resolve([
+            (polarity, get_tone_for_polarity(polarity).value) for polarity in polarities.tolist()
+        ])
+
+
+class Loaders(object):
+    """ The loaders of one GraphQL request, their caches only live as long as the request """
+
+    def __init__(self):
+        self.tweets = TweetLoader()
+        self.sentiment = SentimentLoader()
+
+
+class GraphQLContext(object):
+    """ Context of a GraphQL request, passed to the resolvers as `info.context` """
+
+    def __init__(self, request=None):
+        self.request = request
+        self.loaders = Loaders()
+
+
+def get_loaders(info) -> Loaders:
+    """ Returns the loaders of the request. Queries executed without a
+    `GraphQLContext` get loaders that only batch within the resolver. """
+    loaders = getattr(info.context, 'loaders', None)
+    return loaders if loaders is not None else Loaders()
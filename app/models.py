@@ -1,12 +1,50 @@
 import os
 import datetime
+from itertools import islice
 
 import mongoengine as mongo
+from mongoengine.queryset.visitor import Q
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 
 mongo_url = os.environ.get('MONGO_DB_URL')
 mongo_db = os.environ.get('MONGO_DB_NAME', 0)
 
-mongo.connect(mongo_db, host=mongo_url)
+# the connection is opened by the first query, not when the models are imported
+mongo.connect(mongo_db, host=mongo_url, connect=False)
+
+DEFAULT_SCREEN_NAME = 'realDonaldTrump'
+
+DUPLICATE_KEY_ERROR = 11000
+
+DELIVERED = 'delivered'
+RETRYING = 'retrying'
+DEAD = 'dead'
+DELIVERY_STATES = (DELIVERED, RETRYING, DEAD)
+
+DELIVERY_FIELDS = ('response_code', 'attempts', 'next_attempt_at', 'last_error', 'delivery_state')
+HOUR = 'hour'
+DAY = 'day'
+MONTH = 'month'
+ALL = 'all'
+HISTORY_GRANULARITIES = (HOUR, DAY, MONTH)
+
+SENTIMENT_FIELDS = ('polarity', 'subjectivity', 'tone', 'sentiment_version')
+
+
+class BulkWriteReport(object):
+    """ Counts of a bulk write. `duplicates` are tweets that were already
+    stored as they are or that hit the unique index on `tweet_id`. """
+
+    def __init__(self, inserted=0, updated=0, duplicates=0, inserted_indexes=None):
+        self.inserted = inserted
+        self.updated = updated
+        self.duplicates = duplicates
+        self.inserted_indexes = inserted_indexes or []
+
+    def __repr__(self):
+        return '<BulkWriteReport inserted=%s updated=%s duplicates=%s>' % (
+            self.inserted, self.updated, self.duplicates)
 
 
 class TweetQuerySet(mongo.QuerySet):
@@ -21,8 +59,17 @@ class TweetQuerySet(mongo.QuerySet):
     def get_last_ten(self):
         return self.all()[:10]
 
-    def get_last_tweet_id(self) -> int:
-        tweet = self.order_by('-tweet_id').limit(1).first()
+    def get_last_tweet_id(self, source_account: str=None) -> int:
+        """ Returns the id of the newest tweet of `source_account` or of the whole
+        collection when no account is given. Tweets stored before the source
+        account existed belong to `DEFAULT_SCREEN_NAME`. """
+        tweets = self
+        if source_account == DEFAULT_SCREEN_NAME:
+            tweets = self.filter(Q(source_account=source_account) | Q(source_account=None))
+        elif source_account is not None:
+            tweets = self.filter(source_account=source_account)
+
+        tweet = tweets.order_by('-tweet_id').limit(1).first()
         return tweet.tweet_id if tweet is not None else 1111111
 
     def get_tweets_from_today(self, hours=24):
@@ -35,18 +82,194 @@ class TweetQuerySet(mongo.QuerySet):
     def get_all_bad_responses(self):
         return self.filter(response_code__gt=200)
 
-    def get_filtered_tweets(self):
-        return self.only('date_created', 'response_code', 'content', 'tweet_id')
+    def _get_legacy_undelivered(self):
+        """ Tweets stored before the delivery state existed that were not delivered """
+        return Q(delivery_state=None) & (Q(response_code__lt=200) | Q(response_code__gte=300))
+
+    def get_due_retries(self, now: datetime.datetime=None, limit=100):
+        """ Returns the tweets whose next delivery attempt is due, oldest first.
+        Uses the (delivery_state, next_attempt_at) index. """
+        now = now or datetime.datetime.utcnow()
+        due = Q(delivery_state=RETRYING, next_attempt_at__lte=now) | self._get_legacy_undelivered()
+        return self.filter(due).order_by('next_attempt_at').limit(limit)
+
+    def get_retry_queue_stats(self, now: datetime.datetime=None) -> dict:
+        now = now or datetime.datetime.utcnow()
+        legacy = self.filter(self._get_legacy_undelivered()).count()
+        return {
+            'retrying': self.filter(delivery_state=RETRYING).count() + legacy,
+            'due': self.filter(delivery_state=RETRYING, next_attempt_at__lte=now).count() + legacy,
+            'dead': self.filter(delivery_state=DEAD).count(),
+        }
+
+    def get_filtered_tweets(self, fields=('date_created', 'response_code', 'content', 'tweet_id')):
+        """ Loads only `fields` and returns the raw documents instead of
+        building a `Tweet` for every one of them """
+        return self.only(*fields).as_pymongo()
 
     def search_tweet_content(self, search):
         return self.search_text(search).order_by('$text_score')
 
+    def _bulk_write(self, operations: list) -> BulkWriteReport:
+        """ Runs the operations as one unordered bulk write so a failing
+        operation does not stop the rest of the batch. """
+        if len(operations) == 0:
+            return BulkWriteReport()
+
+        duplicate_errors = 0
+        try:
+            result = self._collection.bulk_write(operations, ordered=False).bulk_api_result
+        except BulkWriteError as e:
+            result = e.details
+            errors = result.get('writeErrors', [])
+            if any(error['code'] != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+
+            duplicate_errors = len(errors)
+
+        return BulkWriteReport(
+            inserted=result.get('nUpserted', 0),
+            updated=result.get('nModified', 0),
+            duplicates=duplicate_errors + result.get('nMatched', 0) - result.get('nModified', 0),
+            inserted_indexes=[upserted['index'] for upserted in result.get('upserted', [])]
+        )
+
+    def bulk_upsert(self, tweets) -> BulkWriteReport:
+        """ Inserts the tweets keyed on `tweet_id` in a single round trip.
+        Tweets that are already stored only get their delivery fields updated.
+        `inserted_indexes` of the report are the positions of the new tweets in `tweets`. """
+        operations = []
+        for tweet in tweets:
+            document = tweet.to_mongo().to_dict()
+            document.pop('_id', None)
+            document.pop('tweet_id', None)
+            delivery = {field: document.pop(field, None) for field in DELIVERY_FIELDS}
+            operations.append(UpdateOne(
+                {'tweet_id': tweet.tweet_id},
+                {'$setOnInsert': document, '$set': delivery},
+                upsert=True
+            ))
+
+        return self._bulk_write(operations)
+
+    def bulk_update_fields(self, tweets, fields) -> BulkWriteReport:
+        """ Stores `fields` of every tweet in a single round trip """
+        return self._bulk_write([
+            UpdateOne(
+                {'tweet_id': tweet.tweet_id},
+                {'$set': {field: getattr(tweet, field) for field in fields}}
+            )
+            for tweet in tweets
+        ])
+
+    def bulk_update_delivery(self, tweets) -> BulkWriteReport:
+        """ Stores the response code and retry state of the tweets """
+        return self.bulk_update_fields(tweets, DELIVERY_FIELDS)
+
+    def bulk_update_sentiment(self, tweets) -> BulkWriteReport:
+        return self.bulk_update_fields(tweets, SENTIMENT_FIELDS)
+
+    def get_unscored(self, version: int, after_tweet_id: int=None):
+        """ Tweets that were not scored by the sentiment scorer `version`, in `tweet_id` order """
+        tweets = self.filter(sentiment_version__ne=version)
+        if after_tweet_id is not None:
+            tweets = tweets.filter(tweet_id__gt=after_tweet_id)
+
+        return tweets.order_by('tweet_id')
+
+    def get_scored(self, after_tweet_id: int=None):
+        """ Tweets that have a stored sentiment, in `tweet_id` order """
+        tweets = self.filter(polarity__ne=None)
+        if after_tweet_id is not None:
+            tweets = tweets.filter(tweet_id__gt=after_tweet_id)
+
+        return tweets.order_by('tweet_id')
+
+    def get_sentiment_history(self, start: datetime.datetime, end: datetime.datetime,
+                              granularity: str=DAY) -> list:
+        """
+        Groups the scored tweets created in `[start, end)` by their `date_created`
+        truncated to the `granularity` and returns one dict per group, oldest
+        first, with the tweet count, the average polarity and subjectivity and
+        the number of tweets per tone.
+
+        The grouping runs in MongoDB with an aggregation pipeline that matches
+        on the `date_created` index. """
+        if granularity not in HISTORY_GRANULARITIES:
+            raise Exception('Unknown granularity %s, expected one of %s' % (
+                granularity, ', '.join(HISTORY_GRANULARITIES)))
+
+        parts = {'year': {'$year': '$date_created'}, 'month': {'$month': '$date_created'}}
+        if granularity in (DAY, HOUR):
+            parts['day'] = {'$dayOfMonth': '$date_created'}
+        if granularity == HOUR:
+            parts['hour'] = {'$hour': '$date_created'}
+
+        def count_tone(tone):
+            return {'$sum': {'$cond': [{'$eq': ['$tone', tone]}, 1, 0]}}
+
+        match = self.filter(date_created__gte=start, date_created__lt=end, polarity__ne=None)._query
+        pipeline = [
+            {'$match': match},
+            {'$group': {
+                '_id': {'$dateFromParts': parts},
+                'count': {'$sum': 1},
+                'average_polarity': {'$avg': '$polarity'},
+                'average_subjectivity': {'$avg': '$subjectivity'},
+                'positive': count_tone('positive'),
+                'negative': count_tone('negative'),
+                'neutral': count_tone('neutral'),
+            }},
+            {'$sort': {'_id': 1}},
+        ]
+        return [
+            {
+                'start': group['_id'],
+                'count': group['count'],
+                'average_polarity': group['average_polarity'],
+                'average_subjectivity': group['average_subjectivity'],
+                'positive': group['positive'],
+                'negative': group['negative'],
+                'neutral': group['neutral'],
+            }
+            for group in self._collection.aggregate(pipeline)
+        ]
+
+    def iter_chunks(self, chunk_size: int, fields=None):
+        """
+        Streams the tweets of the queryset in `tweet_id` order as lists of at
+        most `chunk_size` tweets. A single cursor is used for the whole
+        collection, it does not time out while the chunks are processed and
+        is closed once the iteration stops. """
+        projection = {field: 1 for field in fields} if fields is not None else None
+        cursor = self._collection.find(
+            self._query, projection, sort=[('tweet_id', 1)],
+            no_cursor_timeout=True, batch_size=chunk_size)
+        with cursor:
+            while True:
+                chunk = [self._document._from_son(son) for son in islice(cursor, chunk_size)]
+                if len(chunk) == 0:
+                    return
+
+                yield chunk
+
 
 class Tweet(mongo.Document):
     date_created = mongo.DateTimeField(default=datetime.datetime.utcnow)
     response_code = mongo.IntField(required=True, default=404)
     content = mongo.StringField(required=True)
     tweet_id = mongo.IntField(required=True, unique=True)
+    source_account = mongo.StringField()
+
+    delivery_state = mongo.StringField(choices=DELIVERY_STATES)
+    attempts = mongo.IntField(default=0)
+    next_attempt_at = mongo.DateTimeField()
+    last_error = mongo.StringField()
+
+    polarity = mongo.FloatField()
+    subjectivity = mongo.FloatField()
+    tone = mongo.StringField()
+    sentiment_version = mongo.IntField()
 
     meta = {
         'queryset_class' : TweetQuerySet,
@@ -55,7 +278,10 @@ class Tweet(mongo.Document):
                 'fields': ['$content'],
                 'default_language': 'english',
                 'weights': {'content': 10}
-            }
+            },
+            ('delivery_state', 'next_attempt_at'),
+            ('source_account', '-tweet_id'),
+            'date_created',
         ]
     }
 
@@ -66,3 +292,230 @@ class Tweet(mongo.Document):
             'content': self.content,
             'tweet_id': self.tweet_id
         }
+
+
+class AccountQuerySet(mongo.QuerySet):
+
+    def get_enabled(self):
+        return self.filter(enabled=True)
+
+    def register(self, screen_names):
+        """ Adds the accounts that are not registered yet and enables them """
+        for screen_name in screen_names:
+            self.filter(screen_name=screen_name).update_one(
+                set__enabled=True, upsert=True)
+
+    def set_cursor(self, screen_name: str, cursor: str):
+        self.filter(screen_name=screen_name).update_one(
+            set__cursor=cursor, set__last_polled_at=datetime.datetime.utcnow())
+
+
+class Account(mongo.Document):
+    """ A timeline that is polled. `cursor` is the `min_position` of its next poll """
+    screen_name = mongo.StringField(required=True, unique=True)
+    enabled = mongo.BooleanField(default=True)
+    cursor = mongo.StringField()
+    last_polled_at = mongo.DateTimeField()
+
+    meta = {
+        'queryset_class': AccountQuerySet,
+        'indexes': ['enabled']
+    }
+
+
+class BackfillCheckpointQuerySet(mongo.QuerySet):
+
+    def get_last_tweet_id(self, name: str, version: int) -> int:
+        """ The last tweet saved by an interrupted run of the job `name` or None """
+        checkpoint = self.filter(name=name, version=version).first()
+        return checkpoint.last_tweet_id if checkpoint is not None else None
+
+    def save_progress(self, name: str, version: int, last_tweet_id: int, processed: int):
+        self.filter(name=name).update_one(
+            set__version=version, set__last_tweet_id=last_tweet_id, set__processed=processed,
+            set__updated_at=datetime.datetime.utcnow(), upsert=True)
+
+    def clear(self, name: str):
+        self.filter(name=name).delete()
+
+
+class BackfillCheckpoint(mongo.Document):
+    """ Progress of a batch job over the tweets, kept until the job finished """
+    name = mongo.StringField(required=True, unique=True)
+    version = mongo.IntField()
+    last_tweet_id = mongo.IntField()
+    processed = mongo.IntField(default=0)
+    updated_at = mongo.DateTimeField()
+
+    meta = {
+        'queryset_class': BackfillCheckpointQuerySet
+    }
+
+
+TWEETS_DATA = 'tweets'
+
+
+class DataVersionQuerySet(mongo.QuerySet):
+
+    def get_version(self, name: str=TWEETS_DATA) -> 'DataVersion':
+        """ The current version of the data `name` or None when it never changed """
+        return self.filter(name=name).first()
+
+    def bump(self, name: str=TWEETS_DATA, last_tweet_id: int=None):
+        """ Records that the data `name` changed, `last_tweet_id` only ever grows """
+        update = {'inc__counter': 1, 'set__updated_at': datetime.datetime.utcnow()}
+        if last_tweet_id is not None:
+            update['max__last_tweet_id'] = last_tweet_id
+
+        self.filter(name=name).update_one(upsert=True, **update)
+
+
+class DataVersion(mongo.Document):
+    """ Changes whenever the tweets or their sentiment are written, the
+    server derives its HTTP validators from it """
+    name = mongo.StringField(required=True, unique=True)
+    last_tweet_id = mongo.IntField(default=0)
+    counter = mongo.IntField(default=0)
+    updated_at = mongo.DateTimeField()
+
+    meta = {
+        'queryset_class': DataVersionQuerySet
+    }
+
+
+GRANULARITIES = (HOUR, DAY, ALL)
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def get_bucket_start(date: datetime.datetime, granularity: str) -> datetime.datetime:
+    if granularity == HOUR:
+        return date.replace(minute=0, second=0, microsecond=0)
+    elif granularity == DAY:
+        return date.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    return EPOCH
+
+
+class SentimentTotals(object):
+    """ Running sums of the sentiment of a group of tweets """
+
+    def __init__(self, count=0, polarity_sum=0.0, subjectivity_sum=0.0,
+                 positive=0, negative=0, neutral=0):
+        self.count = count
+        self.polarity_sum = polarity_sum
+        self.subjectivity_sum = subjectivity_sum
+        self.positive = positive
+        self.negative = negative
+        self.neutral = neutral
+
+    def add(self, other: 'SentimentTotals') -> 'SentimentTotals':
+        self.count += other.count
+        self.polarity_sum += other.polarity_sum
+        self.subjectivity_sum += other.subjectivity_sum
+        self.positive += other.positive
+        self.negative += other.negative
+        self.neutral += other.neutral
+        return self
+
+    def add_tweet(self, tweet, sign: int=1) -> 'SentimentTotals':
+        self.count += sign
+        self.polarity_sum += sign * tweet.polarity
+        self.subjectivity_sum += sign * (tweet.subjectivity or 0.0)
+        if tweet.tone in ('positive', 'negative', 'neutral'):
+            setattr(self, tweet.tone, getattr(self, tweet.tone) + sign)
+
+        return self
+
+    @property
+    def average_polarity(self) -> float:
+        return self.polarity_sum / self.count if self.count > 0 else 0.0
+
+    @property
+    def average_subjectivity(self) -> float:
+        return self.subjectivity_sum / self.count if self.count > 0 else 0.0
+
+
+class SentimentBucketQuerySet(mongo.QuerySet):
+
+    def add_tweets(self, tweets, sign: int=1):
+        """
+        Adds the stored sentiment of the tweets to the hour, day and overall
+        buckets of their `date_created` with one `$inc` upsert per bucket.
+        A `sign` of -1 removes tweets, which is used when they are rescored. """
+        buckets = {}
+        for tweet in tweets:
+            if tweet.polarity is None:
+                continue
+
+            date = tweet.date_created or datetime.datetime.utcnow()
+            for granularity in GRANULARITIES:
+                key = (granularity, get_bucket_start(date, granularity))
+                buckets.setdefault(key, SentimentTotals()).add_tweet(tweet, sign=sign)
+
+        if len(buckets) == 0:
+            return
+
+        self._collection.bulk_write([
+            UpdateOne(
+                {'granularity': granularity, 'start': start},
+                {'$inc': {
+                    'count': totals.count,
+                    'polarity_sum': totals.polarity_sum,
+                    'subjectivity_sum': totals.subjectivity_sum,
+                    'positive': totals.positive,
+                    'negative': totals.negative,
+                    'neutral': totals.neutral,
+                }},
+                upsert=True
+            )
+            for (granularity, start), totals in buckets.items()
+        ], ordered=False)
+
+    def get_totals(self, granularity: str, since: datetime.datetime=None) -> SentimentTotals:
+        buckets = self.filter(granularity=granularity)
+        if since is not None:
+            buckets = buckets.filter(start__gte=get_bucket_start(since, granularity))
+
+        totals = SentimentTotals()
+        for bucket in buckets:
+            totals.add(bucket.get_totals())
+
+        return totals
+
+    def get_recent_totals(self, hours=24) -> SentimentTotals:
+        """ Totals of the hour buckets that overlap the last `hours` hours """
+        since = datetime.datetime.utcnow() - datetime.timedelta(hours=hours)
+        return self.get_totals(HOUR, since=since)
+
+    def get_overall_totals(self) -> SentimentTotals:
+        return self.get_totals(ALL)
+
+
+class SentimentBucket(mongo.Document):
+    """ Sentiment sums of the tweets created during one hour or day,
+    or of every tweet for the `all` granularity """
+    granularity = mongo.StringField(required=True, choices=GRANULARITIES)
+    start = mongo.DateTimeField(required=True)
+    count = mongo.IntField(default=0)
+    polarity_sum = mongo.FloatField(default=0.0)
+    subjectivity_sum = mongo.FloatField(default=0.0)
+    positive = mongo.IntField(default=0)
+    negative = mongo.IntField(default=0)
+    neutral = mongo.IntField(default=0)
+
+    meta = {
+        'queryset_class': SentimentBucketQuerySet,
+        'indexes': [
+            {'fields': ('granularity', 'start'), 'unique': True}
+        ]
+    }
+
+    def get_totals(self) -> SentimentTotals:
+        return SentimentTotals(
+            count=self.count,
+            polarity_sum=self.polarity_sum,
+            subjectivity_sum=self.subjectivity_sum,
+            positive=self.positive,
+            negative=self.negative,
+            neutral=self.neutral
+        )
@@ -0,0 +1,89 @@
+import os
+import base64
+import binascii
+from typing import List
+
+
+PAGE_SIZE = int(os.environ.get('PAGE_SIZE', 20))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 100))
+
+CURSOR_PREFIX = 'tweet:'
+
+
+def encode_cursor(tweet_id: int) -> str:
+    return base64.urlsafe_b64encode(('%s%s' % (CURSOR_PREFIX, tweet_id)).encode('ascii')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> int:
+    """ Returns the `tweet_id` of a cursor made by `encode_cursor` """
+    try:
+        value = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('ascii')
+        if value.startswith(CURSOR_PREFIX):
+            return int(value[len(CURSOR_PREFIX):])
+    except (binascii.Error, UnicodeError, ValueError):
+        pass
+
+    raise Exception('Invalid cursor %s' % cursor)
+
+
+def _get_tweet_id(tweet) -> int:
+    """ Lean queries return raw documents instead of tweets """
+    return tweet['tweet_id'] if isinstance(tweet, dict) else tweet.tweet_id
+
+
+def _get_page_size(size: int) -> int:
+    if size is None:
+        return PAGE_SIZE
+    if size < 0:
+        raise Exception('first and last cannot be negative')
+
+    return min(size, MAX_PAGE_SIZE)
+
+
+class KeysetPage(object):
+    """
+    One page of tweets, newest first, selected with a range on `tweet_id`
+    instead of skipping over the previous pages. `tweet_id` grows with
+    `date_created` so the pages are in creation order as well.
+
+    `count` counts every tweet of the unpaginated queryset and is only
+    queried when it is called. """
+
+    def __init__(self, queryset, first: int=None, after: str=None, last: int=None, before: str=None):
+        if first is not None and last is not None:
+            raise Exception('first and last cannot be combined')
+
+        self._queryset = queryset
+        tweets = queryset
+        if after is not None:
+            tweets = tweets.filter(tweet_id__lt=decode_cursor(after))
+        if before is not None:
+            tweets = tweets.filter(tweet_id__gt=decode_cursor(before))
+
+        self.has_next_page = False
+        self.has_previous_page = False
+        if last is not None:
+            # walk backwards from `before` and flip the page back to newest first
+            size = _get_page_size(last)
+            page = list(tweets.order_by('tweet_id').limit(size + 1))
+            self.has_previous_page = len(page) > size
+            self.tweets = list(reversed(page[:size]))
+        else:
+            size = _get_page_size(first)
+            page = list(tweets.order_by('-tweet_id').limit(size + 1))
+            self.has_next_page = len(page) > size
+            self.tweets = page[:size]
+
+    @property
+    def start_cursor(self) -> str:
+        return encode_cursor(_get_tweet_id(self.tweets[0])) if self.tweets else None
+
+    @property
+    def end_cursor(self) -> str:
+        return encode_cursor(_get_tweet_id(self.tweets[-1])) if self.tweets else None
+
+    def get_cursors(self) -> List[str]:
+        return [encode_cursor(_get_tweet_id(tweet)) for tweet in self.tweets]
+
+    def count(self) -> int:
+        return self._queryset.count()
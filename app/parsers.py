@@ -0,0 +1,132 @@
+import html
+import logging
+import os
+import re
+from typing import List, Tuple
+
+
+TWEET_CLASS = 'timeline-Tweet'
+TWEET_TEXT_CLASS = 'timeline-Tweet-text'
+
+_CONTAINER_MATCHER = re.compile(r'<div\s[^>]*?\bdata-tweet-id="(\d+)"[^>]*>')
+_CLASS_MATCHER = re.compile(r'\bclass="([^"]*)"')
+_TEXT_MATCHER = re.compile(
+    r'<p\s[^>]*?\bclass="(?:[^"]*\s)?%s(?:\s[^"]*)?"[^>]*>(.*?)</p>' % TWEET_TEXT_CLASS,
+    re.DOTALL)
+_TAG_MATCHER = re.compile(r'<[^>]*>')
+
+ParsedTweet = Tuple[int, str]
+
+
+def _is_older(tweet_id: int, stop_at_id: int) -> bool:
+    return stop_at_id is not None and tweet_id <= stop_at_id
+
+
+class TweetParser(object):
+    """ Base class for the timeline parsers. A parser receives the html `body`
+    of a syndication response and returns `(tweet_id, content)` pairs,
+    one per `timeline-Tweet` container.
+
+    Tweets with an id less than or equal to `stop_at_id` are skipped. Pinned
+    tweets and retweets can put older ids above newer ones, so the whole
+    timeline is always parsed. """
+    name = None
+
+    def parse(self, body: str, stop_at_id: int = None) -> List[ParsedTweet]:
+        raise NotImplementedError
+
+
+class TokenizerTweetParser(TweetParser):
+    """ Targeted tokenizer that only looks at the tweet containers and their
+    text paragraph. No document tree is built and the text of tweets that
+    are not newer than `stop_at_id` is never extracted. """
+    name = 'tokenizer'
+
+    def _get_container_spans(self, body: str):
+        """ Yields the id and the span of every container, the body is only
+        scanned as far as the spans are consumed """
+        previous = None
+        for match in _CONTAINER_MATCHER.finditer(body):
+            if not self._has_tweet_class(match.group(0)):
+                continue
+
+            if previous is not None:
+                yield int(previous.group(1)), previous.end(), match.start()
+            previous = match
+
+        if previous is not None:
+            yield int(previous.group(1)), previous.end(), len(body)
+
+    def _has_tweet_class(self, tag: str) -> bool:
+        classes = _CLASS_MATCHER.search(tag)
+        return classes is not None and TWEET_CLASS in classes.group(1).split()
+
+    def _get_text(self, body: str, start: int, end: int) -> str:
+        match = _TEXT_MATCHER.search(body, start, end)
+        if match is None:
+            return None
+
+        return html.unescape(_TAG_MATCHER.sub('', match.group(1)))
+
+    def parse(self, body: str, stop_at_id: int = None) -> List[ParsedTweet]:
+        tweets = []
+        for tweet_id, start, end in self._get_container_spans(body):
+            if _is_older(tweet_id, stop_at_id):
+                continue
+
+            content = self._get_text(body, start, end)
+            if content is None:
+                logging.warning('Tweet %s did not contain any text' % tweet_id)
+                continue
+
+            tweets.append((tweet_id, content))
+
+        return tweets
+
+
+class BeautifulSoupTweetParser(TweetParser):
+    """ Builds the full document tree with BeautifulSoup. Slower than the
+    tokenizer but tolerant to markup changes so it is kept as a fallback. """
+    name = 'bs4'
+
+    def parse(self, body: str, stop_at_id: int = None) -> List[ParsedTweet]:
+        # only imported when this parser is selected
+        from bs4 import BeautifulSoup
+
+        parsed_html = BeautifulSoup(body, 'html.parser')
+        tweets = []
+        for container in parsed_html.find_all('div', attrs={'class': TWEET_CLASS}):
+            if container.get('data-tweet-id') is None:
+                continue
+
+            tweet_id = int(container['data-tweet-id'])
+            if _is_older(tweet_id, stop_at_id):
+                continue
+
+            text = container.find('p', attrs={'class': TWEET_TEXT_CLASS})
+            if text is None:
+                logging.warning('Tweet %s did not contain any text' % tweet_id)
+                continue
+
+            tweets.append((tweet_id, text.text))
+
+        return tweets
+
+
+PARSERS = {
+    TokenizerTweetParser.name: TokenizerTweetParser,
+    BeautifulSoupTweetParser.name: BeautifulSoupTweetParser,
+    "default": TokenizerTweetParser,
+}
+
+
+def get_parser(name: str = None, default='default') -> TweetParser:
+    """ Returns an instance of the parser registered as `name`. When `name`
+    is not given the `TWEET_PARSER` environment variable is used. """
+    name = name or os.environ.get('TWEET_PARSER', default)
+    parser_class = PARSERS.get(name)
+    if parser_class is None:
+        logging.warning('Unable to find tweet parser: %s. Using default parser.' % name)
+        parser_class = PARSERS.get(default)
+
+    return parser_class()
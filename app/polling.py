@@ -0,0 +1,63 @@
+import os
+
+
+POLL_MIN_INTERVAL = float(os.environ.get('POLL_MIN_INTERVAL', 10))
+POLL_IDLE_INTERVAL = float(os.environ.get('POLL_IDLE_INTERVAL', 120))
+POLL_MAX_INTERVAL = float(os.environ.get('POLL_MAX_INTERVAL', 15 * 60))
+POLL_BACKOFF_FACTOR = float(os.environ.get('POLL_BACKOFF_FACTOR', 1.5))
+
+
+class AdaptivePollInterval(object):
+    """
+    Keeps the number of seconds to wait before the next poll of a timeline.
+
+    After a poll that returned new tweets the interval drops to
+    `min_interval`. Every poll without new tweets grows it by `factor` up to
+    `idle_interval`, and every failed or rate limited poll grows it up to
+    `max_interval`. A `Retry-After` given by the source is always honoured. """
+
+    def __init__(self, interval: float=None, min_interval: float=POLL_MIN_INTERVAL,
+                 idle_interval: float=POLL_IDLE_INTERVAL, max_interval: float=POLL_MAX_INTERVAL,
+                 factor: float=POLL_BACKOFF_FACTOR):
+        self.min_interval = min_interval
+        self.idle_interval = idle_interval
+        self.max_interval = max_interval
+        self.factor = factor
+        self.interval = interval if interval is not None else min_interval
+
+    def _grow(self, limit: float) -> float:
+        self.interval = max(self.min_interval, min(limit, self.interval * self.factor))
+        return self.interval
+
+    def on_activity(self) -> float:
+        self.interval = self.min_interval
+        return self.interval
+
+    def on_idle(self) -> float:
+        if self.interval > self.idle_interval:
+            # recovering from errors, do not keep waiting longer than when idle
+            self.interval = self.idle_interval
+            return self.interval
+
+        return self._grow(self.idle_interval)
+
+    def on_error(self) -> float:
+        return self._grow(self.max_interval)
+
+    def on_rate_limited(self, retry_after: float=None) -> float:
+        self._grow(self.max_interval)
+        if retry_after is not None:
+            self.interval = max(self.interval, retry_after)
+
+        return self.interval
+
+    def on_poll(self, status_code: int, tweets: int, retry_after: float=None) -> float:
+        """ Updates the interval from the result of a poll and returns it """
+        if status_code == 429:
+            return self.on_rate_limited(retry_after)
+        elif status_code is None or status_code not in (200, 304):
+            return self.on_error()
+        elif tweets > 0:
+            return self.on_activity()
+
+        return self.on_idle()
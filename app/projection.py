@@ -0,0 +1,81 @@
+from typing import List, Set
+
+from graphene.utils.str_converters import to_snake_case
+from graphql.language import ast
+
+from .models import SENTIMENT_FIELDS
+
+
+# the stored fields every field of TweetObj is resolved from, a sentiment
+# that was not stored at ingest is scored from the content
+TWEET_PROJECTIONS = {
+    'date_created': ('date_created',),
+    'response_code': ('response_code',),
+    'content': ('content',),
+    'tweet_id': ('tweet_id',),
+    'sentiment': ('content',) + SENTIMENT_FIELDS,
+}
+
+
+class TweetRow(object):
+    """ TweetRow wraps a raw tweet document returned by a lean query so it
+    can be read like a `Tweet`. Fields that were not projected are None. """
+    date_created = None
+    response_code = None
+    content = None
+    tweet_id = None
+    polarity = None
+    subjectivity = None
+    tone = None
+    sentiment_version = None
+
+    def __init__(self, son: dict):
+        self.__dict__ = son
+
+
+def _collect_fields(selection_set, fragments: dict, fields: dict):
+    """ Adds the fields of a selection set to `fields`, keyed on their snake case
+    name. Fragments are inlined, a field selected twice has its selections merged. """
+    if selection_set is None:
+        return
+
+    for selection in selection_set.selections:
+        if isinstance(selection, ast.Field):
+            fields.setdefault(to_snake_case(selection.name.value), []).append(selection)
+        elif isinstance(selection, ast.FragmentSpread):
+            _collect_fields(fragments[selection.name.value].selection_set, fragments, fields)
+        elif isinstance(selection, ast.InlineFragment):
+            _collect_fields(selection.selection_set, fragments, fields)
+
+
+def get_selected_fields(info, *path: str) -> Set[str]:
+    """
+    Returns the snake case names of the fields selected under the field
+    that is being resolved, or under `path` below it, e.g.
+    `get_selected_fields(info, 'edges', 'node')` for the nodes of a connection.
+
+    @include and @skip are not evaluated, a skipped field is still selected. """
+    nodes = info.field_asts
+    for name in path:
+        children = []
+        for node in nodes:
+            fields = {}
+            _collect_fields(node.selection_set, info.fragments, fields)
+            children.extend(fields.get(name, []))
+        nodes = children
+
+    fields = {}
+    for node in nodes:
+        _collect_fields(node.selection_set, info.fragments, fields)
+
+    return set(fields)
+
+
+def get_tweet_projection(info, *path: str) -> List[str]:
+    """ The stored fields needed to resolve the selected fields of a TweetObj.
+    `tweet_id` is always loaded, the pages of a connection are keyed on it. """
+    projection = {'tweet_id'}
+    for field in get_selected_fields(info, *path):
+        projection.update(TWEET_PROJECTIONS.get(field, ()))
+
+    return sorted(projection)
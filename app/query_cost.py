@@ -0,0 +1,280 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from functools import partial
+
+from graphql.backend import GraphQLBackend, GraphQLDocument
+from graphql.error import GraphQLError
+from graphql.execution import ExecutionResult
+from graphql.execution.middleware import MiddlewareManager
+from graphql.language import ast
+from graphql.type.definition import GraphQLList, GraphQLNonNull, GraphQLObjectType, get_named_type
+
+from .pagination import PAGE_SIZE, MAX_PAGE_SIZE
+
+
+GRAPHQL_MAX_COST = int(os.environ.get('GRAPHQL_MAX_COST', 5000))
+GRAPHQL_MAX_DEPTH = int(os.environ.get('GRAPHQL_MAX_DEPTH', 10))
+GRAPHQL_MAX_ALIASES = int(os.environ.get('GRAPHQL_MAX_ALIASES', 20))
+# cost a client may spend per minute, 0 turns the per client budgets off
+GRAPHQL_CLIENT_BUDGET = int(os.environ.get('GRAPHQL_CLIENT_BUDGET', 0))
+# seconds a query may run, 0 turns the timeout off
+GRAPHQL_TIMEOUT = float(os.environ.get('GRAPHQL_TIMEOUT', 10))
+
+# objects cost 1 and scalars nothing unless they are listed here
+FIELD_COSTS = {
+    'Query.todaysSentiment': 10,
+    'Query.overallSentiment': 10,
+    'Query.sentimentHistory': 20,
+    'Query.retryQueue': 10,
+    'Query.searchTweets': 10,
+    'Query.searchTweetsConnection': 10,
+    'TweetConnection.totalCount': 10,
+    'TweetObj.sentiment': 5,
+}
+
+# expected number of items of the lists that are not paginated
+LIST_SIZES = {
+    'Query.tweets': 1000,
+    'Query.searchTweets': 1000,
+    'Query.sentimentHistory': 31,
+}
+DEFAULT_LIST_SIZE = 10
+
+
+class QueryCost(object):
+    """ The estimated cost of an operation, the deepest field and the number of aliases """
+
+    def __init__(self):
+        self.cost = 0
+        self.depth = 0
+        self.aliases = 0
+
+    def __repr__(self):
+        return '<QueryCost cost=%s depth=%s aliases=%s>' % (self.cost, self.depth, self.aliases)
+
+
+def _is_list(field_type) -> bool:
+    if isinstance(field_type, GraphQLNonNull):
+        field_type = field_type.of_type
+
+    return isinstance(field_type, GraphQLList)
+
+
+def _get_int_argument(field: ast.Field, name: str, variables: dict):
+    for argument in field.arguments or []:
+        if argument.name.value != name:
+            continue
+
+        if isinstance(argument.value, ast.Variable):
+            return variables.get(argument.value.name.value)
+        if isinstance(argument.value, ast.IntValue):
+            return int(argument.value.value)
+
+    return None
+
+
+def _is_page_size(size) -> bool:
+    return isinstance(size, int) and not isinstance(size, bool) and size >= 0
+
+
+def _get_page_size(field: ast.Field, variables: dict) -> int:
+    """ The larger of `first` and `last`. Negative sizes and sizes that are not an int
+    are counted as `MAX_PAGE_SIZE` so they cannot lower the estimate """
+    sizes = [_get_int_argument(field, name, variables) for name in ('first', 'last')]
+    sizes = [size for size in sizes if size is not None]
+    if not all(_is_page_size(size) for size in sizes):
+        return MAX_PAGE_SIZE
+
+    return min(max(sizes, default=0) or PAGE_SIZE, MAX_PAGE_SIZE)
+
+
+class _CostEstimator(object):
+    """ _CostEstimator is a private class that walks the selections of one operation """
+
+    def __init__(self, schema, fragments: dict, variables: dict):
+        self.schema = schema
+        self.fragments = fragments
+        self.variables = variables
+        self.estimate = QueryCost()
+
+    def _iter_fields(self, selection_set, parent_type, spread: frozenset):
+        """ Yields the fields of a selection set with their parent type, fragments are inlined """
+        for selection in selection_set.selections:
+            if isinstance(selection, ast.Field):
+                yield selection, parent_type
+                continue
+
+            fragment = selection
+            fragment_spread = spread
+            if isinstance(selection, ast.FragmentSpread):
+                name = selection.name.value
+                fragment = self.fragments.get(name)
+                if fragment is None or name in spread:
+                    continue
+                fragment_spread = spread | {name}
+
+            fragment_type = parent_type
+            if fragment.type_condition is not None:
+                fragment_type = self.schema.get_type(fragment.type_condition.name.value) or parent_type
+
+            for field in self._iter_fields(fragment.selection_set, fragment_type, fragment_spread):
+                yield field
+
+    def get_cost(self, selection_set, parent_type, depth: int, page_size: int=None) -> int:
+        cost = 0
+        for field, field_parent in self._iter_fields(selection_set, parent_type, frozenset()):
+            if field.alias is not None:
+                self.estimate.aliases += 1
+
+            fields = getattr(field_parent, 'fields', None) or {}
+            definition = fields.get(field.name.value)
+            if definition is None:
+                # __typename and unknown fields, the validation rejects the latter
+                continue
+
+            self.estimate.depth = max(self.estimate.depth, depth)
+            key = '%s.%s' % (field_parent.name, field.name.value)
+            named_type = get_named_type(definition.type)
+            field_cost = FIELD_COSTS.get(key, 1 if isinstance(named_type, GraphQLObjectType) else 0)
+
+            if field.selection_set is not None:
+                paginated = 'first' in definition.args or 'last' in definition.args
+                field_cost += self.get_cost(
+                    field.selection_set, named_type, depth + 1,
+                    page_size=_get_page_size(field, self.variables) if paginated else None)
+
+            if _is_list(definition.type):
+                field_cost *= LIST_SIZES.get(key) or page_size or DEFAULT_LIST_SIZE
+
+            cost += max(field_cost, 0)
+
+        return cost
+
+
+def estimate_cost(schema, document_ast: ast.Document, operation_name: str=None,
+                  variables: dict=None) -> QueryCost:
+    """
+    Estimates the cost of an operation without running it. Every field costs
+    its entry in `FIELD_COSTS` plus the cost of its selections, multiplied by
+    the expected size of the field when it is a list. Paginated lists are as
+    long as their `first` or `last` argument. """
+    fragments = {}
+    operation = None
+    for definition in document_ast.definitions:
+        if isinstance(definition, ast.FragmentDefinition):
+            fragments[definition.name.value] = definition
+        elif isinstance(definition, ast.OperationDefinition):
+            if operation_name is None or (definition.name is not None and definition.name.value == operation_name):
+                operation = operation or definition
+
+    estimator = _CostEstimator(schema, fragments, variables or {})
+    if operation is not None:
+        root_type = schema.get_mutation_type() if operation.operation == 'mutation' else schema.get_query_type()
+        estimator.estimate.cost = estimator.get_cost(operation.selection_set, root_type, 1)
+
+    return estimator.estimate
+
+
+class ClientBudgets(object):
+    """
+    Every client may spend `budget` per minute, unused budget is refilled
+    continuously up to `budget`. Only the last `max_clients` clients are tracked. """
+
+    def __init__(self, budget: int=GRAPHQL_CLIENT_BUDGET, max_clients: int=10000, clock=time.monotonic):
+        self.budget = budget
+        self.max_clients = max_clients
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._clients = OrderedDict()
+
+    def spend(self, client: str, cost: int) -> bool:
+        """ Takes `cost` from the budget of `client`, returns False without taking
+        anything when the budget does not cover it """
+        if self.budget <= 0:
+            return True
+
+        cost = max(cost, 0)
+        now = self._clock()
+        with self._lock:
+            available, updated_at = self._clients.pop(client, (self.budget, now))
+            available = min(self.budget, available + (now - updated_at) * self.budget / 60)
+            allowed = cost <= available
+            self._clients[client] = (available - cost if allowed else available, now)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+
+            return allowed
+
+
+class _Deadline(object):
+    """ _Deadline is a private middleware that stops resolving fields once the query ran out of time """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout
+
+    def resolve(self, next, root, info, **args):
+        if time.monotonic() > self.deadline:
+            raise GraphQLError('The query did not finish within %s seconds' % self.timeout)
+
+        return next(root, info, **args)
+
+
+def _get_client(context) -> str:
+    request = getattr(context, 'request', None)
+    return getattr(request, 'remote_addr', None) or 'unknown'
+
+
+class QueryCostBackend(GraphQLBackend):
+    """
+    Rejects operations that are nested deeper than `max_depth`, use more than
+    `max_aliases` aliases or whose estimated cost is over `max_cost` before
+    they are passed to `backend`. With `budgets` every client can only spend
+    its budget per minute. Operations that run longer than `timeout` seconds
+    stop resolving further fields. """
+
+    def __init__(self, backend: GraphQLBackend, max_cost: int=GRAPHQL_MAX_COST, max_depth: int=GRAPHQL_MAX_DEPTH,
+                 max_aliases: int=GRAPHQL_MAX_ALIASES, budgets: ClientBudgets=None,
+                 timeout: float=GRAPHQL_TIMEOUT, get_client=_get_client):
+        self.backend = backend
+        self.max_cost = max_cost
+        self.max_depth = max_depth
+        self.max_aliases = max_aliases
+        self.budgets = budgets if budgets is not None else ClientBudgets()
+        self.timeout = timeout
+        self.get_client = get_client
+
+    def document_from_string(self, schema, request_string):
+        document = self.backend.document_from_string(schema, request_string)
+        return GraphQLDocument(
+            schema=schema,
+            document_string=document.document_string,
+            document_ast=document.document_ast,
+            execute=partial(self._execute, document)
+        )
+
+    def _get_error(self, estimate: QueryCost, context) -> str:
+        if estimate.depth > self.max_depth:
+            return 'The query is nested %s levels deep, at most %s are allowed' % (estimate.depth, self.max_depth)
+        if estimate.aliases > self.max_aliases:
+            return 'The query uses %s aliases, at most %s are allowed' % (estimate.aliases, self.max_aliases)
+        if estimate.cost > self.max_cost:
+            return 'The query costs %s, at most %s are allowed' % (estimate.cost, self.max_cost)
+        if not self.budgets.spend(self.get_client(context), estimate.cost):
+            return 'The query costs %s, more than is left of the budget of %s per minute' % (
+                estimate.cost, self.budgets.budget)
+
+        return None
+
+    def _execute(self, document: GraphQLDocument, operation_name=None, variable_values=None, **kwargs):
+        estimate = estimate_cost(document.schema, document.document_ast, operation_name, variable_values)
+        error = self._get_error(estimate, kwargs.get('context'))
+        if error is not None:
+            return ExecutionResult(errors=[GraphQLError(error)], invalid=True)
+
+        if self.timeout > 0 and not kwargs.get('middleware'):
+            kwargs['middleware'] = MiddlewareManager(_Deadline(self.timeout), wrap_in_promise=False)
+
+        return document.execute(operation_name=operation_name, variable_values=variable_values, **kwargs)
@@ -0,0 +1,94 @@
+import json
+import re
+from typing import Any, Dict
+
+PLACEHOLDERS = ('content', 'tweet_id', 'date', 'sentiment')
+PLACEHOLDER_MATCHER = re.compile(r'{{\s*(%s)\s*}}' % '|'.join(PLACEHOLDERS))
+
+
+class _Slot(object):
+    """ A string value of the request file that contains placeholders """
+
+    def __init__(self, template: str):
+        self.template = template
+        self.placeholders = set(PLACEHOLDER_MATCHER.findall(template))
+
+        whole = PLACEHOLDER_MATCHER.fullmatch(template)
+        self._name = whole.group(1) if whole is not None else None
+
+    def render(self, values: dict) -> str:
+        if self._name is not None:
+            return str(values.get(self._name, ''))
+
+        return PLACEHOLDER_MATCHER.sub(lambda match: str(values.get(match.group(1), '')), self.template)
+
+
+def _compile_slots(node) -> dict:
+    """ Returns a plan with the same shape as `node` that only contains
+    the containers leading to a slot. """
+    items = node.items() if isinstance(node, dict) else enumerate(node)
+    plan = {}
+    for key, value in items:
+        if isinstance(value, str) and PLACEHOLDER_MATCHER.search(value):
+            plan[key] = _Slot(value)
+        elif isinstance(value, (dict, list)):
+            sub_plan = _compile_slots(value)
+            if sub_plan:
+                plan[key] = sub_plan
+
+    return plan
+
+
+def _render(node, plan: dict, values: dict):
+    rendered = dict(node) if isinstance(node, dict) else list(node)
+    for key, sub_plan in plan.items():
+        if isinstance(sub_plan, _Slot):
+            rendered[key] = sub_plan.render(values)
+        else:
+            rendered[key] = _render(node[key], sub_plan, values)
+
+    return rendered
+
+
+def _get_placeholders(plan: dict) -> set:
+    placeholders = set()
+    for sub_plan in plan.values():
+        if isinstance(sub_plan, _Slot):
+            placeholders |= sub_plan.placeholders
+        else:
+            placeholders |= _get_placeholders(sub_plan)
+
+    return placeholders
+
+
+class RequestTemplate(object):
+    """
+    A request file compiled once into its parsed body and the location of
+    every `{{ placeholder }}` it contains.
+
+    `render` only copies the containers that hold a placeholder and
+    substitutes the values in place, the result is a new dict that is
+    JSON encoded when sent so tweet content never needs escaping. """
+
+    def __init__(self, body: Dict[str, Any]):
+        self.body = body
+        self.url = body.get('url')
+        if self.url is None:
+            raise Exception("Request URL cannot be none type")
+
+        self._plan = _compile_slots(body)
+        self.placeholders = _get_placeholders(self._plan)
+
+    @classmethod
+    def compile(cls, raw: str) -> 'RequestTemplate':
+        return cls(json.loads(raw))
+
+    @classmethod
+    def from_file(cls, file_path: str) -> 'RequestTemplate':
+        with open(file_path, 'r') as file:
+            return cls.compile(file.read())
+
+    def render(self, **values) -> Dict[str, Any]:
+        """ Returns a copy of the body with the placeholders replaced by `values`.
+        Placeholders without a value are rendered as an empty string. """
+        return _render(self.body, self._plan, values)
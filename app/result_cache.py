@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from functools import partial
+
+from graphql.backend import GraphQLBackend, GraphQLCoreBackend, GraphQLDocument
+from graphql.language.printer import print_ast
+
+
+GRAPHQL_CACHE_SIZE = int(os.environ.get('GRAPHQL_CACHE_SIZE', 256))
+GRAPHQL_CACHE_TTL = float(os.environ.get('GRAPHQL_CACHE_TTL', 60))
+
+
+class ResultCache(object):
+    """
+    A thread safe LRU cache that holds at most `maxsize` entries, each for at
+    most `ttl` seconds or forever when `ttl` is None. A `maxsize` of 0 turns
+    the cache off.
+
+    Entries are dropped as a whole when `set_version` is called with a
+    version other than the one they were cached under. """
+
+    def __init__(self, maxsize: int=GRAPHQL_CACHE_SIZE, ttl: float=GRAPHQL_CACHE_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """ Returns the value cached under `key` or None """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+
+        expires_at = self._clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def set_version(self, version):
+        with self._lock:
+            if version == self._version:
+                return
+
+            if len(self._entries) > 0:
+                self._entries.clear()
+                self.invalidations += 1
+
+            self._version = version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+class CachingBackend(GraphQLBackend):
+    """
+    Executes queries like the default backend of graphql-core but serves
+    the results of identical queries from `results`.
+
+    Results are keyed on the normalized query text, the operation name, the
+    variables and the data version returned by `get_version`, so every
+    process drops its cached results once the data changed. Mutations and
+    results with errors are never cached. Parsed documents are kept in an
+    LRU cache of their own. """
+
+    def __init__(self, results: ResultCache, get_version, backend: GraphQLBackend=None,
+                 documents: ResultCache=None):
+        self.results = results
+        self.get_version = get_version
+        self.backend = backend if backend is not None else GraphQLCoreBackend()
+        self.documents = documents if documents is not None else ResultCache(maxsize=results.maxsize, ttl=None)
+
+    def document_from_string(self, schema, request_string):
+        key = (schema, request_string)
+        document = self.documents.get(key)
+        if document is None:
+            parsed = self.backend.document_from_string(schema, request_string)
+            document = GraphQLDocument(
+                schema=schema,
+                document_string=parsed.document_string,
+                document_ast=parsed.document_ast,
+                execute=partial(self._execute, parsed, print_ast(parsed.document_ast))
+            )
+            self.documents.set(key, document)
+
+        return document
+
+    def _execute(self, document: GraphQLDocument, query: str, operation_name=None, variable_values=None, **kwargs):
+        if document.get_operation_type(operation_name) != 'query':
+            return document.execute(operation_name=operation_name, variable_values=variable_values, **kwargs)
+
+        version = self.get_version()
+        self.results.set_version(version)
+        key = (query, operation_name, json.dumps(variable_values, sort_keys=True, default=str), version)
+        result = self.results.get(key)
+        if result is not None:
+            return result
+
+        result = document.execute(operation_name=operation_name, variable_values=variable_values, **kwargs)
+        if not result.errors and not result.invalid:
+            self.results.set(key, result)
+
+        return result
@@ -0,0 +1,58 @@
+import os
+import random
+import datetime
+
+from .models import Tweet, DELIVERED, RETRYING, DEAD
+
+
+RETRY_BASE_DELAY = float(os.environ.get('RETRY_BASE_DELAY', 30))
+RETRY_MAX_DELAY = float(os.environ.get('RETRY_MAX_DELAY', 60 * 60))
+RETRY_MAX_ATTEMPTS = int(os.environ.get('RETRY_MAX_ATTEMPTS', 10))
+RETRY_BATCH_SIZE = int(os.environ.get('RETRY_BATCH_SIZE', 100))
+
+
+def is_delivered(response_code: int) -> bool:
+    return response_code is not None and 200 <= response_code < 300
+
+
+class RetryPolicy(object):
+    """
+    Exponential backoff with jitter for failed deliveries.
+
+    The n-th failed attempt waits between half and all of
+    `base_delay * 2 ** (n - 1)`, capped at `max_delay`. A tweet that failed
+    `max_attempts` times is moved to the dead letter state and is no
+    longer retried. """
+
+    def __init__(self, base_delay: float=RETRY_BASE_DELAY, max_delay: float=RETRY_MAX_DELAY,
+                 max_attempts: int=RETRY_MAX_ATTEMPTS, rng: random.Random=None):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self._rng = rng or random.Random()
+
+    def get_delay(self, attempts: int) -> float:
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay / 2 + self._rng.uniform(0, delay / 2)
+
+    def record_attempt(self, tweet: Tweet, now: datetime.datetime=None) -> Tweet:
+        """ Updates the delivery state of the tweet from the result of its last send,
+        `tweet.last_error` is set by the delivery engine when the send raised. """
+        now = now or datetime.datetime.utcnow()
+        if tweet.last_error is None and is_delivered(tweet.response_code):
+            tweet.delivery_state = DELIVERED
+            tweet.next_attempt_at = None
+            return tweet
+
+        tweet.attempts = (tweet.attempts or 0) + 1
+        if tweet.last_error is None:
+            tweet.last_error = 'HTTP %s' % tweet.response_code
+
+        if tweet.attempts >= self.max_attempts:
+            tweet.delivery_state = DEAD
+            tweet.next_attempt_at = None
+        else:
+            tweet.delivery_state = RETRYING
+            tweet.next_attempt_at = now + datetime.timedelta(seconds=self.get_delay(tweet.attempts))
+
+        return tweet
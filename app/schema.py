@@ -1,8 +1,14 @@
 from graphene import ObjectType, String, Schema, Boolean
 from graphene import DateTime, Int, Field, List, Float
+from graphene import relay
 
+from .loaders import get_loaders
 from .models import Tweet
-from .sentiment import Sentiment, SentimentWithHistory, OverallSentiment
+from .models import DAY
+from .pagination import KeysetPage, MAX_PAGE_SIZE
+from .projection import TweetRow, get_tweet_projection
+from .sentiment import SentimentWithHistory, OverallSentiment, has_stored_sentiment
+from .sentiment import get_sentiment_history
 
 
 class SentimentObj(ObjectType):
@@ -17,14 +23,82 @@ class TweetObj(ObjectType):
     tweet_id = String()
     sentiment = Field(SentimentObj)
 
+    stored_sentiment = None
+
     def resolve_sentiment(self, info):
-        s = Sentiment(self.content)
-        return SentimentObj(tone=s.get_tone_value(), percentage=s.polarity)
+        if self.stored_sentiment is not None:
+            return self.stored_sentiment
+
+        # tweets without a stored sentiment of the same query are scored together
+        return get_loaders(info).sentiment.load(self.content or '').then(
+            lambda scores: SentimentObj(tone=scores[1], percentage=scores[0]))
+
+
+TWEET_FIELDS = ('date_created', 'response_code', 'content', 'tweet_id')
+
+
+def _to_tweet_obj(tweet: Tweet) -> TweetObj:
+    """ Builds the TweetObj of a tweet or of a raw document returned by a lean
+    query, reusing the sentiment stored at ingest """
+    if isinstance(tweet, dict):
+        tweet = TweetRow(tweet)
+
+    tweet_obj = TweetObj(**{field: getattr(tweet, field) for field in TWEET_FIELDS})
+    if has_stored_sentiment(tweet):
+        tweet_obj.stored_sentiment = SentimentObj(tone=tweet.tone, percentage=tweet.polarity)
+
+    return tweet_obj
+
+
+class TweetConnection(relay.Connection):
+    class Meta:
+        node = TweetObj
+
+    total_count = Int(description='Number of tweets across all pages, only counted when requested')
+
+    page = None
+
+    def resolve_total_count(self, info):
+        return self.page.count()
+
+
+def _to_tweet_connection(page: KeysetPage) -> TweetConnection:
+    connection = TweetConnection(
+        edges=[
+            TweetConnection.Edge(node=_to_tweet_obj(tweet), cursor=cursor)
+            for tweet, cursor in zip(page.tweets, page.get_cursors())
+        ],
+        page_info=relay.PageInfo(
+            start_cursor=page.start_cursor,
+            end_cursor=page.end_cursor,
+            has_previous_page=page.has_previous_page,
+            has_next_page=page.has_next_page
+        )
+    )
+    connection.page = page
+    return connection
+
+
+class SentimentBucketObj(ObjectType):
+    start = DateTime(description='Start of the hour, day or month')
+    count = Int()
+    percentage = Float(description='Average polarity of the tweets')
+    subjectivity = Float(description='Average subjectivity of the tweets')
+    tone = String()
+    positive = Int()
+    negative = Int()
+    neutral = Int()
 
 
 class SentimentQuery(ObjectType):
     todays_sentiment = Field(SentimentObj, description='Returns the overall sentiment of today\'s tweets')
     overall_sentiment = Field(SentimentObj, description='Returns the overall sentiment for all tweets')
+    sentiment_history = List(
+        SentimentBucketObj,
+        from_=DateTime(name='from', description='Defaults to 30 days before `to`'),
+        to=DateTime(description='Defaults to now'),
+        granularity=String(default_value=DAY, description='hour, day or month'),
+        description='Returns the sentiment of the tweets per hour, day or month')
 
     def resolve_todays_sentiment(self, info):
         s = SentimentWithHistory()
@@ -34,34 +108,80 @@ class SentimentQuery(ObjectType):
         s = OverallSentiment()
         return SentimentObj(tone=s.get_todays_tone_value(), percentage=s.polarity)
 
+    def resolve_sentiment_history(self, info, granularity, from_=None, to=None):
+        return [
+            SentimentBucketObj(
+                start=group['start'],
+                count=group['count'],
+                percentage=group['average_polarity'],
+                subjectivity=group['average_subjectivity'],
+                tone=group['tone'],
+                positive=group['positive'],
+                negative=group['negative'],
+                neutral=group['neutral'])
+            for group in get_sentiment_history(from_, to, granularity=granularity)
+        ]
+
+
+class RetryQueueObj(ObjectType):
+    retrying = Int(description='Tweets waiting for another delivery attempt')
+    due = Int(description='Tweets whose next delivery attempt is due')
+    dead = Int(description='Tweets that exhausted their delivery attempts')
+
+
+class DeliveryQuery(ObjectType):
+    retry_queue = Field(RetryQueueObj, description='Returns the depth of the delivery retry queue')
+
+    def resolve_retry_queue(self, info):
+        return RetryQueueObj(**Tweet.objects.get_retry_queue_stats())
+
 
 class TwitterQuery(ObjectType):
     tweet_by_id = Field(TweetObj, tweet_id=String(required=True))
-    search_tweets = List(TweetObj, search=String(required=True))
-    tweets = List(TweetObj, only_today=Boolean(default_value=True))
+    search_tweets = List(TweetObj, search=String(required=True),
+                         description='The best %s matches of the search' % MAX_PAGE_SIZE,
+                         deprecation_reason='Only returns one page, use searchTweetsConnection')
+    tweets = List(TweetObj, only_today=Boolean(default_value=True),
+                  description='The newest %s tweets' % MAX_PAGE_SIZE,
+                  deprecation_reason='Only returns one page, use tweetsConnection')
+    tweets_connection = relay.ConnectionField(
+        TweetConnection, only_today=Boolean(default_value=False),
+        description='Pages through the tweets, newest first')
+    search_tweets_connection = relay.ConnectionField(
+        TweetConnection, search=String(required=True),
+        description='Pages through the tweets matching the search, newest first')
     
     def resolve_hello(self, info, name):
         return 'Hello %s' % name
 
     def resolve_tweet_by_id(self, info, tweet_id):
-        tweet = Tweet.objects.get_by_tweet_id(int(tweet_id))
-        return TweetObj(**tweet.serialize()) if tweet is not None else TweetObj()
+        # aliased lookups of the same query are fetched with one $in query
+        return get_loaders(info).tweets.load(int(tweet_id)).then(
+            lambda tweet: _to_tweet_obj(tweet) if tweet is not None else TweetObj())
 
     def resolve_search_tweets(self, info, search):
-        tweets = Tweet.objects.search_tweet_content(search)
-        return [TweetObj(**tweet.serialize()) for tweet in tweets]
+        tweets = Tweet.objects.search_tweet_content(search).get_filtered_tweets(get_tweet_projection(info))
+        return [_to_tweet_obj(tweet) for tweet in tweets.limit(MAX_PAGE_SIZE)]
 
     def resolve_tweets(self, info, only_today):
         if only_today:
             tweets = Tweet.objects.get_tweets_from_today()
         else:
             tweets = Tweet.objects.all()
-        return [
-            TweetObj(**tweet.serialize()) for tweet in tweets
-        ]
+        tweets = tweets.order_by('-tweet_id').get_filtered_tweets(get_tweet_projection(info))
+        return [_to_tweet_obj(tweet) for tweet in tweets.limit(MAX_PAGE_SIZE)]
+
+    def resolve_tweets_connection(self, info, only_today, **kwargs):
+        tweets = Tweet.objects.get_tweets_from_today() if only_today else Tweet.objects.all()
+        tweets = tweets.get_filtered_tweets(get_tweet_projection(info, 'edges', 'node'))
+        return _to_tweet_connection(KeysetPage(tweets, **kwargs))
+
+    def resolve_search_tweets_connection(self, info, search, **kwargs):
+        tweets = Tweet.objects.search_text(search).get_filtered_tweets(get_tweet_projection(info, 'edges', 'node'))
+        return _to_tweet_connection(KeysetPage(tweets, **kwargs))
 
 
-class Query(TwitterQuery, SentimentQuery, ObjectType):
+class Query(TwitterQuery, SentimentQuery, DeliveryQuery, ObjectType):
     pass
 
 
@@ -0,0 +1,262 @@
+import os
+import threading
+from typing import List, Tuple
+
+import numpy as np
+
+
+SCORING_BATCH_SIZE = int(os.environ.get('SCORING_BATCH_SIZE', 2000))
+
+# never part of a tweet, keeps the texts of a batch apart once they are joined
+_SEPARATOR = '\ue000'
+
+_EXCLAMATION = '!'
+_IRONY = '(!)'
+
+
+class _Tokens(object):
+    """ _Tokens is a private class that holds the tokens of a batch flattened
+    into one array, `starts` is the index of the first token of every text """
+
+    def __init__(self, words: List[str], starts: np.ndarray, count: int):
+        self.words = words
+        self.starts = starts
+        self.count = count
+
+
+class _Features(object):
+    """ _Features is a private class with one row per distinct token of a batch """
+
+    def __init__(self, words: List[str], lexicon: 'CompiledLexicon'):
+        self.known = np.zeros(len(words), dtype=bool)
+        self.polarity = np.zeros(len(words))
+        self.subjectivity = np.zeros(len(words))
+        self.intensity = np.ones(len(words))
+        self.modifier = np.zeros(len(words), dtype=bool)
+        self.adverb = np.zeros(len(words), dtype=bool)
+        self.negation = np.zeros(len(words), dtype=bool)
+        self.long = np.zeros(len(words), dtype=bool)
+        self.unquoted_long = np.zeros(len(words), dtype=bool)
+        self.exclamation = np.zeros(len(words), dtype=bool)
+        self.irony = np.zeros(len(words), dtype=bool)
+        self.emoticon = np.zeros(len(words), dtype=bool)
+        self.emoticon_polarity = np.zeros(len(words))
+
+        for row, word in enumerate(words):
+            index = lexicon.index.get(word)
+            if index is not None:
+                self.known[row] = True
+                self.polarity[row] = lexicon.polarity[index]
+                self.subjectivity[row] = lexicon.subjectivity[index]
+                self.intensity[row] = lexicon.intensity[index]
+                self.modifier[row] = lexicon.modifier[index]
+            else:
+                self.negation[row] = word in lexicon.negations
+                self.long[row] = len(word) > 2
+                self.unquoted_long[row] = len(word.strip("'")) > 1
+                self.exclamation[row] = word == _EXCLAMATION
+                self.irony[row] = word == _IRONY
+                emoticon_polarity = lexicon.emoticons.get(word)
+                if emoticon_polarity is not None and not self.irony[row]:
+                    self.emoticon[row] = True
+                    self.emoticon_polarity[row] = emoticon_polarity
+
+            self.adverb[row] = lexicon.is_adverb(word)
+
+
+class CompiledLexicon(object):
+    """
+    The sentiment lexicon of TextBlob's pattern analyzer compiled into arrays.
+    `index` maps a lower case word to its row in `polarity`, `subjectivity`,
+    `intensity` and `modifier`, the averaged scores the analyzer uses for
+    words without a part of speech tag. """
+
+    def __init__(self, analyzer=None):
+        # textblob pulls in nltk, it is only imported once a text is scored
+        from textblob._text import EMOTICONS, PUNCTUATION
+        from textblob.en import sentiment as pattern_sentiment
+
+        analyzer = analyzer if analyzer is not None else pattern_sentiment
+        words = sorted(analyzer.keys())
+        scores = np.array([analyzer[word][None] for word in words], dtype=float).reshape(-1, 3)
+        self.index = {word: row for row, word in enumerate(words)}
+        self.polarity = scores[:, 0]
+        self.subjectivity = scores[:, 1]
+        self.intensity = scores[:, 2]
+        self.modifier = np.array([
+            any(modifier in analyzer[word] for modifier in analyzer.modifiers) for word in words
+        ], dtype=bool)
+
+        self.tokenizer = analyzer.tokenizer
+        self.negations = frozenset(analyzer.negations)
+        self.is_adverb = analyzer.modifier
+        self.emoticons = {}
+        for (_, polarity), emoticons in EMOTICONS.items():
+            for emoticon in emoticons:
+                emoticon = emoticon.lower()
+                if not emoticon.isalpha() and len(emoticon) <= 5 and emoticon not in PUNCTUATION:
+                    self.emoticons.setdefault(emoticon, polarity)
+
+
+_lexicon = None
+_lexicon_lock = threading.Lock()
+
+
+def get_lexicon() -> CompiledLexicon:
+    """ The lexicon is loaded and compiled the first time a batch is scored """
+    global _lexicon
+    with _lexicon_lock:
+        if _lexicon is None:
+            _lexicon = CompiledLexicon()
+
+        return _lexicon
+
+
+def _tokenize(texts: List[str], lexicon: CompiledLexicon) -> _Tokens:
+    """ Runs the tokenizer of the analyzer once over the whole batch """
+    joined = (' %s ' % _SEPARATOR).join(text.replace(_SEPARATOR, ' ') for text in texts)
+    words = ' '.join(lexicon.tokenizer(joined)).lower().split()
+
+    separators = [index for index, word in enumerate(words) if word == _SEPARATOR]
+    if len(separators) != len(texts) - 1:
+        # a separator got merged into a neighbouring token, tokenize one by one
+        words = []
+        starts = []
+        for text in texts:
+            starts.append(len(words))
+            words.extend(' '.join(lexicon.tokenizer(text)).lower().split())
+
+        return _Tokens(words, np.array(starts, dtype=np.int64), len(texts))
+
+    # drop the separators, the n-th separator sits n tokens after the end of its text
+    bounds = np.array(separators, dtype=np.int64) - np.arange(len(separators))
+    starts = np.concatenate(([0], bounds)).astype(np.int64)
+    return _Tokens([word for word in words if word != _SEPARATOR], starts, len(texts))
+
+
+def _last_before(mask: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """ Index of the last token before every token for which `mask` is set, or -1 """
+    last = np.maximum.accumulate(np.where(mask, positions, -1))
+    return np.concatenate(([-1], last[:-1]))
+
+
+def _mean_by_text(values: np.ndarray, texts: np.ndarray, count: int) -> np.ndarray:
+    totals = np.bincount(texts, weights=values, minlength=count)
+    sizes = np.bincount(texts, minlength=count)
+    return totals / np.maximum(sizes, 1)
+
+
+def _score_tokens(tokens: _Tokens, lexicon: CompiledLexicon) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Computes the assessments of `Sentiment.assessments` for every token at once.
+
+    A known word starts a new assessment unless the previous known word is a
+    modifier that is still in effect, in which case it is merged into the
+    last assessment. Negations, modifiers and exclamation marks are found
+    with running maxima over the token positions instead of a per word loop. """
+    if len(tokens.words) == 0:
+        return np.zeros(tokens.count), np.zeros(tokens.count)
+
+    vocabulary = {}
+    rows = np.array([vocabulary.setdefault(word, len(vocabulary)) for word in tokens.words], dtype=np.int64)
+    features = _Features(list(vocabulary), lexicon)
+
+    positions = np.arange(len(rows))
+    text = np.repeat(np.arange(tokens.count), np.diff(np.append(tokens.starts, len(rows))))
+    first = tokens.starts[text]
+
+    known = features.known[rows]
+    unknown = ~known
+    negation = features.negation[rows] & unknown
+    long = features.long[rows] & unknown
+
+    # the last known word of the same text before every token
+    previous = _last_before(known, positions)
+    previous = np.where(previous >= first, previous, -1)
+    has_previous = previous >= 0
+    previous_row = rows[np.maximum(previous, 0)]
+
+    # a modifier stays in effect across short unknown words, a negation after a
+    # modifier ending in -ly ("really not good") is attached to it without ending it
+    ly_modifier = features.adverb[previous_row]
+    cleared = np.where(
+        ly_modifier,
+        _last_before(long & ~negation, positions),
+        _last_before(long, positions))
+    modified = has_previous & features.modifier[previous_row] & (cleared < previous)
+    attached_negation = negation & modified & ly_modifier
+
+    # a negation stays in effect until the next known word or an unknown word
+    # longer than one letter, unless it was attached to a modifier
+    last_negation = _last_before(negation, positions)
+    negation_cleared = _last_before(unknown & ~negation & features.unquoted_long[rows], positions)
+    negated = known & (last_negation >= first) & (last_negation > previous) & \
+        (negation_cleared < last_negation) & ~attached_negation[np.maximum(last_negation, 0)]
+
+    irony = features.irony[rows] & unknown
+    emoticon = features.emoticon[rows] & unknown
+    merged = known & modified
+    created = (known & ~modified) | irony | emoticon
+
+    # every token points to the last assessment created up to it, -1 when there is none yet
+    assessment = np.cumsum(created) - 1
+    assessments = int(assessment[-1]) + 1 if len(assessment) else 0
+    first_assessment = np.concatenate(([0], np.cumsum(created)))[first]
+    in_text = assessment >= first_assessment
+
+    polarity = np.where(emoticon, features.emoticon_polarity[rows], features.polarity[rows])
+    subjectivity = np.where(irony | emoticon, 1.0, features.subjectivity[rows])
+    intensity = np.where(negated, 1.0 / features.intensity[rows], features.intensity[rows])
+    intensity = np.where(known, intensity, 1.0)
+
+    if assessments == 0:
+        return np.zeros(tokens.count), np.zeros(tokens.count)
+
+    # the scores of an assessment come from the last word merged into it,
+    # scaled by the intensity left by the word before it
+    touched = np.flatnonzero(created | merged)
+    touched_assessment = assessment[touched]
+    is_last = np.append(touched_assessment[1:] != touched_assessment[:-1], True)
+    last_touch = touched[is_last]
+    prior_touch = np.concatenate(([-1], touched[:-1]))[is_last]
+    was_merged = merged[last_touch]
+    scale = np.where(was_merged, intensity[np.maximum(prior_touch, 0)], 1.0)
+    assessment_polarity = np.clip(polarity[last_touch] * scale, -1.0, 1.0)
+    assessment_subjectivity = np.clip(subjectivity[last_touch] * scale, -1.0, 1.0)
+
+    # exclamation marks after the last merge boost the polarity by 25% each
+    exclamation = features.exclamation[rows] & unknown & in_text
+    boosted = exclamation & (positions > last_touch[np.maximum(assessment, 0)])
+    boosts = np.bincount(assessment[boosted], minlength=assessments)
+    assessment_polarity = np.clip(assessment_polarity * 1.25 ** boosts, -1.0, 1.0)
+
+    # "not good" is slightly bad, "not bad" is slightly good
+    reversed_assessment = np.zeros(assessments, dtype=bool)
+    reversed_assessment[assessment[(negated & (created | merged)) | (attached_negation & in_text)]] = True
+    assessment_polarity = np.where(reversed_assessment, assessment_polarity * -0.5, assessment_polarity)
+
+    assessment_text = text[last_touch]
+    return (
+        _mean_by_text(assessment_polarity, assessment_text, tokens.count),
+        _mean_by_text(assessment_subjectivity, assessment_text, tokens.count)
+    )
+
+
+def score_batch(texts: List[str], batch_size: int=SCORING_BATCH_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Scores the texts like `TextBlob(text).sentiment` with the pattern analyzer
+    and returns the polarities and subjectivities as two arrays in the order
+    of `texts`. The texts are tokenized and scored `batch_size` at a time. """
+    lexicon = get_lexicon()
+    polarities = []
+    subjectivities = []
+    for start in range(0, len(texts), batch_size):
+        batch = [text or '' for text in texts[start:start + batch_size]]
+        polarity, subjectivity = _score_tokens(_tokenize(batch, lexicon), lexicon)
+        polarities.append(polarity)
+        subjectivities.append(subjectivity)
+
+    if len(polarities) == 0:
+        return np.zeros(0), np.zeros(0)
+
+    return np.concatenate(polarities), np.concatenate(subjectivities)
@@ -1,12 +1,14 @@
-import ssl
+import datetime
 from enum import Enum
 from typing import List
-_create_unverified_https_context = ssl._create_unverified_context
 
-import textblob.download_corpora # lgtm [py/unused-import]
-from textblob import TextBlob
+from .models import Tweet, SentimentBucket, SentimentTotals, DAY
 
-from .models import Tweet
+# the window of the sentiment history when no start is given
+SENTIMENT_HISTORY_DAYS = 30
+
+# bump to have the backfill rescore every stored tweet
+SENTIMENT_SCORER_VERSION = 1
 
 
 class SentimentTone(Enum):
@@ -15,19 +17,85 @@ class SentimentTone(Enum):
     NEUTRAL = 'neutral'
 
 
-class Sentiment(TextBlob):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.polarity = self.sentiment.polarity
-        self.subjectivity = self.sentiment.subjectivity
+def get_tone_for_polarity(polarity: float) -> SentimentTone:
+    if polarity > 0:
+        return SentimentTone.POSITIVE
+    elif polarity == 0:
+        return SentimentTone.NEUTRAL
+    else:
+        return SentimentTone.NEGATIVE
+
+
+def score_batch(texts: List[str]):
+    """ Scores the texts with `app.scoring.score_batch`. NumPy and the TextBlob
+    lexicon are only loaded the first time something is scored. """
+    from .scoring import score_batch
+
+    return score_batch(texts)
+
+
+def has_stored_sentiment(tweet: Tweet) -> bool:
+    return getattr(tweet, 'sentiment_version', None) == SENTIMENT_SCORER_VERSION and \
+        getattr(tweet, 'polarity', None) is not None
+
+
+def apply_sentiment(tweet: Tweet) -> Tweet:
+    """ Scores the content of the tweet and stores the result on the tweet """
+    sentiment = Sentiment(tweet.content)
+    tweet.polarity = sentiment.polarity
+    tweet.subjectivity = sentiment.subjectivity
+    tweet.tone = sentiment.get_tone_value()
+    tweet.sentiment_version = SENTIMENT_SCORER_VERSION
+    return tweet
+
+
+def apply_sentiment_batch(tweets: List[Tweet]) -> List[Tweet]:
+    """ Same as `apply_sentiment` for many tweets, scored together with `score_batch` """
+    polarities, subjectivities = score_batch([tweet.content for tweet in tweets])
+    for tweet, polarity, subjectivity in zip(tweets, polarities.tolist(), subjectivities.tolist()):
+        tweet.polarity = polarity
+        tweet.subjectivity = subjectivity
+        tweet.tone = get_tone_for_polarity(polarity).value
+        tweet.sentiment_version = SENTIMENT_SCORER_VERSION
+
+    return tweets
+
+
+def get_polarity(tweet: Tweet) -> float:
+    """ Returns the stored polarity of the tweet, scoring it only when it was
+    not scored by the current scorer """
+    if has_stored_sentiment(tweet):
+        return tweet.polarity
+
+    return Sentiment(tweet.content).polarity
+
+
+def get_sentiment_history(start: datetime.datetime=None, end: datetime.datetime=None,
+                          granularity: str=DAY) -> List[dict]:
+    """ Returns the sentiment of the tweets per `granularity` between `start` and `end`,
+    see `TweetQuerySet.get_sentiment_history`. Every group also gets its overall tone. """
+    end = end or datetime.datetime.utcnow()
+    start = start or end - datetime.timedelta(days=SENTIMENT_HISTORY_DAYS)
+    history = Tweet.objects.get_sentiment_history(start, end, granularity=granularity)
+    for group in history:
+        group['tone'] = get_tone_for_polarity(group['average_polarity']).value
+
+    return history
+
+
+class Sentiment(object):
+    """ The polarity and subjectivity of a text as scored by TextBlob's pattern analyzer """
+
+    def __init__(self, text: str=''):
+        self.polarity = 0.0
+        self.subjectivity = 0.0
+        if text:
+            polarities, subjectivities = score_batch([text])
+            self.polarity = polarities.tolist()[0]
+            self.subjectivity = subjectivities.tolist()[0]
 
     def get_tone(self) -> SentimentTone:
-        if self.polarity > 0: 
-            return SentimentTone.POSITIVE
-        elif self.polarity == 0: 
-            return SentimentTone.NEUTRAL
-        else: 
-            return SentimentTone.NEGATIVE
+        return get_tone_for_polarity(self.polarity)
 
     def get_tone_value(self) -> str:
         return self.get_tone().value
@@ -35,14 +103,15 @@ class Sentiment(TextBlob):
 
 class SentimentWithHistory(Sentiment):
     def __init__(self, *args, **kwargs):
-        super().__init__('', *args, **kwargs)
+        super().__init__('')
 
-    def __get_tweets__(self) -> List[Tweet]:
-        return Tweet.objects.get_tweets_from_today()    
+    def __get_totals__(self) -> SentimentTotals:
+        """ Sentiment sums of the tweets of the last 24 hours, read from the
+        hourly buckets instead of rescoring the tweets """
+        return SentimentBucket.objects.get_recent_totals(hours=24)
 
     def _get_average_polarity(self) -> float:
-        polarities = [Sentiment(tweet.content).polarity for tweet in self.__get_tweets__()]
-        return sum(polarities) / len(polarities)
+        return self.__get_totals__().average_polarity
 
     def get_todays_tone(self) -> SentimentTone:
         self.polarity = self._get_average_polarity()
@@ -56,5 +125,5 @@ class OverallSentiment(SentimentWithHistory):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
     
-    def __get_tweets__(self):
-        return Tweet.objects.all()
\ No newline at end of file
+    def __get_totals__(self) -> SentimentTotals:
+        return SentimentBucket.objects.get_overall_totals()
@@ -1,6 +1,3 @@
-import json
-import requests
-
 from .sentiment import SentimentWithHistory
 from .bot import TrumpBotWithAuth
 
@@ -9,15 +6,11 @@ class SentimentBot(TrumpBotWithAuth, SentimentWithHistory):
     def __init__(self, auth_file_path='auth.json', *args, **kwargs):
         super().__init__(auth_file_path=auth_file_path, *args, **kwargs)
 
-    def __send_tweet_msg__(self, content, headers=None) -> int:
-        msg = self._request_body.replace('{{ content }}', self.__clean_content__(content))
-        msg_body = json.loads(msg)
-        request_url = msg_body['url']
+    def __send_tweet_msg__(self, content, headers=None, **values) -> int:
+        msg_body = self._request_template.render(content=content, **values)
         msg_body['displayname'] = 'Donald J. Trump (Sentiment Bot)'
-        if request_url is None:
-            raise Exception("Request URL cannot be none type")
 
-        req = requests.post(request_url, json=msg_body, headers=headers)
+        req = self.http.post(self._request_template.url, json=msg_body, headers=headers)
         return req.status_code
 
     def send_todays_tone(self):
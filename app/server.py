@@ -0,0 +1,141 @@
+import datetime
+from functools import partial
+
+from aniso8601 import parse_date, parse_datetime
+from flask import Flask, Response, current_app, jsonify, request, stream_with_context
+from flask_graphql import GraphQLView
+
+from .models import Tweet, DAY, HISTORY_GRANULARITIES
+from .assets import get_asset_index, send_path
+from .config import configure_app
+from .export import EXPORT_MIMETYPES, NDJSON, get_export_fields, stream_export
+from .http_cache import cached_by_data_version, get_current_etag
+from .loaders import GraphQLContext
+from .query_cost import QueryCostBackend
+from .result_cache import ResultCache, CachingBackend
+from .schema import schema
+from .sentiment import get_sentiment_history
+
+# the files of WEB_DIR, static/ included, are served from the asset index
+app = Flask(__name__, static_folder=None)
+
+# today's tweets and sentiment also move with the clock, the sentiment
+# buckets behind them are hourly
+GRAPHQL_CACHE_WINDOW = 3600
+
+graphql_results = ResultCache()
+graphql_backend = QueryCostBackend(
+    CachingBackend(graphql_results, partial(get_current_etag, window=GRAPHQL_CACHE_WINDOW)))
+
+
+class BatchingGraphQLView(GraphQLView):
+    """ Gives every request its own DataLoaders so lookups are batched and cached per request """
+
+    def get_context(self):
+        return GraphQLContext(request)
+
+    def should_display_graphiql(self):
+        """ GraphiQL is only served when the GRAPHIQL setting turns it on """
+        return current_app.config.get('GRAPHIQL', False) and super().should_display_graphiql()
+
+
+app.add_url_rule('/graphql', view_func=cached_by_data_version(BatchingGraphQLView.as_view(
+            'graphql',
+            schema=schema,
+            backend=graphql_backend,
+            pretty=True,
+            graphiql=True  # for having the GraphiQL interface, see the GRAPHIQL setting
+        ), window=GRAPHQL_CACHE_WINDOW))
+
+
+@app.after_request
+def after_request(response):
+    header = response.headers
+    header['Access-Control-Allow-Origin'] = '*'
+    return response
+
+
+@app.route('/json')
+@cached_by_data_version
+def json():
+    return jsonify([tweet.serialize() for tweet in Tweet.objects.all()])
+
+
+def _parse_int_arg(name: str):
+    value = request.args.get(name)
+    if not value:
+        return None
+
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError('%s must be an integer' % name)
+
+
+@app.route('/json/export')
+def export():
+    """ Streams the tweets in `tweet_id` order. Accepts `since_id`, `limit`,
+    `fields` and `format` (ndjson or json), the response is gzipped when the
+    client accepts it """
+    export_format = request.args.get('format', NDJSON)
+    gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+    try:
+        chunks = stream_export(
+            export_format, gzip=gzip, since_id=_parse_int_arg('since_id'), limit=_parse_int_arg('limit'),
+            fields=get_export_fields(request.args.get('fields')))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+    response = Response(stream_with_context(chunks), mimetype=EXPORT_MIMETYPES[export_format])
+    response.headers['Vary'] = 'Accept-Encoding'
+    if gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+
+    return response
+
+
+@app.route('/json/graphql-cache')
+def graphql_cache():
+    return jsonify(graphql_results.get_stats())
+
+
+@app.route('/json/retry-queue')
+def retry_queue():
+    return jsonify(Tweet.objects.get_retry_queue_stats())
+
+
+def _parse_datetime_arg(name: str):
+    """ Reads an ISO 8601 date or date time from the query string """
+    value = request.args.get(name)
+    if not value:
+        return None
+
+    try:
+        return parse_datetime(value)
+    except ValueError:
+        return datetime.datetime.combine(parse_date(value), datetime.time())
+
+
+@app.route('/json/sentiment-history')
+def sentiment_history():
+    granularity = request.args.get('granularity', DAY)
+    if granularity not in HISTORY_GRANULARITIES:
+        return jsonify({'error': 'granularity must be one of %s' % ', '.join(HISTORY_GRANULARITIES)}), 400
+
+    try:
+        start = _parse_datetime_arg('from')
+        end = _parse_datetime_arg('to')
+    except ValueError as e:
+        return jsonify({'error': 'Invalid date: %s' % e}), 400
+
+    return jsonify(get_sentiment_history(start, end, granularity=granularity))
+
+
+@app.route('/', defaults={'path': ''})
+@app.route('/<path:path>')
+def serve(path):
+    response = send_path(get_asset_index(app.config.get('WEB_DIR')), path)
+    if response is None:
+        return jsonify({'error': 'Not found'}), 404
+
+    return response
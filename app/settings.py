@@ -11,6 +11,7 @@ class BaseConfig(object):
 
     WEB_DIR = ROOT_DIR + os.environ.get('WEB_DIR', '/public')
     PORT = os.environ.get('SERVER_PORT', 5000)
+    GRAPHIQL = os.environ.get('GRAPHIQL', 'false').lower() == 'true'
 
 
 class DevelopmentConfig(BaseConfig):
@@ -18,6 +19,7 @@ class DevelopmentConfig(BaseConfig):
     TESTING = True
     ENV = "development"
     LOG_LEVEL = logging.DEBUG
+    GRAPHIQL = True
 
 
 class TestingConfig(BaseConfig):
@@ -0,0 +1,146 @@
+import os
+import time
+import zlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from .models import Tweet, Account
+from .bot import TrumpBot, TweetExtractor
+from .polling import AdaptivePollInterval
+
+
+TIMELINE_WORKERS = int(os.environ.get('TIMELINE_WORKERS', 8))
+TIMELINE_TICK_SECONDS = float(os.environ.get('TIMELINE_TICK_SECONDS', 5))
+TIMELINE_POLL_INTERVAL = float(os.environ.get('TIMELINE_POLL_INTERVAL', 60))
+
+
+class _Timeline(object):
+    """ _Timeline is a private class that holds the polling state of one account """
+
+    def __init__(self, extractor: TweetExtractor, poll_interval: AdaptivePollInterval,
+                 next_poll_at: float):
+        self.extractor = extractor
+        self.poll_interval = poll_interval
+        self.next_poll_at = next_poll_at
+        self.cursor = extractor.min_position
+        self.polling = False
+
+
+class MultiTimelinePoller(TrumpBot):
+    """
+    Polls the timelines of every enabled `Account` from a pool of `workers`
+    threads. Each account keeps its own cursor, persisted on the account,
+    and its own adaptive poll interval. The first polls are spread over one
+    interval so the accounts are not all polled at the same time.
+
+    Fetched tweets are delivered and stored like the tweets of `TrumpBot`
+    with their `source_account` set. """
+
+    def __init__(self, workers: int=TIMELINE_WORKERS, poll_interval: float=TIMELINE_POLL_INTERVAL,
+                 *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.timelines = {}
+        self._timelines_lock = threading.Lock()
+        self._workers = ThreadPoolExecutor(max_workers=workers)
+        self._poll_interval = poll_interval
+
+    def _get_initial_delay(self, screen_name: str) -> float:
+        """ A delay within one poll interval that stays the same across restarts """
+        return zlib.crc32(screen_name.encode('utf8')) % int(self._poll_interval * 1000) / 1000
+
+    def _create_timeline(self, account: Account, now: float) -> _Timeline:
+        cursor = account.cursor or str(Tweet.objects.get_last_tweet_id(source_account=account.screen_name))
+        extractor = TweetExtractor(
+            url=self.url,
+            screen_name=account.screen_name,
+            min_position=cursor,
+            parser=self.parser,
+            http_client=self.http
+        )
+        return _Timeline(extractor, AdaptivePollInterval(interval=self._poll_interval),
+                         now + self._get_initial_delay(account.screen_name))
+
+    def load_accounts(self) -> List[str]:
+        """ Synchronizes the polled timelines with the enabled accounts """
+        now = time.monotonic()
+        accounts = {account.screen_name: account for account in Account.objects.get_enabled()}
+        with self._timelines_lock:
+            for screen_name in list(self.timelines.keys()):
+                if screen_name not in accounts:
+                    logging.info('Stopped polling %s' % screen_name)
+                    del self.timelines[screen_name]
+
+            for screen_name, account in accounts.items():
+                if screen_name not in self.timelines:
+                    logging.info('Started polling %s' % screen_name)
+                    self.timelines[screen_name] = self._create_timeline(account, now)
+
+            return list(self.timelines.keys())
+
+    def poll_due_timelines(self) -> int:
+        """ Hands every timeline whose next poll is due to the worker pool.
+        Returns the number of timelines that were submitted. """
+        now = time.monotonic()
+        with self._timelines_lock:
+            due = [
+                timeline for timeline in self.timelines.values()
+                if not timeline.polling and timeline.next_poll_at <= now
+            ]
+            for timeline in due:
+                timeline.polling = True
+
+        for timeline in due:
+            self._workers.submit(self._poll_timeline, timeline)
+
+        return len(due)
+
+    def _poll_timeline(self, timeline: _Timeline):
+        extractor = timeline.extractor
+        tweets = []
+        try:
+            tweets = self._store_tweets(self._deliver_tweets(extractor.get_tweets()))
+            if extractor.min_position != timeline.cursor:
+                Account.objects.set_cursor(extractor.screen_name, extractor.min_position)
+                timeline.cursor = extractor.min_position
+
+        except Exception as e:
+            logging.exception('Unable to poll %s: %s' % (extractor.screen_name, e))
+            extractor.last_status_code = None
+            # get_tweets moved the cursor past tweets that were not stored, fetch them again
+            extractor.min_position = timeline.cursor
+            extractor.forget_validators()
+
+        finally:
+            seconds = timeline.poll_interval.on_poll(
+                extractor.last_status_code, len(tweets), retry_after=extractor.retry_after)
+            timeline.next_poll_at = time.monotonic() + seconds
+            timeline.polling = False
+
+
+class MultiTimelineScheduler(MultiTimelinePoller, BackgroundScheduler):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    def __add_timeline_jobs__(self, seconds, **kwargs):
+        """
+        Adds the jobs for the timeline poller. Due timelines are looked up
+        every `seconds`, the accounts are reloaded every 5 minutes.
+
+        Can be overwriten to include other jobs. """
+        self.add_job(self.poll_due_timelines, 'interval', seconds=seconds, max_instances=1, **kwargs)
+        self.add_job(self.load_accounts, 'interval', minutes=5, max_instances=1, **kwargs)
+        self.add_job(self.resend_bad_tweets, 'interval', seconds=60, max_instances=1, **kwargs)
+        self.add_job(self.http.log_stats, 'interval', minutes=30, max_instances=1, **kwargs)
+        logging.info('Added poll_due_timelines, load_accounts, resend_bad_tweets and log_stats jobs')
+
+    def start(self, paused=False, seconds=TIMELINE_TICK_SECONDS, **kwargs):
+        """ Loads the accounts, adds the jobs for the poller and starts APScheduler """
+        logging.info('Starting timeline scheduler')
+        self.load_accounts()
+        self.__add_timeline_jobs__(seconds, **kwargs)
+        return super().start(paused=paused)
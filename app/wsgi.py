@@ -0,0 +1,12 @@
+""" Entry point of the WSGI servers, e.g. `gunicorn app.wsgi:app`.
+Configures the Flask app for CONFIG_LEVEL like the `flask` action does
+and indexes the static assets before the first request. """
+import os
+
+from .assets import get_asset_index
+from .config import configure_app
+from .server import app
+
+
+configure_app(app, status=os.environ.get('CONFIG_LEVEL') or 'production')
+get_asset_index(app.config.get('WEB_DIR'))
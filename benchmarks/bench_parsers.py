@@ -0,0 +1,44 @@
+""" Compares the tweet parser backends.
+
+    python -m benchmarks.bench_parsers
+    python -m benchmarks.bench_parsers --recorded 'recordings/*.json'
+"""
+import argparse
+import timeit
+
+from app.parsers import PARSERS
+
+from .payloads import generate_payload, load_payloads
+
+
+def bench(payloads, number):
+    for name, parser_class in sorted(PARSERS.items()):
+        if name == 'default':
+            continue
+
+        parser = parser_class()
+        seconds = timeit.timeit(
+            lambda: [parser.parse(payload['body']) for payload in payloads],
+            number=number)
+        per_payload = seconds / (number * len(payloads))
+        print('%-10s %10.3f ms/payload %10.1f payloads/s' % (name, per_payload * 1000, 1 / per_payload))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the tweet parser backends')
+    parser.add_argument('--recorded', help='glob of recorded syndication responses')
+    parser.add_argument('--tweets', type=int, default=20, help='tweets per generated payload')
+    parser.add_argument('--payloads', type=int, default=10, help='number of generated payloads')
+    parser.add_argument('--number', type=int, default=20, help='timeit repetitions')
+    options = parser.parse_args()
+
+    if options.recorded:
+        payloads = load_payloads(options.recorded)
+    else:
+        payloads = [generate_payload(options.tweets, seed=i) for i in range(options.payloads)]
+
+    bench(payloads, options.number)
+
+
+if __name__ == '__main__':
+    main()
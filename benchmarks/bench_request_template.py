@@ -0,0 +1,44 @@
+""" Compares rendering a compiled request template with the previous
+str.replace + json.loads path.
+
+    python -m benchmarks.bench_request_template
+"""
+import argparse
+import json
+import timeit
+
+from app.request_template import RequestTemplate
+
+REQUEST_FILE = """{
+    "user_id": 1234,
+    "displayname": "Donald J. Trump (Twitter Bot)",
+    "content": "{{ content }}",
+    "url": "https://my.cool.website"
+}"""
+
+CONTENT = ('The Fake News Media is working overtime to make sure that "the economy" '
+           'looks bad.\nIt is the best it has ever been! https://t.co/abcdef ') * 2
+
+
+def replace_and_parse(raw: str, content: str) -> dict:
+    cleaned = content.replace('\n', ' ').replace('"', '`')
+    return json.loads(raw.replace('{{ content }}', cleaned))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks rendering of the request file')
+    parser.add_argument('--number', type=int, default=100000, help='timeit repetitions')
+    options = parser.parse_args()
+
+    template = RequestTemplate.compile(REQUEST_FILE)
+    runs = {
+        'replace + json.loads': lambda: replace_and_parse(REQUEST_FILE, CONTENT),
+        'compiled template': lambda: template.render(content=CONTENT),
+    }
+    for name, fn in runs.items():
+        seconds = timeit.timeit(fn, number=options.number)
+        print('%-22s %8.3f us/render' % (name, seconds / options.number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+""" Compares scoring tweets one by one with TextBlob to `score_batch`.
+
+    python -m benchmarks.bench_sentiment
+    python -m benchmarks.bench_sentiment --texts 50000 --batch-size 5000
+"""
+import argparse
+import random
+import time
+
+from textblob import TextBlob
+
+from app.scoring import score_batch, get_lexicon
+
+FILLER = ('the', 'a', 'is', 'of', 'not', 'never', "don't", 'very', 'really', '!', '.', ',',
+          ':)', ':(', 'jobs', 'country', 'news', '#MAGA', 'https://t.co/abc')
+
+
+def generate_texts(count: int, seed: int=0) -> list:
+    rng = random.Random(seed)
+    words = rng.sample(sorted(get_lexicon().index), 500) + list(FILLER) * 20
+    return [' '.join(rng.choice(words) for _ in range(rng.randint(5, 40))) for _ in range(count)]
+
+
+def bench(texts, batch_size):
+    start = time.perf_counter()
+    for text in texts:
+        TextBlob(text).sentiment
+    textblob = time.perf_counter() - start
+
+    start = time.perf_counter()
+    score_batch(texts, batch_size=batch_size)
+    batch = time.perf_counter() - start
+
+    print('%-10s %10.2f s %10.0f texts/s' % ('textblob', textblob, len(texts) / textblob))
+    print('%-10s %10.2f s %10.0f texts/s' % ('batch', batch, len(texts) / batch))
+    print('speedup    %10.1fx' % (textblob / batch))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the batch sentiment scorer')
+    parser.add_argument('--texts', type=int, default=10000)
+    parser.add_argument('--batch-size', type=int, default=2000)
+    options = parser.parse_args()
+
+    texts = generate_texts(options.texts)
+    # compile the lexicon outside of the timed run
+    score_batch(texts[:1])
+    bench(texts, options.batch_size)
+
+
+if __name__ == '__main__':
+    main()
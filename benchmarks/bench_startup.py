@@ -0,0 +1,115 @@
+""" Measures the import time of every `main.py` action.
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --action trumpbot --top 10
+    python -m benchmarks.bench_startup --budget-ms 600
+
+Every import runs in a fresh interpreter. The time of an action is the
+wall clock time of that interpreter minus the time of one that imports
+nothing. With `--budget-ms` the exit status is 1 when an action imports
+for longer than the budget. The slowest modules are listed from
+`python -X importtime`, which only exists from Python 3.7.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the modules every action imports when it runs, next to `main` itself
+ACTION_MODULES = {
+    'main': [],
+    'initialize': ['app.bot'],
+    'trumpbot': ['app.bot', 'app.sentimentbot'],
+    'flask': ['app.config', 'app.server'],
+    'prod': ['app.bot', 'app.sentimentbot'],
+    'serve': ['app.wsgi'],
+    'timelines': ['app.models', 'app.timelines'],
+    'backfill-sentiment': ['app.backfill'],
+    'rescore-sentiment': ['app.backfill'],
+    'rebuild-sentiment-buckets': ['app.backfill'],
+}
+
+
+HAS_IMPORTTIME = sys.version_info >= (3, 7)
+
+
+def _run(statement: str, *options) -> subprocess.CompletedProcess:
+    process = subprocess.run(
+        [sys.executable] + list(options) + ['-c', statement],
+        cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if process.returncode != 0:
+        raise Exception(process.stderr)
+
+    return process
+
+
+def time_statement(statement: str, repeat: int=3) -> float:
+    """ The fastest of `repeat` wall clock times in ms of a fresh interpreter running `statement` """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _run(statement)
+        times.append((time.perf_counter() - start) * 1000)
+
+    return min(times)
+
+
+def get_import_statement(modules: list) -> str:
+    return '; '.join('import %s' % module for module in ['main'] + modules)
+
+
+def measure(modules: list) -> list:
+    """ Returns `(name, self_us, cumulative_us, depth)` for every imported module,
+    nothing before Python 3.7 """
+    if not HAS_IMPORTTIME:
+        return []
+
+    process = _run(get_import_statement(modules), '-X', 'importtime')
+    imports = []
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(self_us), int(cumulative_us), depth))
+
+    return imports
+
+
+def report(action: str, total_ms: float, imports: list, top: int):
+    print('%-28s %8.1f ms' % (action, total_ms))
+    for name, self_us, cumulative_us, depth in sorted(imports, key=lambda i: -i[2])[:top]:
+        if depth <= 1:
+            print('    %-40s %8.1f ms' % (name, cumulative_us / 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the import time of the main.py actions')
+    parser.add_argument('--action', choices=sorted(ACTION_MODULES), action='append')
+    parser.add_argument('--top', type=int, default=5, help='slowest imports listed per action')
+    parser.add_argument('--budget-ms', type=float, help='fail when an action imports for longer')
+    options = parser.parse_args()
+
+    if not HAS_IMPORTTIME:
+        print('python -X importtime needs Python 3.7, only the total times are measured')
+
+    baseline_ms = time_statement('pass')
+    over_budget = []
+    for action in options.action or ACTION_MODULES:
+        modules = ACTION_MODULES[action]
+        total_ms = max(time_statement(get_import_statement(modules)) - baseline_ms, 0)
+        report(action, total_ms, measure(modules), options.top)
+        if options.budget_ms is not None and total_ms > options.budget_ms:
+            over_budget.append(action)
+
+    if over_budget:
+        print('over the %s ms budget: %s' % (options.budget_ms, ', '.join(over_budget)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
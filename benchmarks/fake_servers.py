@@ -0,0 +1,177 @@
+""" Local stand-ins for the syndication timeline, the auth server and the
+webhook target. Every server runs on its own thread on 127.0.0.1. """
+import base64
+import json
+import random
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from .payloads import generate_payload
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def _make_token(ttl: float) -> str:
+    def encode(data: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode('utf8')).decode('ascii').rstrip('=')
+
+    return '%s.%s.fake' % (encode({'alg': 'none'}), encode({'exp': time.time() + ttl}))
+
+
+class FakeServer(object):
+    """ Base class of the fake servers. `latency` is the number of seconds
+    every response is delayed, `error_rate` the share of responses that
+    fail with `error_status`. """
+
+    def __init__(self, latency: float=0, error_rate: float=0, error_status: int=503, seed: int=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return 'http://127.0.0.1:%s' % self._server.server_port
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            return self._rng.random() < self.error_rate
+
+    def handle(self, method: str, path: str, headers: dict, body: bytes):
+        """ Returns `(status, headers, body)` """
+        raise NotImplementedError
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _respond(self, method):
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length) if length else b''
+                if server.latency:
+                    time.sleep(server.latency)
+
+                if server._should_fail():
+                    status, headers, payload = server.error_status, {}, b'{}'
+                else:
+                    status, headers, payload = server.handle(method, self.path, self.headers, body)
+
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._respond('GET')
+
+            def do_POST(self):
+                self._respond('POST')
+
+            def log_message(self, *args, **kwargs):
+                pass
+
+        return Handler
+
+    def start(self) -> 'FakeServer':
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class FakeSyndicationServer(FakeServer):
+    """ Serves timelines shaped like the syndication JSONP response. Every
+    request returns `tweets_per_poll` tweets newer than `min_position`. """
+
+    def __init__(self, tweets_per_poll: int=20, **kwargs):
+        super().__init__(**kwargs)
+        self.tweets_per_poll = tweets_per_poll
+        self.url_template = None
+
+    def start(self) -> 'FakeServer':
+        super().start()
+        self.url_template = '%s/timeline/profile?min_position={min_position}&screen_name={screen_name}' % self.url
+        return self
+
+    def handle(self, method, path, headers, body):
+        query = parse_qs(urlsplit(path).query)
+        try:
+            min_position = int(query.get('min_position', ['0'])[0])
+        except ValueError:
+            min_position = 0
+
+        with self._lock:
+            seed = self.requests
+
+        payload = generate_payload(self.tweets_per_poll, first_tweet_id=min_position + self.tweets_per_poll, seed=seed)
+        text = '__twttr.callbacks.tl_i0_profile_new(%s);' % json.dumps(payload)
+        return 200, {'Content-Type': 'application/javascript'}, text.encode('utf8')
+
+
+class FakeAuthServer(FakeServer):
+    """ Hands out JWT shaped tokens that expire after `token_ttl` seconds """
+
+    def __init__(self, token_ttl: float=3600, error_status: int=401, **kwargs):
+        super().__init__(error_status=error_status, **kwargs)
+        self.token_ttl = token_ttl
+        self.tokens = set()
+
+    def handle(self, method, path, headers, body):
+        token = _make_token(self.token_ttl)
+        with self._lock:
+            self.tokens.add(token)
+
+        return 200, {'Content-Type': 'application/json'}, json.dumps({'token': token}).encode('utf8')
+
+    def is_valid(self, token: str) -> bool:
+        with self._lock:
+            return token in self.tokens
+
+    def revoke(self, token: str):
+        with self._lock:
+            self.tokens.discard(token)
+
+
+class FakeWebhookServer(FakeServer):
+    """ Accepts the tweet posts. Requests without a token from `auth_server`
+    get a 401, `unauthorized_rate` of the others also get a 401 as if the
+    token had been revoked. """
+
+    def __init__(self, auth_server: FakeAuthServer=None, unauthorized_rate: float=0, **kwargs):
+        super().__init__(**kwargs)
+        self.auth_server = auth_server
+        self.unauthorized_rate = unauthorized_rate
+        self.received = 0
+
+    def handle(self, method, path, headers, body):
+        token = (headers.get('Authorization') or '').replace('Bearer ', '')
+        with self._lock:
+            revoked = self._rng.random() < self.unauthorized_rate
+
+        if self.auth_server is not None:
+            if revoked:
+                self.auth_server.revoke(token)
+
+            if not self.auth_server.is_valid(token):
+                return 401, {}, b'{}'
+
+        with self._lock:
+            self.received += 1
+
+        return 200, {'Content-Type': 'application/json'}, b'{}'
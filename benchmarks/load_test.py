@@ -0,0 +1,156 @@
+""" Drives the bot through poll -> parse -> post -> persist against local
+fake servers and reports the throughput and the latency of every stage.
+
+    MONGO_DB_URL=mongodb://localhost:27018 MONGO_DB_NAME=loadtest python -m benchmarks.load_test
+    python -m benchmarks.load_test --no-persist --webhook-latency 0.05 --webhook-error-rate 0.1
+
+Persisting needs a running MongoDB, the tweets are written to the database
+given by MONGO_DB_NAME so do not point it at production data.
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from app.bot import TrumpBotScheduler, TrumpBotMessenger
+from app.delivery import DeliveryEngine
+
+from .fake_servers import FakeSyndicationServer, FakeAuthServer, FakeWebhookServer
+
+
+def percentile(values: list, percent: float) -> float:
+    if len(values) == 0:
+        return 0.0
+
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class StageTimer(object):
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def time(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.samples[stage].append(elapsed)
+
+    def report(self):
+        print('%-10s %8s %10s %10s %10s' % ('stage', 'count', 'p50 ms', 'p99 ms', 'total s'))
+        for stage in ('poll', 'parse', 'post', 'persist', 'cycle'):
+            samples = self.samples.get(stage, [])
+            print('%-10s %8s %10.2f %10.2f %10.2f' % (
+                stage, len(samples), percentile(samples, 50) * 1000,
+                percentile(samples, 99) * 1000, sum(samples)))
+
+
+def make_instrumented_bot(timer: StageTimer, persist: bool):
+    class InstrumentedBot(TrumpBotScheduler):
+        def _retrieve_latest_tweets_resp(self, min_position):
+            with timer.time('poll'):
+                return super()._retrieve_latest_tweets_resp(min_position)
+
+        def _parse_tweets(self, body, stop_at_id=None):
+            with timer.time('parse'):
+                return super()._parse_tweets(body, stop_at_id=stop_at_id)
+
+        def _send_tweet(self, tweet):
+            with timer.time('post'):
+                return super()._send_tweet(tweet)
+
+        def _store_tweets(self, tweets):
+            with timer.time('persist'):
+                return super()._store_tweets(tweets)
+
+        def send_latest_tweets(self):
+            if persist:
+                return super().send_latest_tweets()
+
+            # without MongoDB the cursor comes from the previous response
+            return TrumpBotMessenger.send_latest_tweets(self)
+
+    return InstrumentedBot
+
+
+def _write_json(directory: str, name: str, data: dict) -> str:
+    file_path = os.path.join(directory, name)
+    with open(file_path, 'w') as file:
+        json.dump(data, file)
+
+    return file_path
+
+
+def run(options):
+    syndication = FakeSyndicationServer(
+        tweets_per_poll=options.tweets_per_poll, latency=options.syndication_latency,
+        error_rate=options.syndication_error_rate).start()
+    auth = FakeAuthServer(
+        token_ttl=options.token_ttl, latency=options.auth_latency,
+        error_rate=options.auth_error_rate).start()
+    webhook = FakeWebhookServer(
+        auth_server=auth, latency=options.webhook_latency, error_rate=options.webhook_error_rate,
+        unauthorized_rate=options.webhook_unauthorized_rate).start()
+
+    directory = tempfile.mkdtemp()
+    request_path = _write_json(directory, 'request.json', {'content': '{{ content }}', 'url': webhook.url})
+    auth_path = _write_json(directory, 'auth.json', {
+        'url': auth.url, 'username': 'bot', 'password': 'bot', 'token_name': 'token'})
+
+    timer = StageTimer()
+    bot = make_instrumented_bot(timer, persist=not options.no_persist)(
+        file_path=request_path, auth_file_path=auth_path,
+        delivery_engine=DeliveryEngine(max_in_flight=options.max_in_flight))
+    bot.url = syndication.url_template
+    bot.min_position = '1000000'
+
+    tweets = 0
+    start = time.perf_counter()
+    for _ in range(options.polls):
+        with timer.time('cycle'):
+            try:
+                tweets += len(bot.send_latest_tweets())
+            except Exception as e:
+                print('poll failed: %s' % e)
+
+    elapsed = time.perf_counter() - start
+    bot.delivery.shutdown()
+    for server in (syndication, auth, webhook):
+        server.stop()
+
+    print('polls: %s  tweets: %s  elapsed: %.2f s  throughput: %.1f tweets/s' % (
+        options.polls, tweets, elapsed, tweets / elapsed if elapsed else 0))
+    print('webhook accepted: %s  webhook requests: %s  auth requests: %s' % (
+        webhook.received, webhook.requests, auth.requests))
+    timer.report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End to end load test of the bot against local fake servers')
+    parser.add_argument('--polls', type=int, default=20)
+    parser.add_argument('--tweets-per-poll', type=int, default=20)
+    parser.add_argument('--max-in-flight', type=int, default=8)
+    parser.add_argument('--no-persist', action='store_true', help='do not write the tweets to MongoDB')
+    parser.add_argument('--syndication-latency', type=float, default=0.02)
+    parser.add_argument('--syndication-error-rate', type=float, default=0)
+    parser.add_argument('--auth-latency', type=float, default=0.02)
+    parser.add_argument('--auth-error-rate', type=float, default=0)
+    parser.add_argument('--token-ttl', type=float, default=3600)
+    parser.add_argument('--webhook-latency', type=float, default=0.02)
+    parser.add_argument('--webhook-error-rate', type=float, default=0)
+    parser.add_argument('--webhook-unauthorized-rate', type=float, default=0)
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+import glob
+import json
+import random
+from typing import List
+
+TWEET_TEMPLATE = """
+<li class="timeline-TweetList-tweet customisable-border">
+  <div class="timeline-Tweet js-tweetIdInfo u-textBreak u-cf" data-click-to-open-target="https://twitter.com/realDonaldTrump/status/{tweet_id}" data-tweet-id="{tweet_id}">
+    <div class="timeline-Tweet-brand u-floatRight"><div class="Icon Icon--twitter"></div></div>
+    <div class="timeline-Tweet-author">
+      <div class="TweetAuthor" data-scribe="component:author">
+        <a class="TweetAuthor-link" href="https://twitter.com/realDonaldTrump">
+          <span class="TweetAuthor-name">Donald J. Trump</span>
+          <span class="TweetAuthor-screenName" dir="ltr">@realDonaldTrump</span>
+        </a>
+      </div>
+    </div>
+    <p class="timeline-Tweet-text" lang="en" dir="ltr">{text} <a href="https://t.co/{tweet_id}" class="link customisable">pic.twitter.com/{tweet_id}</a></p>
+    <div class="timeline-Tweet-metadata"><a href="https://twitter.com/realDonaldTrump/status/{tweet_id}" class="timeline-Tweet-timestamp"><time class="dt-updated" datetime="2019-11-05T12:00:00+0000">Nov 5</time></a></div>
+    <ul class="timeline-Tweet-actions" data-scribe="component:actions">
+      <li class="timeline-Tweet-action"><a class="TweetAction TweetAction--heart" href="https://twitter.com/intent/like?tweet_id={tweet_id}"></a></li>
+    </ul>
+  </div>
+</li>"""
+
+WORDS = ('great', 'fake', 'news', 'the', 'country', 'is', 'doing', 'very', 'well',
+         'sad', '&amp;', 'jobs', 'best', 'economy', 'ever', '&quot;witch', 'hunt&quot;')
+
+
+def generate_payload(tweets=20, first_tweet_id=1192000000000000000, seed=0) -> dict:
+    """ Generates a payload with the same shape as the syndication
+    timeline response with `tweets` tweets ordered newest first. """
+    rng = random.Random(seed)
+    body = ''.join(
+        TWEET_TEMPLATE.format(
+            tweet_id=first_tweet_id - i,
+            text=' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 40))))
+        for i in range(tweets)
+    )
+    return {
+        'headers': {'minPosition': first_tweet_id - tweets, 'maxPosition': first_tweet_id},
+        'body': '<div class="timeline-Body"><ol class="timeline-TweetList">%s</ol></div>' % body,
+    }
+
+
+def load_payloads(pattern: str) -> List[dict]:
+    """ Loads recorded syndication responses. The files can either contain the
+    raw JSONP response or the JSON object inside it. """
+    payloads = []
+    for file_path in sorted(glob.glob(pattern)):
+        with open(file_path, 'r') as file:
+            text = file.read()
+
+        payloads.append(json.loads(text[text.index('{'):text.rindex('}') + 1]))
+
+    return payloads
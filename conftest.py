@@ -1,9 +1,17 @@
 import pytest
 
-from app import app
+from app.http_cache import data_versions
+from app.server import app, graphql_results
 from app.config import configure_app
 
 
+@pytest.fixture(autouse=True)
+def no_caching(monkeypatch):
+    """ The tests neither read the data version from MongoDB nor share cached GraphQL results """
+    monkeypatch.setattr(data_versions, 'get', lambda: None)
+    monkeypatch.setattr(graphql_results, 'maxsize', 0)
+
+
 @pytest.fixture(scope='module')
 def test_client():
     configure_app(app, status='testing')
@@ -9,9 +9,8 @@ from functools import wraps
 from dotenv import load_dotenv
 load_dotenv(verbose=True)
 
-from app.config import configure_app
-from app.bot import TrumpBotScheduler
-from app.sentimentbot import SentimentBot
+# every action imports the modules it needs when it runs, so an action does
+# not pay for the Flask app, the scheduler or the NLP libraries it never uses
 
 parser = argparse.ArgumentParser(description=r"""
 """)
@@ -22,17 +21,19 @@ PID_FILE_PATH = os.path.join(ROOT, 'var/run-dev.pid')
 CMDS = []
 FNCS = []
 
-try:
-    os.setpgrp()
 
-    if not os.path.exists(os.path.dirname(PID_FILE_PATH)):
-        os.makedirs(os.path.dirname(PID_FILE_PATH))
+def _write_pid_file():
+    try:
+        os.setpgrp()
 
-    with open(PID_FILE_PATH, 'w+') as file:
-        file.write(str(os.getpgrp()) + '\n')
+        if not os.path.exists(os.path.dirname(PID_FILE_PATH)):
+            os.makedirs(os.path.dirname(PID_FILE_PATH))
 
-except Exception as e:
-    logging.error(e)
+        with open(PID_FILE_PATH, 'w+') as file:
+            file.write(str(os.getpgrp()) + '\n')
+
+    except Exception as e:
+        logging.error(e)
 
 
 def _file_path_sanity_check(*args):
@@ -50,12 +51,11 @@ def _start_client_server(*args, **kwargs):
 
 
 def inject_file_paths(fn):
-    requests_path = os.environ.get('REQUESTS_FILE_PATH', 'requests/request.json')
-    auth_path = os.environ.get('AUTH_FILE_PATH', 'requests/auth.json')
-    _file_path_sanity_check(requests_path, auth_path)
-
     @wraps(fn)
     def wrapper(*args, **kwargs):
+        requests_path = os.environ.get('REQUESTS_FILE_PATH', 'requests/request.json')
+        auth_path = os.environ.get('AUTH_FILE_PATH', 'requests/auth.json')
+        _file_path_sanity_check(requests_path, auth_path)
         return fn(requests_path=requests_path, auth_path=auth_path, *args, **kwargs)
 
     return wrapper
@@ -64,7 +64,8 @@ def inject_file_paths(fn):
 @inject_file_paths
 def _initialize_trump_bot(auth_path, requests_path, 
                           send_posts: bool=True,
-                          *args, **kwargs) -> TrumpBotScheduler:
+                          *args, **kwargs) -> 'TrumpBotScheduler':
+    from app.bot import TrumpBotScheduler
 
     trump_bot: TrumpBotScheduler = None
     if send_posts:
@@ -74,7 +75,7 @@ def _initialize_trump_bot(auth_path, requests_path,
             def __init__(self, *args, **kwargs):
                 super().__init__(*args, **kwargs)
 
-            def __send_tweet_msg__(self, content, headers=None):
+            def __send_tweet_msg__(self, content, headers=None, **values):
                 return 200
         
         trump_bot = PostOverride(file_path=requests_path, auth_file_path=auth_path)
@@ -93,8 +94,9 @@ def _initialize_trump_bot(auth_path, requests_path,
 
 @inject_file_paths
 def _start_sentiment_bot(auth_path: str, requests_path: str, 
-                         trump_bot: TrumpBotScheduler, 
-                         send_posts: bool=True) -> SentimentBot:
+                         trump_bot: 'TrumpBotScheduler', 
+                         send_posts: bool=True) -> 'SentimentBot':
+    from app.sentimentbot import SentimentBot
 
     bot: SentimentBot = None
     if send_posts:
@@ -104,20 +106,21 @@ def _start_sentiment_bot(auth_path: str, requests_path: str,
             def __init__(self, *args, **kwargs):
                 super().__init__(*args, **kwargs)
 
-            def __send_tweet_msg__(self, content) -> int:
+            def __send_tweet_msg__(self, content, headers=None, **values) -> int:
                 return 200
 
-        bot = PostOverride(file_path=requests_path, auth_file_path=auth_path)
+        bot = PostOverride(file_path=requests_path, auth_file_path=auth_path, http_client=trump_bot.http)
     
     else:
-        bot = SentimentBot(auth_file_path=auth_path, file_path=requests_path)
+        bot = SentimentBot(auth_file_path=auth_path, file_path=requests_path, http_client=trump_bot.http)
 
     trump_bot.add_job(bot.send_todays_tone, 'interval', hours=24, max_instances=1)
     return bot
 
 
 def _start_flask_server(*args, **kwargs):
-    from app import app
+    from app.config import configure_app
+    from app.server import app
 
     logging.info('Starting the flask server...')
     level = os.environ.get('CONFIG_LEVEL')
@@ -127,6 +130,27 @@ def _start_flask_server(*args, **kwargs):
     app.run(host='0.0.0.0', port=port)  
 
 
+def _get_wsgi_server_command() -> list:
+    """ gunicorn forks WEB_WORKERS worker processes that serve WEB_THREADS
+    requests at a time each, GUNICORN_CMD_ARGS can pass any other setting """
+    workers = os.environ.get('WEB_WORKERS', str((os.cpu_count() or 1) * 2 + 1))
+    threads = os.environ.get('WEB_THREADS', '4')
+    port = os.environ.get('SERVER_PORT', 5000)
+    return [
+        sys.executable, '-m', 'gunicorn',
+        '--workers', workers,
+        '--threads', threads,
+        '--worker-class', 'gthread',
+        '--bind', '0.0.0.0:%s' % port,
+        'app.wsgi:app'
+    ]
+
+
+def _start_wsgi_server(*args, **kwargs):
+    logging.info('Starting the web server with gunicorn...')
+    CMDS.append(_get_wsgi_server_command())
+
+
 def _start_dev_server(*args, **kwargs):
     _start_client_server()
 
@@ -134,8 +158,12 @@ def _start_dev_server(*args, **kwargs):
 
 
 def _start_prod_server(*args, **kwargs):
+    # the web workers run in their own processes, the bot and its scheduler
+    # only ever run once, in this one. The web server is started right away
+    # so the first poll of the bot cannot keep it down
+    logging.info('Starting the web server with gunicorn...')
+    subprocess.Popen(_get_wsgi_server_command(), env=os.environ.copy())
     _start_trump_bot(*args, **kwargs)
-    _start_flask_server(*args, **kwargs)
 
 
 def _start_trump_bot(send_posts=True, start_sentiment_bot=False, *args, **kwargs):
@@ -151,6 +179,63 @@ def _start_trump_bot(send_posts=True, start_sentiment_bot=False, *args, **kwargs
     bot.start()
 
 
+@inject_file_paths
+def _start_timeline_poller(auth_path, requests_path, send_posts: bool=True,
+                           *args, **kwargs) -> 'MultiTimelineScheduler':
+    from app.models import Account
+    from app.timelines import MultiTimelineScheduler
+
+    logging.info('Starting the timeline poller...')
+    screen_names = [name.strip() for name in os.environ.get('TIMELINE_ACCOUNTS', '').split(',') if name.strip()]
+    Account.objects.register(screen_names)
+
+    poller: MultiTimelineScheduler = None
+    if send_posts:
+        logging.info('Post requests are not being sent.')
+
+        class PostOverride(MultiTimelineScheduler):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+
+            def __send_tweet_msg__(self, content, headers=None, **values):
+                return 200
+
+        poller = PostOverride(file_path=requests_path, auth_file_path=auth_path)
+
+    else:
+        poller = MultiTimelineScheduler(file_path=requests_path, auth_file_path=auth_path)
+
+    poller.start()
+    return poller
+
+
+def _backfill_sentiment(*args, **kwargs):
+    from app.backfill import backfill_sentiment
+
+    logging.info('Scoring the sentiment of stored tweets...')
+    scored = backfill_sentiment()
+    logging.info('Sentiment backfill finished, scored %s tweets' % scored)
+    sys.exit(0)
+
+
+def _rescore_sentiment(*args, **kwargs):
+    from app.backfill import backfill_sentiment
+
+    logging.info('Rescoring the sentiment of every stored tweet...')
+    scored = backfill_sentiment(rescore=True)
+    logging.info('Sentiment rescoring finished, scored %s tweets' % scored)
+    sys.exit(0)
+
+
+def _rebuild_sentiment_buckets(*args, **kwargs):
+    from app.backfill import rebuild_sentiment_buckets
+
+    logging.info('Rebuilding the sentiment buckets...')
+    added = rebuild_sentiment_buckets()
+    logging.info('Sentiment buckets rebuilt from %s tweets' % added)
+    sys.exit(0)
+
+
 ACTIONS = {
     "initialize": _initialize_trump_bot,
     "client": _start_client_server,
@@ -158,6 +243,11 @@ ACTIONS = {
     "flask": _start_flask_server,
     "dev": _start_dev_server,
     "prod": _start_prod_server,
+    "serve": _start_wsgi_server,
+    "timelines": _start_timeline_poller,
+    "backfill-sentiment": _backfill_sentiment,
+    "rescore-sentiment": _rescore_sentiment,
+    "rebuild-sentiment-buckets": _rebuild_sentiment_buckets,
 }
 
 
@@ -185,6 +275,7 @@ def signal_handler(sig, frame):
 
 def main():
     options = parser.parse_args()
+    _write_pid_file()
     for s in (signal.SIGINT, signal.SIGTERM):
         signal.signal(s, signal_handler)
     